@@ -74,13 +74,31 @@ WSGI_APPLICATION = 'argot.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.1/ref/settings/#databases
 
+#argot.sqlite_backend is Django's sqlite3 backend, but starts transactions
+#with BEGIN IMMEDIATE, since the scrape workers write from other processes
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'argot.sqlite_backend',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
     }
 }
 
+# Rendered dictionary entries, see dictionary/entry_cache.py. The cache is
+# file based so scrape workers running in their own process can invalidate
+# the entries cached by the web server
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'entries': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'entry_cache'),
+        'TIMEOUT': 24 * 60 * 60,
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
@@ -119,3 +137,99 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/2.1/howto/static-files/
 
 STATIC_URL = '/static/'
+
+
+# Views and guesses are added up in memory and written to PendingCount rows,
+# which the scrape worker adds to the counted rows, see dictionary/counters.py
+
+# Seconds and number of counted fields a process keeps in memory at most
+COUNTER_BUFFER_INTERVAL = 5
+COUNTER_BUFFER_SIZE = 1000
+
+# Seconds between the scrape worker's flushes of the pending counts
+COUNTER_FLUSH_INTERVAL = 10
+
+# Pending rows a process writes before it flushes them itself, e.g. without a
+# worker running
+COUNTER_MAX_PENDING = 100000
+
+
+# Vocab game
+
+# Questions generated at a time for a game, see dictionary/quiz_sessions.py
+QUIZ_BATCH_SIZE = 20
+
+
+# Merriam-Webster scraper
+
+# Number of threads downloading pages when loading many words at once
+SCRAPER_WORKERS = 4
+
+# Number of processes parsing the downloaded pages, None starts one per CPU and
+# 0 parses them in the thread writing the entries
+SCRAPER_PARSE_WORKERS = None
+
+# Minimum number of seconds between two requests to the same host
+SCRAPER_MIN_REQUEST_INTERVAL = 1.0
+
+# Max number of keep-alive connections the scraper keeps open per host
+SCRAPER_POOL_SIZE = 10
+
+# Seconds to wait while connecting to and then reading from Merriam-Webster
+SCRAPER_CONNECT_TIMEOUT = 5
+SCRAPER_READ_TIMEOUT = 10
+
+# On-disk cache of downloaded pages, set SCRAPER_CACHE_DIR to None to turn off
+SCRAPER_CACHE_DIR = os.path.join(BASE_DIR, 'scraper_cache')
+SCRAPER_CACHE_TTL = 7 * 24 * 60 * 60
+SCRAPER_CACHE_MAX_BYTES = 200 * 1024 * 1024
+# Expired pages are kept this much longer to fall back on when the site is down
+SCRAPER_CACHE_STALE_TTL = 30 * 24 * 60 * 60
+
+# Seconds before a word Merriam-Webster had no entry for is looked up again
+SCRAPER_NOT_FOUND_TTL = 7 * 24 * 60 * 60
+
+# Seconds after its last refresh before refresh_entries checks a word again
+SCRAPER_REFRESH_MIN_AGE = 30 * 24 * 60 * 60
+
+# Words import_words looks up between two checkpoints
+SCRAPER_IMPORT_BATCH_SIZE = 200
+
+# 'targeted' only parses the definition section of a page, 'full' parses it all
+SCRAPER_PARSE_MODE = 'targeted'
+
+# BeautifulSoup backend used by the scraper: 'html5lib', 'lxml' or 'html.parser'
+SCRAPER_HTML_PARSER = 'html5lib'
+
+# Seconds between updates of a running job by run_scrape_worker, so jobs that
+# are still running aren't taken for ones whose worker died
+SCRAPER_JOB_HEARTBEAT = 30
+
+# Seconds before a visit to a word whose synonyms haven't been looked up
+# queues the lookup again, e.g. after the last one failed
+SCRAPER_SYNONYM_JOB_TTL = 600
+
+# Seconds before a lookup's lease on a word is considered abandoned, seconds
+# to wait on another lookup of the same word before giving up, and seconds
+# between checks while waiting
+SCRAPER_LEASE_TTL = 10 * 60
+SCRAPER_LEASE_WAIT = 5 * 60
+SCRAPER_LEASE_POLL_INTERVAL = 0.2
+
+# Failed requests are retried up to SCRAPER_MAX_RETRIES times, waiting a random
+# delay of up to SCRAPER_BACKOFF_BASE * 2 ** attempt seconds (capped at
+# SCRAPER_BACKOFF_MAX) or as long as a Retry-After header asks
+SCRAPER_MAX_RETRIES = 4
+SCRAPER_BACKOFF_BASE = 1.0
+SCRAPER_BACKOFF_MAX = 60
+
+# After SCRAPER_BREAKER_THRESHOLD failed requests in a row, stop making
+# requests for SCRAPER_BREAKER_COOLDOWN seconds
+SCRAPER_BREAKER_THRESHOLD = 5
+SCRAPER_BREAKER_COOLDOWN = 60
+
+# 'live' makes real requests, 'record' also saves every response under
+# SCRAPER_HTTP_FIXTURE_DIR and 'replay' only serves the saved responses
+SCRAPER_HTTP_MODE = os.environ.get('SCRAPER_HTTP_MODE', 'live')
+SCRAPER_HTTP_FIXTURE_DIR = os.path.join(BASE_DIR, 'dictionary', 'fixtures',
+                                        'http')
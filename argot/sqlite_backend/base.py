@@ -0,0 +1,17 @@
+"""SQLite backend that takes the write lock when a transaction begins
+
+The web server and the scrape workers write to the same SQLite file from
+different processes. A transaction that reads before it writes only asks
+for the write lock at its first write, and if another process is writing
+by then SQLite fails it right away with 'database is locked', since waiting
+could deadlock. Starting every transaction with BEGIN IMMEDIATE takes the
+write lock up front, so a transaction waits for the other process to commit
+like a single write does.
+"""
+
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
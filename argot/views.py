@@ -1,11 +1,13 @@
 from django.shortcuts import render, get_object_or_404
 from django.http import HttpResponse, Http404, HttpResponseRedirect
+from django.urls import reverse
 from dictionary import models
 from argot.forms import LoginForm, RegistrationForm, WordListForm
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate, login, logout
 from dictionary.forms import SearchWordForm
-from dictionary import merriam_webster_scraper as mws
+from dictionary import counters, entry_cache, scrape_jobs
+from dictionary.variant_index import variant_index
 
 
 def home(request):
@@ -14,6 +16,9 @@ def home(request):
     Greets user and gives an explanation of what argot is. Allows user to
     look up words. Eventually will offer a number of practice word lists to play
     with. Allows user to login or to register.
+
+    Words that aren't in the dictionary yet are queued to be looked up in the
+    background and the user is sent to a page that waits for the entry.
     """
     query = request.GET.get('search_term')
     word_list = None
@@ -22,16 +27,21 @@ def home(request):
     if query:
         form = SearchWordForm(request.GET)
         if form.is_valid():
-
             search_term = form.cleaned_data['search_term']
-            base_word = models.VariantWord.objects.get(name=search_term) \
-                              .base_word
-            if base_word.searched_synonym == False:
-                mws.scrape_word(base_word.name, True)
+            base_word_id = variant_index.base_word_id(search_term)
+            if base_word_id is None:
+                job = scrape_jobs.enqueue(search_term, word_list=word_list)
+                return HttpResponseRedirect(reverse('dictionary:scrape_job',
+                                                    args=(job.id,)))
+            entry = entry_cache.get_entry(base_word_id)
+            counters.increment(models.BaseWord, base_word_id, view_count=1)
+            if entry['searched_synonym'] == False:
+                scrape_jobs.enqueue_synonyms(entry['name'])
             if word_list is not None:
-                word_list.add_word(base_word)
+                models.WordListEntry.objects.create(word_list=word_list,
+                                                    word_id=base_word_id)
             return render(request, 'dictionary/detail.html',
-                          {'word': base_word})
+                          {'entry': entry})
         else:
             return render(request, 'argot/no_word_found.html',
                           {'word' : query})
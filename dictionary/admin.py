@@ -1,5 +1,13 @@
 from django.contrib import admin
 
-from .models import BaseWord
+from .models import BaseWord, NotFoundWord
 
 admin.site.register(BaseWord)
+
+
+@admin.register(NotFoundWord)
+class NotFoundWordAdmin(admin.ModelAdmin):
+    """Deleting a word makes the scraper look it up again"""
+    list_display = ('word', 'checked')
+    search_fields = ('word',)
+    ordering = ('-checked',)
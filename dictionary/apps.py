@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class DictionaryConfig(AppConfig):
     name = 'dictionary'
+
+    def ready(self):
+        #Connects the signals keeping the variant name and quiz indexes current
+        from dictionary import quiz_index, variant_index  # noqa: F401
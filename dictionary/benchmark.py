@@ -0,0 +1,450 @@
+"""Throughput benchmark of the scraper against a local stand-in for the site
+
+Nobody could size a backfill because nobody knew how many words a second the
+scraper manages or where the time goes. This module starts MockDictionary, a
+local HTTP server that answers like Merriam-Webster with a configurable
+latency, points the scraper at it and times the three ways words get added:
+
+    scrape_word         one word at a time, without synonyms
+    fill_in_synonyms    the synonyms of the words added by scrape_word
+    load_list_of_words  a new list of words, synonyms included
+
+Pages recorded in dictionary/fixtures/http or saved in
+dictionary/fixtures/synthetic_pages are served as they are. Any other word gets the
+saved bolster page with the entry, its forms and its synonyms renamed after
+the word, padded to the size of a real page, so every word has synonyms of
+its own to look up.
+
+For every scenario the report has the words per second, the p50 and p99
+latency of a word, and the seconds spent fetching pages, parsing them and
+writing entries to the db, added up over every thread. The times are
+measured by wrapping the scraper's functions, so they include the rate
+limiter and retries in fetching.
+
+run() writes to the database it's given, use the benchmark_scraper command,
+which runs it on a throwaway_database():
+
+    python3 manage.py benchmark_scraper --words 50 --latency 0.05 \\
+        --output benchmark.json
+
+run_restore() compares restoring a dictionary dump (see
+dictionary/dictionary_dump.py) with loading the same rows with loaddata. The
+dictionary in the db is copied until it's big enough to time, with the
+words of every copy renamed. It's run by the benchmark_restore command:
+
+    python3 manage.py benchmark_restore --copies 20
+"""
+
+import gzip
+import json
+import math
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import unquote
+from django.core.management import call_command
+from django.db import connection
+from dictionary import dictionary_dump, http_client, http_replay, models
+from dictionary import merriam_webster_scraper as mws
+from dictionary.page_cache import PageCache
+from dictionary.retry_policy import CircuitBreaker
+from dictionary.variant_index import variant_index
+
+PAGES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures',
+                         'synthetic_pages')
+#Recordings are looked up by the site's url, not the mock server's
+SITE_URL = mws.BASE_URL
+#Names on the bolster page that are renamed after the word looked up
+TEMPLATE_WORD = 'bolster'
+TEMPLATE_SYNONYMS = ('boost', 'brace', 'buttress', 'prop', 'undermine',
+                     'weaken')
+#About the size of a real entry page
+PAGE_SIZE = 150 * 1024
+#Columns pointing to other tables, copied dictionaries point to their copy
+FOREIGN_KEYS = {'base_word_id': 'baseword', 'pos_id': 'partofspeech',
+                'form_word_id': 'formword', 'definition_id': 'worddefinition',
+                'synonym_id': 'variantword', 'antonym_id': 'variantword'}
+#A word in scrape_words is timed from its download to the end of its write
+PIPELINE_STAGES = [('wrap_start', '_fetch_in_thread'),
+                   ('wrap_finish', '_write_entry')]
+
+
+class MockDictionary:
+    """Local HTTP server that serves entry pages like Merriam-Webster
+
+    Keyword arguments:
+    latency -- seconds to wait before answering each request
+    page_size -- bytes generated pages are padded to
+    """
+    def __init__(self, latency=0.0, page_size=PAGE_SIZE):
+        self.latency = latency
+        self.page_size = page_size
+        with open(os.path.join(PAGES_DIR, TEMPLATE_WORD + '.html'),
+                  encoding='utf-8') as f:
+            self._template = f.read()
+        self._server = None
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self._server.server_port}/dictionary/'
+
+    def start(self):
+        mock_dictionary = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                time.sleep(mock_dictionary.latency)
+                word = unquote(self.path.rstrip('/').rsplit('/', 1)[-1])
+                status, body = mock_dictionary.page(word)
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever,
+                         daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def page(self, word):
+        """Returns (status code, body) of the entry page for word"""
+        try:
+            recording = http_replay.load(SITE_URL + word)
+            return recording.status_code, recording.content
+        except http_replay.MissingRecording:
+            pass
+        path = os.path.join(PAGES_DIR, word + '.html')
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                return 200, f.read()
+        return 200, self.generate_page(word)
+
+    def generate_page(self, word):
+        """Returns the template page renamed after word"""
+        page = self._template
+        for synonym in TEMPLATE_SYNONYMS:
+            page = page.replace(synonym, word + synonym)
+        page = page.replace(TEMPLATE_WORD, word)
+        padding = max(self.page_size - len(page), 0)
+        #Real pages have this much script and navigation before the entry
+        page = page.replace('<body class="definitions-page">',
+                            '<body class="definitions-page">\n<script>/*'
+                            + 'x' * padding + '*/</script>', 1)
+        return page.encode('utf-8')
+
+
+class StageTimer:
+    """Adds up the seconds spent in each stage, from every thread"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.seconds = {'fetch': 0.0, 'parse': 0.0, 'write': 0.0}
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.seconds[stage] += seconds
+
+    def wrap(self, stage, function):
+        @wraps(function)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - start)
+        return timed
+
+    def patches(self):
+        """Returns mock patches that time the scraper's stages
+
+        Pages are parsed in other processes, so parsing isn't patched, it's
+        timed by the scraper itself and read from mws.parse_stats.
+        """
+        stages = [('fetch', '_fetch_page'), ('write', '_save_entry'),
+                  ('write', 'link_synonyms'),
+                  ('write', '_create_synonym_lookups')]
+        return [mock.patch.object(mws, name,
+                                  self.wrap(stage, getattr(mws, name)))
+                for stage, name in stages]
+
+
+class LatencyRecorder:
+    """Records how long each word took, from every thread
+
+    A word either goes through a single call, timed by wrap(), or through
+    the stages of a pipeline, timed from the call wrapped by wrap_start() to
+    the end of the one wrapped by wrap_finish(). Both take the word as their
+    first argument.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = []
+        self._started = {}
+
+    def wrap(self, function):
+        @wraps(function)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self.latencies.append(elapsed)
+        return timed
+
+    def wrap_start(self, function):
+        @wraps(function)
+        def started(word, *args, **kwargs):
+            with self._lock:
+                self._started[word] = time.perf_counter()
+            return function(word, *args, **kwargs)
+        return started
+
+    def wrap_finish(self, function):
+        @wraps(function)
+        def finished(word, *args, **kwargs):
+            try:
+                return function(word, *args, **kwargs)
+            finally:
+                end = time.perf_counter()
+                with self._lock:
+                    self.latencies.append(end - self._started.pop(word))
+        return finished
+
+
+def percentile(values, fraction):
+    """Returns the nearest rank percentile of values, None if empty"""
+    if not values:
+        return None
+    values = sorted(values)
+    #Rounded first so 0.99 * 100 isn't taken as a bit over 99
+    rank = math.ceil(round(fraction * len(values), 9))
+    return values[min(max(rank, 1), len(values)) - 1]
+
+
+def run(words, latency=0.0, workers=None, min_interval=0.0,
+        page_size=PAGE_SIZE, parse_workers=None):
+    """Runs every scenario against a MockDictionary, returns the report
+
+    Keyword arguments:
+    words -- words to look up, half with scrape_word and half with
+    load_list_of_words
+    latency -- seconds the mock server waits before each answer
+    workers -- threads used by fill_in_synonyms and load_list_of_words
+    min_interval -- seconds between requests, like
+    SCRAPER_MIN_REQUEST_INTERVAL
+    page_size -- bytes generated pages are padded to
+    parse_workers -- processes used by fill_in_synonyms and
+    load_list_of_words to parse pages
+    """
+    words = list(dict.fromkeys(words))
+    half = len(words) // 2
+    server = MockDictionary(latency, page_size).start()
+    patches = [
+        mock.patch.object(mws, 'BASE_URL', server.base_url),
+        mock.patch.object(mws, 'rate_limiter', mws.RateLimiter(min_interval)),
+        mock.patch.object(mws, 'circuit_breaker', CircuitBreaker(5, 60)),
+        mock.patch.object(mws, 'page_cache', PageCache(None, 0, 0)),
+    ]
+    for patch in patches:
+        patch.start()
+    variant_index.clear()
+    try:
+        scenarios = {}
+        scenarios['scrape_word'] = _time_scenario(
+            [('wrap', 'scrape_word')], lambda: [mws.scrape_word(word)
+                                                for word in words[:half]])
+        scenarios['fill_in_synonyms'] = _time_scenario(
+            PIPELINE_STAGES,
+            lambda: mws.fill_in_synonyms(workers, parse_workers))
+        with tempfile.NamedTemporaryFile('w', suffix='.txt') as f:
+            f.write('\n'.join(words[half:]))
+            f.flush()
+            scenarios['load_list_of_words'] = _time_scenario(
+                PIPELINE_STAGES,
+                lambda: mws.load_list_of_words(f.name, workers,
+                                               parse_workers))
+    finally:
+        for patch in patches:
+            patch.stop()
+        variant_index.clear()
+        #Drops the kept alive connections to the server
+        http_client.configure()
+        server.stop()
+    return {
+        'settings': {'words': len(words), 'latency': latency,
+                     'workers': workers, 'parse_workers': parse_workers,
+                     'min_interval': min_interval, 'page_size': page_size},
+        'scenarios': scenarios,
+    }
+
+
+def _time_scenario(word_functions, scenario):
+    """Runs scenario, timing each word with the given mws functions
+
+    Keyword arguments:
+    word_functions -- list of (LatencyRecorder method, mws function name)
+    """
+    stage_timer = StageTimer()
+    latency_recorder = LatencyRecorder()
+    patches = stage_timer.patches() + [
+        mock.patch.object(mws, name,
+                          getattr(latency_recorder, method)(getattr(mws,
+                                                                    name)))
+        for (method, name) in word_functions]
+    for patch in patches:
+        patch.start()
+    http_client.reset_stats()
+    mws.parse_stats.reset()
+    words_before = models.VariantWord.objects.count()
+    start = time.perf_counter()
+    try:
+        scenario()
+    finally:
+        seconds = time.perf_counter() - start
+        for patch in reversed(patches):
+            patch.stop()
+    stage_timer.add('parse', mws.parse_stats.as_dict()['seconds'])
+    latencies = latency_recorder.latencies
+    return {
+        'words': len(latencies),
+        'new_variant_words': (models.VariantWord.objects.count()
+                              - words_before),
+        'seconds': seconds,
+        'words_per_second': len(latencies) / seconds if seconds else None,
+        'latency_p50': percentile(latencies, 0.5),
+        'latency_p99': percentile(latencies, 0.99),
+        'stage_seconds': stage_timer.seconds,
+        'http': http_client.stats(),
+    }
+
+
+def run_restore(copies=10):
+    """Times a restore of a dump and loaddata of the same rows
+
+    Keyword arguments:
+    copies -- how many copies of the dictionary in the db to time with
+
+    Replaces the dictionary in the db, run it on a throwaway_database().
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        original = os.path.join(tmp_dir, 'original.jsonl.gz')
+        scaled = os.path.join(tmp_dir, 'scaled.jsonl.gz')
+        redumped = os.path.join(tmp_dir, 'redumped.jsonl.gz')
+        fixture = os.path.join(tmp_dir, 'scaled.json')
+        dictionary_dump.dump(original)
+        _write_copies(original, scaled, copies)
+        start = time.perf_counter()
+        counts = dictionary_dump.restore(scaled, replace=True)
+        restore_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        dictionary_dump.dump(redumped)
+        dump_seconds = time.perf_counter() - start
+        call_command('dumpdata', *[f'dictionary.{table}'
+                                   for (table, _) in dictionary_dump.TABLES],
+                     output=fixture, verbosity=0)
+        dictionary_dump._make_room(replace=True)
+        start = time.perf_counter()
+        call_command('loaddata', fixture, verbosity=0)
+        loaddata_seconds = time.perf_counter() - start
+        rows = sum(counts.values())
+        return {
+            'copies': copies,
+            'rows': rows,
+            'dump_bytes': os.path.getsize(scaled),
+            'fixture_bytes': os.path.getsize(fixture),
+            'dump_seconds': dump_seconds,
+            'restore_seconds': restore_seconds,
+            'loaddata_seconds': loaddata_seconds,
+            'restore_rows_per_second': rows / restore_seconds,
+            'loaddata_rows_per_second': rows / loaddata_seconds,
+            'speedup': loaddata_seconds / restore_seconds,
+        }
+
+
+def _write_copies(source, destination, copies):
+    """Writes a dump with the dictionary in source repeated copies times
+
+    The ids of every copy are moved past the ones of the copy before it and
+    the names of its words get a -<copy> suffix, so they stay unique. The
+    parts of speech are shared.
+    """
+    tables = []
+    with gzip.open(source, 'rt', encoding='utf-8') as f:
+        dictionary_dump._read_header(f)
+        for (table, fields, rows) in dictionary_dump._tables(f):
+            tables.append((table, fields, list(rows)))
+    max_ids = {table: max([row[0] for row in rows], default=0)
+               for (table, _, rows) in tables}
+    with gzip.open(destination, 'wt', encoding='utf-8') as f:
+        dictionary_dump._write_line(f, {'format': dictionary_dump.FORMAT,
+                                        'version': dictionary_dump.VERSION})
+        for (table, fields, rows) in tables:
+            dictionary_dump._write_line(f, {'table': table, 'fields': fields})
+            for copy in range(copies if table != 'partofspeech' else 1):
+                for row in rows:
+                    dictionary_dump._write_line(
+                        f, _copy_row(table, fields, row, copy, max_ids))
+
+
+def _copy_row(table, fields, row, copy, max_ids):
+    """Returns row as it is in the given copy of the dictionary"""
+    copied = []
+    for (field, value) in zip(fields, row):
+        if field == 'id':
+            value += copy * max_ids[table]
+        elif field in FOREIGN_KEYS and field != 'pos_id':
+            value += copy * max_ids[FOREIGN_KEYS[field]]
+        elif copy and field in ('name', 'lookup_word'):
+            value = f'{value}-{copy}'
+        copied.append(value)
+    return copied
+
+
+def dumps(report):
+    return json.dumps(report, indent=2, sort_keys=True)
+
+
+def current_commit():
+    """Returns the git commit being benchmarked, None outside of git"""
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'],
+                              capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@contextmanager
+def throwaway_database():
+    """Runs the with block on a test database that's dropped afterwards"""
+    tmp_dir = None
+    if connection.vendor == 'sqlite':
+        #The scraper's threads can't share an in-memory database
+        tmp_dir = tempfile.TemporaryDirectory()
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = \
+            os.path.join(tmp_dir.name, 'benchmark.sqlite3')
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
@@ -0,0 +1,211 @@
+"""Write-behind counters for views and guesses
+
+Viewing a word list used to add one to its view_count and save the whole
+row, and every answer to the game did the same to the counts of the base
+word and of the user's UserAccuracy. Two requests counting the same row at
+once would both save the count they read, losing one of them, and every
+request waited on the same few rows.
+
+Counts are now added up in memory instead, so counting doesn't touch the
+database at all:
+
+    counters.increment(models.WordList, word_list.id, view_count=1)
+
+Every COUNTER_BUFFER_INTERVAL seconds, or once COUNTER_BUFFER_SIZE fields
+have been counted, the process writes what it added up with a single
+insert of one PendingCount row per field, however many times the field was
+counted. Counts still in memory are written when the process exits, so only
+a process that gets killed loses the counts of its last few seconds. If the
+insert fails, e.g. while another process holds the database's write lock,
+the counts stay in memory for the next try and the request that counted
+carries on as if nothing happened.
+
+flush() adds up the pending counts of each row and applies them with a
+single UPDATE ... SET field = field + n per row, then deletes them, all in
+one transaction. A flush first claims the counts it's going to apply by
+stamping them with its own batch, so when two flushes run at once, each
+count is applied by only one of them, and a flush that fails leaves its
+counts to the next one. Counts are only ever added to their rows in the
+database, so none are lost however many requests count at once.
+
+A worker has to flush for the counts to show up on the site. The scrape
+worker flushes every COUNTER_FLUSH_INTERVAL seconds, and the flush_counters
+command does it on demand, e.g. from cron. Without either, a process that
+wrote more than COUNTER_MAX_PENDING rows since it last flushed flushes them
+itself, so the table can't grow without end, but the counts shown trail the
+real ones by up to that many rows per process.
+
+Main Functions:
+    increment(model, pk, **amounts)
+        Adds amounts to the given fields of a row in memory, writing them
+        as pending counts once the buffer is due.
+
+    write_buffer()
+        Writes the counts added up in memory as PendingCount rows, returns
+        the number of rows written.
+
+    flush()
+        Writes the buffer, then applies every pending count to its row,
+        returns the number of PendingCount rows applied.
+
+        Example:
+            python3 manage.py flush_counters
+
+    flush_if_due()
+        Flushes if COUNTER_FLUSH_INTERVAL seconds passed since this process
+        last flushed.
+
+Settings:
+    COUNTER_BUFFER_INTERVAL -- seconds counts are kept in memory at most,
+    while the process keeps counting
+    COUNTER_BUFFER_SIZE -- fields counted in memory at most
+    COUNTER_MAX_PENDING -- pending rows a process writes before it flushes
+    them itself
+    COUNTER_FLUSH_INTERVAL -- seconds between flushes by the scrape worker
+"""
+
+import atexit
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict
+from django.apps import apps
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import F, Sum
+from dictionary import models
+
+#Fields that can be counted, by model name
+COUNTED_FIELDS = {
+    'baseword': {'view_count', 'total_guesses', 'correct_guesses'},
+    'wordlist': {'view_count'},
+    'useraccuracy': {'total_guesses', 'correct_guesses'},
+}
+
+logger = logging.getLogger(__name__)
+
+#Counts not written yet, by (model name, pk, field), and when the oldest
+#of them was counted
+_buffer = defaultdict(int)
+_buffer_started = time.monotonic()
+_buffer_lock = threading.Lock()
+#PendingCount rows this process wrote since it last flushed
+_written = 0
+_last_flush = time.monotonic()
+_flush_lock = threading.Lock()
+
+
+def increment(model, pk, **amounts):
+    """Adds counts to the fields of a row, written once the buffer is due
+
+    Keyword arguments:
+    model -- model class of the row, see COUNTED_FIELDS
+    pk -- primary key of the row
+    amounts -- amount to add to each field
+    """
+    global _buffer_started
+    model_name = model._meta.model_name
+    unknown = set(amounts) - COUNTED_FIELDS.get(model_name, set())
+    if unknown:
+        raise ValueError(f'{model_name} has no counted fields '
+                         f'{", ".join(sorted(unknown))}')
+    interval = getattr(settings, 'COUNTER_BUFFER_INTERVAL', 5)
+    size = getattr(settings, 'COUNTER_BUFFER_SIZE', 1000)
+    with _buffer_lock:
+        if not _buffer:
+            _buffer_started = time.monotonic()
+        for (field, amount) in amounts.items():
+            if amount:
+                _buffer[(model_name, pk, field)] += amount
+        due = (len(_buffer) >= size
+               or time.monotonic() - _buffer_started >= interval)
+    if not due:
+        return
+    max_pending = getattr(settings, 'COUNTER_MAX_PENDING', 100000)
+    #Counting never fails the request, the counts are written next time
+    try:
+        with transaction.atomic():
+            write_buffer()
+        if _written > max_pending:
+            flush()
+    except DatabaseError:
+        logger.warning('Could not write the view and guess counts',
+                       exc_info=True)
+
+
+def write_buffer():
+    """Writes the counts kept in memory as pending counts, returns how many"""
+    global _buffer, _written
+    with _buffer_lock:
+        counts = _buffer
+        _buffer = defaultdict(int)
+    pending = [models.PendingCount(model=model_name, object_id=pk,
+                                   field=field, amount=amount)
+               for ((model_name, pk, field), amount) in counts.items()
+               if amount]
+    try:
+        models.PendingCount.objects.bulk_create(pending)
+    except DatabaseError:
+        #Kept for the next write
+        with _buffer_lock:
+            for (key, amount) in counts.items():
+                _buffer[key] += amount
+        raise
+    with _buffer_lock:
+        _written += len(pending)
+    return len(pending)
+
+
+def clear():
+    """Drops the counts kept in memory without writing them, for tests"""
+    global _written
+    with _buffer_lock:
+        _buffer.clear()
+        _written = 0
+
+
+@atexit.register
+def _write_buffer_at_exit():
+    try:
+        write_buffer()
+    except DatabaseError:
+        logger.exception('Lost the view and guess counts of this process')
+
+
+def flush():
+    """Applies the pending counts to their rows, returns how many"""
+    global _written
+    write_buffer()
+    with _buffer_lock:
+        _written = 0
+    batch = uuid.uuid4().hex
+    with transaction.atomic():
+        #Claimed with a write, so concurrent flushes never share counts
+        claimed = (models.PendingCount.objects.filter(batch='')
+                         .update(batch=batch))
+        if not claimed:
+            return 0
+        totals = (models.PendingCount.objects.filter(batch=batch)
+                        .values_list('model', 'object_id', 'field')
+                        .annotate(total=Sum('amount'))
+                        .order_by())
+        rows = defaultdict(dict)
+        for (model_name, object_id, field, total) in totals:
+            rows[(model_name, object_id)][field] = F(field) + total
+        for ((model_name, object_id), updates) in rows.items():
+            model = apps.get_model('dictionary', model_name)
+            model.objects.filter(pk=object_id).update(**updates)
+        models.PendingCount.objects.filter(batch=batch).delete()
+    return claimed
+
+
+def flush_if_due():
+    """Flushes if the flush interval passed, returns the counts applied"""
+    global _last_flush
+    interval = getattr(settings, 'COUNTER_FLUSH_INTERVAL', 10)
+    with _flush_lock:
+        if time.monotonic() - _last_flush < interval:
+            return 0
+        _last_flush = time.monotonic()
+    return flush()
@@ -0,0 +1,242 @@
+"""Compact dump and fast restore of the whole dictionary
+
+loaddata deserializes a fixture one object at a time and saves every row
+with its own query, which gets far too slow for dictionaries with 100k+
+entries. A dictionary dump is a gzipped file of json lines instead, written
+and read as a stream so it never has to fit in memory:
+
+    {"format": "argot-dictionary", "version": 1}
+    {"table": "baseword", "fields": ["id", "name", "searched_synonym"]}
+    [1, "argot", false]
+    [2, "bolster", false]
+    {"table": "formword", "fields": ["id", "base_word_id", "pos_id"]}
+    [1, 1, 1]
+    ...
+
+Each table starts with a line naming it and its columns, followed by one
+json array per row. Only the dictionary itself is dumped (see TABLES), not
+users, word lists or usage counts. Rows keep their ids, so the foreign keys
+between them don't need to be looked up again.
+
+A restore inserts the rows of each table with bulk_create in chunks. The
+tables are restored in the order of TABLES, so the rows a row points to are
+always in before it. The entry documents of the restored words are built
+once the rows are in (see dictionary/entry_documents.py).
+
+Replacing the dictionary deletes every base word, which would take the
+users' word list entries and guess stats (see USER_TABLES) with it. Those
+are kept across the restore instead, and pointed at the restored base word
+with the same name. The ones for words that aren't in the dump are
+deleted.
+
+Main Functions:
+    dump(path)
+        Writes the dictionary to path, returns a dict of table -> rows
+
+        Example:
+            python3 manage.py dump_dictionary argot_dictionary.jsonl.gz
+
+    restore(path, replace=False)
+        path: dump written by dump()
+        replace: delete the dictionary in the db first, otherwise the
+        dictionary tables have to be empty
+
+        Returns a dict of table -> rows restored. With replace, it also has
+        the number of rows of each of USER_TABLES that were kept.
+
+        Example:
+            python3 manage.py restore_dictionary argot_dictionary.jsonl.gz
+"""
+
+import gzip
+import json
+from itertools import islice
+from django.apps import apps
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import F
+from dictionary import entry_cache, entry_documents
+from dictionary.distractor_pool import distractor_pool
+from dictionary.variant_index import variant_index
+
+FORMAT = 'argot-dictionary'
+VERSION = 1
+#Dictionary tables and their columns, every table after the ones it points to
+TABLES = [
+    ('partofspeech', ['id', 'name']),
+    ('baseword', ['id', 'name', 'searched_synonym']),
+    ('formword', ['id', 'base_word_id', 'pos_id']),
+    ('variantword', ['id', 'base_word_id', 'name']),
+    ('worddefinition', ['id', 'form_word_id', 'definition']),
+    ('examplesentence', ['id', 'definition_id', 'sentence']),
+    ('synonym', ['id', 'base_word_id', 'synonym_id']),
+    ('antonym', ['id', 'base_word_id', 'antonym_id']),
+    ('synonymstolookup', ['id', 'base_word_id', 'lookup_word', 'is_synonym']),
+]
+#Tables of users' data pointing to base words, and the field pointing there
+USER_TABLES = [('wordlistentry', 'word'), ('useraccuracy', 'base_word')]
+#Rows fetched or inserted at a time
+CHUNK_SIZE = 2000
+
+
+class DumpError(Exception):
+    """Raised for a file that isn't a dictionary dump, or a db in the way"""
+
+
+def dump(path):
+    """Writes every dictionary table to path, returns dict of table -> rows"""
+    counts = {}
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        _write_line(f, {'format': FORMAT, 'version': VERSION})
+        for (table, fields) in TABLES:
+            _write_line(f, {'table': table, 'fields': fields})
+            rows = (_model(table).objects.order_by('id')
+                                 .values_list(*fields)
+                                 .iterator(chunk_size=CHUNK_SIZE))
+            counts[table] = 0
+            for row in rows:
+                _write_line(f, row)
+                counts[table] += 1
+    return counts
+
+
+def restore(path, replace=False):
+    """Loads a dump written by dump(), returns a dict of table -> rows"""
+    counts = {}
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        _read_header(f)
+        with transaction.atomic():
+            user_rows = _make_room(replace)
+            for (table, fields, rows) in _tables(f):
+                counts[table] = _insert(_model(table), fields, rows)
+            _reset_sequences([_model(table) for table in counts])
+            if replace:
+                counts.update(_restore_user_rows(user_rows))
+    entry_documents.backfill()
+    #bulk_create doesn't send the signals that keep these up to date
+    variant_index.clear()
+    distractor_pool.clear()
+    entry_cache.clear()
+    return counts
+
+
+def _model(table):
+    return apps.get_model('dictionary', table)
+
+
+def _write_line(f, value):
+    f.write(json.dumps(value, ensure_ascii=False, separators=(',', ':')))
+    f.write('\n')
+
+
+def _read_header(f):
+    """Checks that the first line of f is the header of a dump"""
+    try:
+        header = json.loads(f.readline())
+    except (OSError, ValueError) as e:
+        raise DumpError(f'Not a dictionary dump: {e}') from None
+    if not isinstance(header, dict) or header.get('format') != FORMAT:
+        raise DumpError('Not a dictionary dump')
+    if header.get('version') != VERSION:
+        raise DumpError(f'Unsupported dump version {header.get("version")}')
+
+
+def _tables(f):
+    """Yields (table, fields, iterator of rows) for each table in the dump
+
+    The rows have to be used up before asking for the next table.
+    """
+    lines = (json.loads(line) for line in f)
+    known = dict(TABLES)
+    line = next(lines, None)
+    while line is not None:
+        if not isinstance(line, dict) or line.get('table') not in known:
+            raise DumpError(f'Expected a table, found {line!r}')
+        pending = []
+
+        def rows():
+            for row in lines:
+                if isinstance(row, dict):
+                    pending.append(row)
+                    return
+                yield row
+
+        yield (line['table'], line['fields'], rows())
+        line = pending[0] if pending else None
+
+
+def _make_room(replace):
+    """Empties the dictionary tables, or checks that they are empty
+
+    Returns the rows of USER_TABLES saved by _save_user_rows() before they
+    were deleted along with the base words, None without replace.
+    """
+    models = [_model(table) for (table, _) in TABLES]
+    if not replace:
+        if any(model.objects.exists() for model in models):
+            raise DumpError('The dictionary is not empty, restore with '
+                            'replace to overwrite it')
+        return None
+    user_rows = _save_user_rows()
+    #Also deletes whatever else points to the words, e.g. entry documents
+    for model in reversed(models):
+        model.objects.all().delete()
+    return user_rows
+
+
+def _save_user_rows():
+    """Returns dict of table -> rows of USER_TABLES as dicts
+
+    Each row has the name of its base word under 'word_name' instead of the
+    id, which won't be the same after the restore.
+    """
+    user_rows = {}
+    for (table, field) in USER_TABLES:
+        model = _model(table)
+        fields = [model_field.attname
+                  for model_field in model._meta.concrete_fields
+                  if model_field.name != field]
+        user_rows[table] = list(model.objects.values(
+            *fields, word_name=F(f'{field}__name')))
+    return user_rows
+
+
+def _restore_user_rows(user_rows):
+    """Puts back the rows saved by _save_user_rows() whose word was restored
+
+    Returns dict of table -> rows put back.
+    """
+    names = {row['word_name'] for rows in user_rows.values() for row in rows}
+    base_word_ids = dict(_model('baseword').objects
+                         .filter(name__in=names).values_list('name', 'id'))
+    counts = {}
+    for (table, field) in USER_TABLES:
+        model = _model(table)
+        kept = []
+        for row in user_rows[table]:
+            base_word_id = base_word_ids.get(row.pop('word_name'))
+            if base_word_id is not None:
+                kept.append(model(**row, **{f'{field}_id': base_word_id}))
+        model.objects.bulk_create(kept, batch_size=CHUNK_SIZE)
+        counts[table] = len(kept)
+    return counts
+
+
+def _insert(model, fields, rows):
+    """Bulk inserts rows into model in chunks, returns the number of rows"""
+    count = 0
+    while True:
+        chunk = [model(**dict(zip(fields, row)))
+                 for row in islice(rows, CHUNK_SIZE)]
+        if not chunk:
+            return count
+        model.objects.bulk_create(chunk)
+        count += len(chunk)
+
+
+def _reset_sequences(models):
+    """Moves the id sequences past the restored ids, where the db has them"""
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
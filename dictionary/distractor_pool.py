@@ -0,0 +1,117 @@
+"""In-process pool of wrong answers for the vocab game
+
+Every question of the game used to load the name of every synonym in the
+db, drop the ones linked to the test word and copy the rest into a list,
+just to pick three of them. distractor_pool keeps those names in memory
+instead, grouped by the part of speech of the word they belong to, so a
+question draws random positions from a list:
+
+    from dictionary.distractor_pool import distractor_pool
+    names = distractor_pool.sample(3, pos='verb',
+                                   exclude_base_word_ids=[...])
+
+The pool is filled from the db the first time it's used. Before every draw,
+the synonyms linked since then, by this process or any other, are added
+with one query on ids higher than the last one loaded. Synonyms that get
+deleted stay in the pool until it's cleared, e.g. by a dictionary restore.
+
+Words whose base word is excluded are never returned, so passing the test
+word and the base words of its synonyms means no distractor is one of its
+synonyms. Draws that land on an excluded word are drawn again, and if most
+of a group is excluded the group is gone through instead. A part of speech
+without enough words falls back to the words of every part of speech.
+"""
+
+import random
+import threading
+from dictionary import models
+
+#Draws per distractor before going through the whole group instead
+MAX_DRAWS = 10
+
+
+class NotEnoughDistractors(ValueError):
+    """Raised when the pool doesn't have enough words that aren't excluded"""
+
+
+class DistractorPool:
+    """Synonym names by part of speech, sampled without scanning them"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def refresh(self):
+        """Adds the synonyms linked since the last refresh"""
+        rows = list(models.Synonym.objects
+                          .filter(id__gt=self._last_id)
+                          .order_by('id')
+                          .values_list('id', 'synonym__name',
+                                       'synonym__base_word_id',
+                                       'synonym__base_word__formword'
+                                       '__pos__name'))
+        if not rows:
+            return
+        with self._lock:
+            for (synonym_id, name, base_word_id, pos) in rows:
+                #Loaded by a refresh in another thread in the meantime
+                if synonym_id <= self._last_id:
+                    continue
+                for group in {None, pos}:
+                    if (group, name) not in self._seen:
+                        self._seen.add((group, name))
+                        self._groups.setdefault(group, []).append(
+                            (name, base_word_id))
+            self._last_id = max(self._last_id, rows[-1][0])
+
+    def sample(self, k, pos=None, exclude_base_word_ids=()):
+        """Returns k names of different base words, picked at random
+
+        Keyword arguments:
+        k -- number of names
+        pos -- name of the part of speech to pick from, if it has enough
+        words
+        exclude_base_word_ids -- base words whose names can't be picked
+
+        Raises NotEnoughDistractors if there aren't k base words to pick.
+        """
+        self.refresh()
+        excluded = set(exclude_base_word_ids)
+        groups = [pos, None] if pos is not None else [None]
+        for group in groups:
+            names = _pick(self._groups.get(group, []), k, excluded)
+            if names is not None:
+                return names
+        raise NotEnoughDistractors(f'Fewer than {k} words to pick from')
+
+    def clear(self):
+        """Empties the pool, it's loaded again the next time it's used"""
+        with self._lock:
+            self._groups = {}
+            self._seen = set()
+            self._last_id = 0
+
+
+def _pick(candidates, k, excluded):
+    """Returns k names from candidates of base words not in excluded
+
+    Returns None if there aren't k such base words.
+    """
+    picks = {}
+    if len(candidates) >= k:
+        for _ in range(k * MAX_DRAWS):
+            (name, base_word_id) = random.choice(candidates)
+            if base_word_id not in excluded:
+                picks.setdefault(base_word_id, name)
+                if len(picks) == k:
+                    return list(picks.values())
+    #Mostly excluded words, go through the group once
+    allowed = {}
+    for (name, base_word_id) in candidates:
+        if base_word_id not in excluded:
+            allowed.setdefault(base_word_id, name)
+    if len(allowed) < k:
+        return None
+    return random.sample(list(allowed.values()), k)
+
+
+distractor_pool = DistractorPool()
@@ -0,0 +1,109 @@
+"""Cache of the rendered entry page of every base word
+
+Entries hardly ever change once they've been scraped, but every visit to a
+word's page used to query the whole entry and render it again. The entry
+part of the page is now rendered once and kept in the 'entries' cache (see
+CACHES in argot/settings.py), together with the few fields of the word the
+views need, so a word that's already cached is served without querying the
+entry.
+
+Cached entries are keyed by base word id and a version. Whenever the scraper
+writes definitions, spellings or synonyms of a word, it moves the word to a
+new version once the transaction commits, which makes the old copy
+unreachable. The version is kept in the same cache, so with the default
+file based cache, scrape workers running in their own process invalidate
+the pages cached by the web server too.
+
+Main Functions:
+    get_entry(base_word_id)
+        Returns a dict with the id, name, searched_synonym and html of the
+        entry of a base word, from the cache if it's there. Returns None if
+        there's no such base word.
+
+    invalidate(base_word_ids)
+        Moves the given base words to a new version.
+
+    invalidate_on_commit(base_word_ids)
+        Same, but once the current transaction commits, so that nobody can
+        cache the entry as it was before the transaction in between.
+
+Settings:
+    CACHES['entries'] -- cache the entries are kept in, the default cache is
+    used if there isn't one
+"""
+
+import uuid
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.template.loader import render_to_string
+from dictionary import entry_documents, models
+
+CACHE_ALIAS = 'entries'
+
+
+def _cache():
+    if CACHE_ALIAS in settings.CACHES:
+        return caches[CACHE_ALIAS]
+    return caches['default']
+
+
+def _version_key(base_word_id):
+    return f'entry-version:{base_word_id}'
+
+
+def _version(cache, base_word_id):
+    """Returns the current version of a base word, starting one if needed"""
+    key = _version_key(base_word_id)
+    version = cache.get(key)
+    if version is None:
+        #Only the first process to start a version gets to set it
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def get_entry(base_word_id):
+    """Returns the cached entry of a base word, rendering it if needed"""
+    cache = _cache()
+    key = f'entry:{base_word_id}:{_version(cache, base_word_id)}'
+    entry = cache.get(key)
+    if entry is None:
+        document = entry_documents.get_document(base_word_id)
+        if document is None:
+            return None
+        entry = {
+            'id': document['id'],
+            'name': document['name'],
+            'searched_synonym': document['searched_synonym'],
+            'html': render_to_string('dictionary/entry.html',
+                                     {'entry': document}),
+        }
+        cache.set(key, entry)
+    return entry
+
+
+def invalidate(base_word_ids):
+    """Moves base words to a new version, their cached entries are dropped"""
+    _cache().set_many({_version_key(base_word_id): uuid.uuid4().hex
+                       for base_word_id in set(base_word_ids)},
+                      timeout=None)
+
+
+def invalidate_on_commit(base_word_ids):
+    """Invalidates base words once the current transaction commits"""
+    base_word_ids = list(base_word_ids)
+    transaction.on_commit(lambda: invalidate(base_word_ids))
+
+
+def clear():
+    """Drops every cached entry, e.g. after restoring the dictionary"""
+    _cache().clear()
+
+
+@receiver(post_save, sender=models.BaseWord)
+@receiver(post_delete, sender=models.BaseWord)
+def invalidate_base_word(sender, instance, **kwargs):
+    invalidate_on_commit([instance.id])
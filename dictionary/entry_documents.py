@@ -0,0 +1,198 @@
+"""Denormalized copy of every entry, read with a single query
+
+An entry is spread over BaseWord, VariantWord, FormWord, PartOfSpeech,
+WordDefinition, ExampleSentence, Synonym and Antonym, so reading one takes
+a query per table even with with_entry(). Each base word also gets an
+EntryDocument row holding the whole entry as json:
+
+    {"id": 2, "name": "bolster", "searched_synonym": true,
+     "variants": ["bolster", "bolstered"],
+     "forms": [{"pos": "verb",
+                "definitions": [{"definition": "...",
+                                 "examples": ["..."]}]}],
+     "synonyms": [{"name": "support", "base_word_id": 7}],
+     "antonyms": []}
+
+The scraper rebuilds the documents of the words it writes once the
+transaction that wrote them commits. Adding a word writes its entry, its
+spellings and its synonyms in separate steps that each ask for a rebuild,
+so each write is wrapped in rebuild_once(), which collects the base words
+asked for and rebuilds each of them once at the end. Documents for the
+words that were in the db before documents existed are built by a
+migration, restoring a dump builds the documents of the restored words,
+and build_entry_documents builds any that are missing or out of date.
+Reading never writes: a word without an up to date document gets one
+built on the fly, which isn't saved.
+
+Main Functions:
+    get_document(base_word_id)
+        Returns the document of a base word. Returns None if there's no
+        such base word.
+
+    get_documents(base_word_ids)
+        Returns a dict of base word id -> document for the given base words,
+        with a single query once their documents are built.
+
+    rebuild(base_word_ids)
+        Builds the documents of the given base words again from the
+        dictionary tables, and drops their cached entry pages and rebuilds
+        the quiz indexes of their word lists once the current transaction
+        commits. Inside of rebuild_once(), the words are only collected.
+
+    rebuild_once()
+        Context manager around a write, the base words rebuild() is asked
+        for in the block are rebuilt once, after the transaction commits.
+        Nested blocks leave the rebuilding to the outermost one.
+
+        Example:
+            with entry_documents.rebuild_once(), transaction.atomic():
+                ...
+
+    backfill(rebuild_all=False, batch_size=BATCH_SIZE)
+        Builds the documents that are missing or out of date, every
+        document if rebuild_all. Returns the number of documents built.
+
+        Example:
+            python3 manage.py build_entry_documents
+"""
+
+import threading
+from contextlib import contextmanager
+from django.db import transaction
+from django.db.models import Prefetch
+from dictionary import entry_cache, models, quiz_index
+
+#Format of the documents, bump it when build() changes
+VERSION = 1
+#Base words built at a time by backfill()
+BATCH_SIZE = 500
+#Base word ids collected by the rebuild_once() block this thread is in
+_collected = threading.local()
+
+
+def get_document(base_word_id):
+    """Returns the document of a base word, None if there's no such word"""
+    return get_documents([base_word_id]).get(base_word_id)
+
+
+def get_documents(base_word_ids):
+    """Returns a dict of base word id -> document, building missing ones
+
+    Missing documents are built without saving them, backfill() saves them.
+    """
+    base_word_ids = set(base_word_ids)
+    rows = (models.EntryDocument.objects
+                  .filter(base_word_id__in=base_word_ids, version=VERSION)
+                  .values_list('base_word_id', 'document'))
+    documents = dict(rows)
+    missing = base_word_ids - documents.keys()
+    if missing:
+        documents.update(_build_documents(missing))
+    return documents
+
+
+def rebuild(base_word_ids):
+    """Builds documents again from the entries
+
+    Called after the entries changed, in the same transaction. Inside of a
+    rebuild_once() block the base words are only collected, and rebuilt
+    once the block's transaction commits. The cached entry pages and the
+    quiz indexes of the word lists with these words are updated once the
+    documents are saved.
+    """
+    collected = getattr(_collected, 'ids', None)
+    if collected is not None:
+        collected.update(base_word_ids)
+        return
+    with transaction.atomic():
+        documents = _save_documents(base_word_ids)
+        entry_cache.invalidate_on_commit(documents)
+        quiz_index.words_changed(documents)
+
+
+@contextmanager
+def rebuild_once():
+    """Rebuilds every base word rebuild() is asked for in the block once
+
+    The words are rebuilt when the transaction the block ends in commits,
+    or at the end of the block outside of a transaction. Nothing is rebuilt
+    if the block raises.
+    """
+    if getattr(_collected, 'ids', None) is not None:
+        yield
+        return
+    _collected.ids = collected = set()
+    try:
+        yield
+    finally:
+        _collected.ids = None
+    if collected:
+        transaction.on_commit(lambda: rebuild(collected))
+
+
+def _save_documents(base_word_ids):
+    """Builds and saves the documents of base words, returns them by id"""
+    documents = _build_documents(base_word_ids)
+    models.EntryDocument.objects.bulk_create(
+        [models.EntryDocument(base_word_id=base_word_id, version=VERSION,
+                              document=document)
+         for base_word_id, document in documents.items()],
+        update_conflicts=True, unique_fields=['base_word'],
+        update_fields=['version', 'document', 'built'])
+    return documents
+
+
+def _build_documents(base_word_ids):
+    """Builds the documents of base words, returns them by id"""
+    base_words = (models.BaseWord.objects.with_entry()
+                        .prefetch_related(
+                            Prefetch('formword_set__worddefinition_set'
+                                     '__examplesentence_set',
+                                     queryset=models.ExampleSentence.objects
+                                                    .order_by('id')),
+                            Prefetch('variantword_set',
+                                     queryset=models.VariantWord.objects
+                                                    .order_by('id')))
+                        .filter(id__in=set(base_word_ids)))
+    return {base_word_.id: build(base_word_) for base_word_ in base_words}
+
+
+def build(base_word_):
+    """Returns the document of a base word loaded by rebuild()"""
+    return {
+        'id': base_word_.id,
+        'name': base_word_.name,
+        'searched_synonym': base_word_.searched_synonym,
+        'variants': [variant_word.name
+                     for variant_word in base_word_.variantword_set.all()],
+        'forms': [{'pos': form_word.pos.name,
+                   'definitions': [_definition(definition) for definition
+                                   in form_word.worddefinition_set.all()]}
+                  for form_word in base_word_.formword_set.all()],
+        'synonyms': [_link(synonym.synonym)
+                     for synonym in base_word_.synonym_set.all()],
+        'antonyms': [_link(antonym.antonym)
+                     for antonym in base_word_.antonym_set.all()],
+    }
+
+
+def _definition(definition):
+    return {'definition': definition.definition,
+            'examples': [example.sentence for example
+                         in definition.examplesentence_set.all()]}
+
+
+def _link(variant_word):
+    return {'name': variant_word.name,
+            'base_word_id': variant_word.base_word_id}
+
+
+def backfill(rebuild_all=False, batch_size=BATCH_SIZE):
+    """Builds missing or outdated documents in batches, returns how many"""
+    base_word_ids = models.BaseWord.objects.order_by('id')
+    if not rebuild_all:
+        base_word_ids = base_word_ids.exclude(entrydocument__version=VERSION)
+    base_word_ids = list(base_word_ids.values_list('id', flat=True))
+    for start in range(0, len(base_word_ids), batch_size):
+        rebuild(base_word_ids[start:start + batch_size])
+    return len(base_word_ids)
@@ -0,0 +1,132 @@
+"""Keeps entries up to date with Merriam-Webster without downloading them all
+
+Entries used to be scraped once and never looked at again. Refreshing them
+asks Merriam-Webster for each page with the ETag and Last-Modified it sent the
+last time (If-None-Match / If-Modified-Since), so pages that haven't changed
+come back as an empty 304. A page that did come back is only parsed and
+written when the entry part of it changed, which is checked by comparing
+its sha256 with the one stored in EntryVersion. The first refresh of a
+word has nothing to compare with, so it always updates the entry.
+
+Words are refreshed stalest and most viewed first. Words that have never
+been refreshed go first, most viewed first, followed by the rest in order
+of days since their last refresh times (1 + view_count).
+
+Main Functions:
+    refresh(limit=None, min_age=None)
+        limit: max number of words to refresh, None refreshes every word
+        that's due
+        min_age: seconds since its last refresh before a word is due again,
+        defaults to the SCRAPER_REFRESH_MIN_AGE setting
+
+        Returns a dict counting the words that were unchanged, changed,
+        missing or failed.
+
+        Example:
+            python3 manage.py refresh_entries --limit 500
+
+    due_words(limit=None, min_age=None)
+        Returns the base words that are due for a refresh, in the order
+        they'd be refreshed in.
+
+    refresh_word(base_word_)
+        Refreshes a single base word and returns its status.
+"""
+
+import hashlib
+from datetime import timedelta
+import requests
+from django.conf import settings
+from django.db.models import (DurationField, ExpressionWrapper, F, Q,
+                              Value)
+from django.utils import timezone
+from dictionary import models, single_flight
+from dictionary import merriam_webster_scraper as mws
+
+UNCHANGED = 'unchanged'
+CHANGED = 'changed'
+MISSING = 'missing'
+FAILED = 'failed'
+
+
+def refresh(limit=None, min_age=None):
+    """Refreshes the words that are due, returns a dict of status -> count"""
+    counts = {UNCHANGED: 0, CHANGED: 0, MISSING: 0, FAILED: 0}
+    for base_word_ in due_words(limit, min_age):
+        #CircuitOpenError isn't caught, every word after this one would fail
+        try:
+            status = refresh_word(base_word_)
+        except requests.exceptions.RequestException as e:
+            print(f'{base_word_.name}: {e}')
+            status = FAILED
+        counts[status] += 1
+        print(f'{base_word_.name}: {status}')
+    return counts
+
+
+def due_words(limit=None, min_age=None):
+    """Returns the base words due for a refresh, most urgent first
+
+    The priority is worked out, sorted and limited by the db, so only the
+    words that are refreshed get loaded. Words that have never been
+    refreshed have no staleness, which sorts them first.
+    """
+    if min_age is None:
+        min_age = getattr(settings, 'SCRAPER_REFRESH_MIN_AGE',
+                          30 * 24 * 60 * 60)
+    now = timezone.now()
+    base_words = (models.BaseWord.objects
+                        .filter(Q(entryversion__isnull=True)
+                                | Q(entryversion__fetched__lt=now
+                                    - timedelta(seconds=min_age)))
+                        .annotate(staleness=ExpressionWrapper(
+                            (Value(now) - F('entryversion__fetched'))
+                            * (1 + F('view_count')),
+                            output_field=DurationField()))
+                        .order_by(F('staleness').desc(nulls_first=True),
+                                  '-view_count', 'id'))
+    return list(base_words[:limit] if limit is not None else base_words)
+
+
+def refresh_word(base_word_):
+    """Asks for the page of a base word again, updates it if it changed"""
+    version = models.EntryVersion.objects.filter(base_word=base_word_).first()
+    if version is None:
+        version = models.EntryVersion(base_word=base_word_)
+    headers = {}
+    if version.etag:
+        headers['If-None-Match'] = version.etag
+    if version.last_modified:
+        headers['If-Modified-Since'] = version.last_modified
+    r = mws.request_entry_page(base_word_.name, headers)
+    if r.status_code == 304:
+        status = UNCHANGED
+    elif r.status_code == 404:
+        status = MISSING
+    else:
+        r.raise_for_status()
+        digest = entry_digest(r.content)
+        if digest == version.digest:
+            status = UNCHANGED
+        else:
+            mws.update_entry(base_word_, r.content)
+            version.digest = digest
+            status = CHANGED
+        version.etag = r.headers.get('ETag', '')
+        version.last_modified = r.headers.get('Last-Modified', '')
+    version.fetched = timezone.now()
+    with single_flight.write_lock:
+        version.save()
+    return status
+
+
+def entry_digest(content):
+    """Returns the sha256 of the entry part of a page
+
+    Ads and scripts around the entry change on every request, so only
+    div#definition-wrapper is hashed.
+    """
+    text = mws.entry_section(content)
+    if text is None:
+        text = content.decode('utf-8', 'replace')
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
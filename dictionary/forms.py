@@ -1,7 +1,8 @@
 from django import forms
 from django.core.exceptions import ValidationError
-from dictionary import merriam_webster_scraper as mws
 from .models import VariantWord, BaseWord
+from dictionary import not_found_cache
+from dictionary.variant_index import variant_index
 
 
 class SearchWordForm(forms.Form):
@@ -17,28 +18,32 @@ class SearchWordForm(forms.Form):
         return search_term
 
     def clean(self):
+        """Checks that a word was entered that might be in the dictionary
+
+        Words that aren't in the dictionary yet are looked up in the
+        background by the view, see dictionary/scrape_jobs.py. Words
+        Merriam-Webster recently didn't have are turned down right away.
+        """
         cleaned_data = super().clean()
         search_term = cleaned_data.get('search_term')
-        if search_term:
-            variant_word_list = VariantWord.objects.all().values_list('name',
-                                                                      flat=True)
-            if search_term not in variant_word_list:
-                found_word = mws.scrape_word(search_term, True)
-                if not found_word:
-                    raise ValidationError('Cannot find word in dictionary')
-        else:
+        if not search_term:
             raise ValidationError('Must enter a word')
+        if (search_term not in variant_index
+                and not_found_cache.is_missing(search_term)):
+            raise ValidationError('Cannot find word in dictionary')
 
 
 class VocabTestAnswer(forms.Form):
-    """Form to see if user was correct in identifying a synonym"""
-    correct_choice = forms.CharField(max_length=50)
+    """Form to see if user was correct in identifying a synonym
+
+    question is the position of the question in the batch kept in the
+    session, the answer is graded there, see dictionary/quiz_sessions.py.
+    """
     choice = forms.CharField(max_length=50)
-    base_word = forms.CharField(max_length=50)
+    question = forms.IntegerField(min_value=0)
 
     def clean(self):
         cleaned_data = super().clean()
-        correct_answer = cleaned_data.get('correct_choice')
         choice = cleaned_data.get('choice')
         if choice is None:
             raise ValidationError('You must select an answer!')
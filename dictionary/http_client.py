@@ -0,0 +1,161 @@
+"""Shared HTTP session used for every request the scraper makes
+
+Creating a new connection for every page means a new TCP and TLS handshake
+for every word, synonym and revised search we look up. This module keeps one
+requests Session for the whole process whose connections are kept alive and
+pooled, so consecutive requests to Merriam-Webster reuse the same sockets.
+
+Main Functions:
+    get(url)
+        Makes a GET request through the shared session using the configured
+        timeouts and returns the requests Response. Depending on
+        SCRAPER_HTTP_MODE, the response is also recorded or is replayed from
+        an earlier recording instead (see dictionary/http_replay.py).
+
+    configure(pool_size=None, connect_timeout=None, read_timeout=None)
+        Replaces the shared session with one using the given settings. Any
+        argument left as None uses the value from settings.py.
+
+    stats()
+        Returns a dict with the number of requests made, the number of new
+        connections opened and how many requests reused an open connection.
+        reset_stats() sets the counters back to zero.
+
+Settings:
+    SCRAPER_POOL_SIZE -- max number of connections kept open per host
+    SCRAPER_CONNECT_TIMEOUT -- seconds to wait while opening a connection
+    SCRAPER_READ_TIMEOUT -- seconds to wait for the server to send data
+"""
+
+import threading
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from dictionary import http_replay
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+#urllib3 can only decode br responses when a brotli package is installed
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = 'gzip, deflate, br'
+    except ImportError:
+        ACCEPT_ENCODING = 'gzip, deflate'
+
+
+class ConnectionStats:
+    """Thread safe counters for requests and newly opened connections"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.new_connections = 0
+
+    def add_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def add_connection(self):
+        with self._lock:
+            self.new_connections += 1
+
+    def as_dict(self):
+        with self._lock:
+            reused = max(self.requests - self.new_connections, 0)
+            return {'requests': self.requests,
+                    'new_connections': self.new_connections,
+                    'reused_connections': reused,
+                    }
+
+
+connection_stats = ConnectionStats()
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        connection_stats.add_connection()
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        connection_stats.add_connection()
+        return super()._new_conn()
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools count every connection they open"""
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CountingHTTPConnectionPool,
+            'https': _CountingHTTPSConnectionPool,
+        }
+
+
+_session = None
+_timeout = None
+_session_lock = threading.RLock()
+
+
+def configure(pool_size=None, connect_timeout=None, read_timeout=None):
+    """Builds the shared session, missing arguments are read from settings"""
+    global _session, _timeout
+    if pool_size is None:
+        pool_size = getattr(settings, 'SCRAPER_POOL_SIZE', 10)
+    if connect_timeout is None:
+        connect_timeout = getattr(settings, 'SCRAPER_CONNECT_TIMEOUT', 5)
+    if read_timeout is None:
+        read_timeout = getattr(settings, 'SCRAPER_READ_TIMEOUT', 10)
+    session = requests.Session()
+    session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+    adapter = PooledHTTPAdapter(pool_connections=pool_size,
+                                pool_maxsize=pool_size, pool_block=True)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    with _session_lock:
+        old_session = _session
+        _session = session
+        _timeout = (connect_timeout, read_timeout)
+    if old_session is not None:
+        old_session.close()
+    return session
+
+
+def get_session():
+    """Returns the shared session, creating it the first time it's needed"""
+    with _session_lock:
+        if _session is None:
+            configure()
+        return _session
+
+
+def get(url, **kwargs):
+    """GET request through the shared session, returns a requests Response"""
+    mode = http_replay.mode()
+    if mode == http_replay.REPLAY or (mode == http_replay.RECORD
+                                      and http_replay.is_synthetic(url)):
+        return http_replay.load(url)
+    session = get_session()
+    kwargs.setdefault('timeout', _timeout)
+    connection_stats.add_request()
+    response = session.get(url, **kwargs)
+    if mode == http_replay.RECORD:
+        http_replay.save(url, response)
+    return response
+
+
+def stats():
+    """Returns the request and connection counters as a dict"""
+    return connection_stats.as_dict()
+
+
+def reset_stats():
+    """Sets the request and connection counters back to zero"""
+    connection_stats.reset()
@@ -0,0 +1,130 @@
+"""Records the scraper's HTTP responses and plays them back offline
+
+The tests that look words up on Merriam-Webster used to need the network,
+which made them slow and flaky and kept them from running offline. Every
+request the scraper makes goes through http_client.get(), which checks
+SCRAPER_HTTP_MODE:
+
+    'live'    requests go to the site, nothing is recorded (the default)
+    'record'  requests go to the site and every response is saved
+    'replay'  responses are read back from the recordings, a request that
+              wasn't recorded raises MissingRecording
+
+Outside of live mode the scraper also skips its page cache, so that every
+page is recorded or replayed instead of coming from an earlier run.
+
+Each response is saved as a json file with its status code, a few of its
+headers and its body, under SCRAPER_HTTP_FIXTURE_DIR in a directory per host,
+e.g. www.merriam-webster.com/dictionary/back.json. The files are plain text
+so changes to them show up in diffs.
+
+Some recordings were written by hand instead of recorded, e.g. for words
+whose real pages the tests can't get at. They're marked "synthetic": true,
+load() sets synthetic on the responses read from them and is_synthetic()
+tells them apart, so they're never taken for Merriam-Webster's markup. In
+record mode they're replayed instead of going to the site, so recording
+again never replaces them with a page the tests weren't written for.
+
+The tests in dictionary/tests.py replay by default. To record the responses
+again, run them against the site:
+
+    SCRAPER_HTTP_MODE=record python3 manage.py test
+
+Main Functions:
+    save(url, response)
+        Records the response for url.
+
+    load(url)
+        Returns the recorded response for url as a requests Response, with
+        synthetic set if the recording was written by hand.
+
+    is_synthetic(url)
+        Returns True if the recording for url was written by hand.
+
+Settings:
+    SCRAPER_HTTP_MODE -- 'live', 'record' or 'replay'
+    SCRAPER_HTTP_FIXTURE_DIR -- directory the recordings are kept in
+"""
+
+import json
+import os
+import tempfile
+from urllib.parse import urlsplit
+import requests
+from django.conf import settings
+from requests.structures import CaseInsensitiveDict
+from dictionary.page_cache import normalize_url
+
+LIVE = 'live'
+RECORD = 'record'
+REPLAY = 'replay'
+#Headers the scraper might look at, the rest aren't worth keeping
+RECORDED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Location',
+                    'Retry-After')
+
+
+class MissingRecording(Exception):
+    """Raised in replay mode for a request that was never recorded"""
+
+
+def mode():
+    return getattr(settings, 'SCRAPER_HTTP_MODE', LIVE)
+
+
+def recording_path(url):
+    """Returns the file the response for url is recorded in"""
+    fixture_dir = getattr(settings, 'SCRAPER_HTTP_FIXTURE_DIR', None)
+    if fixture_dir is None:
+        fixture_dir = os.path.join(os.path.dirname(__file__), 'fixtures',
+                                   'http')
+    parts = urlsplit(normalize_url(url))
+    segments = [segment for segment in parts.path.split('/') if segment]
+    if not segments:
+        segments = ['index']
+    segments[-1] += '.json'
+    return os.path.join(fixture_dir, parts.netloc, *segments)
+
+
+def save(url, response):
+    """Records a requests Response for url"""
+    path = recording_path(url)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    recording = {
+        'url': url,
+        'status_code': response.status_code,
+        'headers': {header: response.headers[header]
+                    for header in RECORDED_HEADERS
+                    if header in response.headers},
+        'body': response.content.decode('utf-8', 'replace'),
+    }
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(recording, f, indent=1, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def load(url):
+    """Returns the recorded response for url as a requests Response"""
+    path = recording_path(url)
+    try:
+        with open(path, encoding='utf-8') as f:
+            recording = json.load(f)
+    except FileNotFoundError:
+        raise MissingRecording(f'No recorded response for {url}') from None
+    response = requests.Response()
+    response.url = url
+    response.status_code = recording['status_code']
+    response.headers = CaseInsensitiveDict(recording['headers'])
+    response.encoding = 'utf-8'
+    response._content = recording['body'].encode('utf-8')
+    response.synthetic = recording.get('synthetic', False)
+    return response
+
+
+def is_synthetic(url):
+    """Returns True if the recording for url was written by hand"""
+    try:
+        with open(recording_path(url), encoding='utf-8') as f:
+            return json.load(f).get('synthetic', False)
+    except FileNotFoundError:
+        return False
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from dictionary import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Times restoring a dictionary dump against loaddata of the same '
+            'rows on a throwaway database and prints the results as json')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--copies', type=int, default=10,
+                            help='copies of the initial dictionary to load')
+        parser.add_argument('--output', default=None,
+                            help='file to write the json to')
+
+    def handle(self, *args, **options):
+        with benchmark.throwaway_database():
+            report = benchmark.run_restore(options['copies'])
+        report['commit'] = benchmark.current_commit()
+        output = benchmark.dumps(report)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        self.stdout.write(output)
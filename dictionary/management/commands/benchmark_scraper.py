@@ -0,0 +1,55 @@
+import contextlib
+import sys
+from django.core.management.base import BaseCommand
+from dictionary import benchmark, models
+
+
+class Command(BaseCommand):
+    help = ('Times the scraper against a local stand-in for Merriam-Webster '
+            'on a throwaway database and prints the results as json')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--words', type=int, default=40,
+                            help='number of made up words to look up')
+        parser.add_argument('--word-file', default=None,
+                            help='look up the words in this file instead')
+        parser.add_argument('--latency', type=float, default=0.05,
+                            help='seconds the server waits before answering')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='threads used to look up lists of words')
+        parser.add_argument('--parse-workers', type=int, default=None,
+                            help='processes used to parse lists of words')
+        parser.add_argument('--min-interval', type=float, default=0.0,
+                            help='seconds between two requests')
+        parser.add_argument('--page-size', type=int,
+                            default=benchmark.PAGE_SIZE,
+                            help='bytes made up pages are padded to')
+        parser.add_argument('--output', default=None,
+                            help='file to write the json to')
+
+    def handle(self, *args, **options):
+        if options['word_file']:
+            with open(options['word_file']) as f:
+                words = [line.strip() for line in f if line.strip()]
+        else:
+            words = [f'benchword{i:04d}' for i in range(options['words'])]
+        report = self._run_on_test_db(words, options)
+        report['commit'] = benchmark.current_commit()
+        output = benchmark.dumps(report)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        self.stdout.write(output)
+
+    def _run_on_test_db(self, words, options):
+        """Runs the benchmark on a test database that's dropped afterwards"""
+        with benchmark.throwaway_database():
+            #Only look up the benchmark's words, not the initial data's
+            models.BaseWord.objects.all().delete()
+            #Keep the scraper's progress messages out of the json
+            with contextlib.redirect_stdout(sys.stderr):
+                return benchmark.run(words, latency=options['latency'],
+                                     workers=options['workers'],
+                                     parse_workers=options['parse_workers'],
+                                     min_interval=options['min_interval'],
+                                     page_size=options['page_size'])
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from dictionary import entry_documents
+
+
+class Command(BaseCommand):
+    help = ('Builds the entry documents of the base words that don\'t have '
+            'an up to date one yet')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='rebuild every document, not just the '
+                                 'missing ones')
+        parser.add_argument('--batch-size', type=int,
+                            default=entry_documents.BATCH_SIZE,
+                            help='base words built at a time')
+
+    def handle(self, *args, **options):
+        built = entry_documents.backfill(rebuild_all=options['all'],
+                                         batch_size=options['batch_size'])
+        self.stdout.write(f'Built {built} entry documents')
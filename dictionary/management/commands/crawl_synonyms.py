@@ -0,0 +1,40 @@
+import requests
+from django.core.management.base import BaseCommand
+from dictionary import models
+from dictionary import synonym_crawler
+from dictionary.retry_policy import CircuitOpenError
+from dictionary.single_flight import LeaseTimeout
+
+
+class Command(BaseCommand):
+    help = ('Looks up words breadth first through their synonyms and '
+            'antonyms. Run without words to resume the last crawl.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('seeds', nargs='*',
+                            help='words to start crawling from')
+        parser.add_argument('--max-depth', type=int, default=2,
+                            help='how many synonyms away from the seeds to go')
+        parser.add_argument('--max-words', type=int, default=None,
+                            help='max number of words in the whole crawl')
+        parser.add_argument('--limit', type=int, default=None,
+                            help='stop after crawling this many words')
+        parser.add_argument('--reset', action='store_true',
+                            help='forget the previous crawl before starting')
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            synonym_crawler.reset()
+        try:
+            crawled = synonym_crawler.crawl(options['seeds'],
+                                            max_depth=options['max_depth'],
+                                            max_words=options['max_words'],
+                                            limit=options['limit'])
+        except (CircuitOpenError, LeaseTimeout,
+                requests.exceptions.RequestException) as e:
+            #The word being crawled stays pending, so the crawl can resume
+            self.stderr.write(f'Stopped crawling: {e}')
+            return
+        pending = models.CrawlFrontier.objects \
+                        .filter(status=models.CrawlFrontier.PENDING).count()
+        self.stdout.write(f'Crawled {crawled} words, {pending} left to crawl')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from dictionary import dictionary_dump
+
+
+class Command(BaseCommand):
+    help = 'Writes the whole dictionary to a compact gzipped dump'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='file to write the dump to')
+
+    def handle(self, *args, **options):
+        counts = dictionary_dump.dump(options['path'])
+        self.stdout.write(', '.join(f'{count} {table}'
+                                    for table, count in counts.items()))
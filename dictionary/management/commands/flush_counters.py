@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from dictionary import counters
+
+
+class Command(BaseCommand):
+    help = 'Adds the pending view and guess counts to the rows they count'
+
+    def handle(self, *args, **options):
+        flushed = counters.flush()
+        self.stdout.write(f'Applied {flushed} pending counts')
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from dictionary import word_importer
+
+
+class Command(BaseCommand):
+    help = ('Looks up every new word in a plain text or gzipped word file, '
+            'one word per line, picking up where the last run stopped')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='word file to import')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='words looked up at once')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='threads downloading pages')
+        parser.add_argument('--synonyms', action='store_true',
+                            help='look up the synonyms of every word too')
+        parser.add_argument('--restart', action='store_true',
+                            help='start again from the first line')
+
+    def handle(self, *args, **options):
+        try:
+            checkpoint = word_importer.import_words(
+                options['path'], batch_size=options['batch_size'],
+                search_synonym=options['synonyms'],
+                restart=options['restart'], workers=options['workers'],
+                stdout=self.stdout)
+        except word_importer.ImportStopped as e:
+            self.stderr.write(f'Stopped importing: {e}')
+            return
+        self.stdout.write(f'Imported {checkpoint.lines} lines: '
+                          f'{checkpoint.found} found, {checkpoint.not_found} '
+                          f'not found, {checkpoint.failed} failed')
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from dictionary import not_found_cache
+
+
+class Command(BaseCommand):
+    help = ('Forgets words Merriam-Webster had no entry for, so they are '
+            'looked up again the next time someone searches for them')
+
+    def add_arguments(self, parser):
+        parser.add_argument('words', nargs='*',
+                            help='words to forget, every word if left out')
+        parser.add_argument('--expired', action='store_true',
+                            help='only forget words whose ttl has passed')
+
+    def handle(self, *args, **options):
+        purged = not_found_cache.purge(words=options['words'] or None,
+                                       expired_only=options['expired'])
+        self.stdout.write(f'Forgot {purged} words')
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from dictionary import entry_refresh
+from dictionary.retry_policy import CircuitOpenError
+
+
+class Command(BaseCommand):
+    help = ('Asks Merriam-Webster for the stalest and most viewed entries '
+            'again and updates the ones that changed')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None,
+                            help='max number of words to refresh')
+        parser.add_argument('--min-age', type=int, default=None,
+                            help='only refresh words not refreshed for this '
+                                 'many seconds')
+
+    def handle(self, *args, **options):
+        try:
+            counts = entry_refresh.refresh(limit=options['limit'],
+                                           min_age=options['min_age'])
+        except CircuitOpenError as e:
+            self.stderr.write(f'Stopped refreshing: {e}')
+            return
+        self.stdout.write(', '.join(f'{count} {status}'
+                                    for status, count in counts.items()))
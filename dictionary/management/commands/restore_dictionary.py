@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from dictionary import dictionary_dump
+
+
+class Command(BaseCommand):
+    help = 'Loads a dictionary written by dump_dictionary'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='dump to load')
+        parser.add_argument('--replace', action='store_true',
+                            help='delete the dictionary in the db first. '
+                                 'Word list entries and stats are kept for '
+                                 'the words in the dump, the ones for '
+                                 'words missing from it are deleted')
+
+    def handle(self, *args, **options):
+        try:
+            counts = dictionary_dump.restore(options['path'],
+                                             replace=options['replace'])
+        except dictionary_dump.DumpError as e:
+            raise CommandError(e)
+        self.stdout.write(', '.join(f'{count} {table}'
+                                    for table, count in counts.items()))
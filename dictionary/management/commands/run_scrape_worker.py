@@ -0,0 +1,32 @@
+import time
+from django.core.management.base import BaseCommand
+from dictionary import counters, scrape_jobs
+
+
+class Command(BaseCommand):
+    help = ('Looks up the words queued by the website on Merriam-Webster, '
+            'and adds up the view and guess counts')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='exit once the queue is empty')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='seconds to wait when the queue is empty')
+        parser.add_argument('--stale-timeout', type=int, default=600,
+                            help='requeue running jobs whose worker '
+                                 "hasn't checked in for this many seconds, "
+                                 'e.g. after it was killed')
+
+    def handle(self, *args, **options):
+        scrape_jobs.requeue_stale(options['stale_timeout'])
+        while True:
+            counters.flush_if_due()
+            job = scrape_jobs.run_next()
+            if job is not None:
+                self.stdout.write(f'{job.word}: {job.status}')
+                continue
+            if options['once']:
+                counters.flush()
+                break
+            time.sleep(options['poll_interval'])
+            scrape_jobs.requeue_stale(options['stale_timeout'])
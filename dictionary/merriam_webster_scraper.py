@@ -21,7 +21,84 @@ Main Functions:
             from dictionary import merriam_webster_scraper as mws
             mws.scrape_word('bolster', True)
 
-    load_list_of_words(filename)
+    look_up_word(word, search_synonym=False)
+        Same as scrape_word, but returns the word whose entry was found, e.g.
+        the word a misspelling redirected to, or None.
+
+    parse_entry(soup, word)
+        soup: BeautifulSoup of a word's entry page
+        word: the word that was looked up
+
+        Extracts the base word, parts of speech, definitions, examples,
+        spellings and synonyms from a page into a ParsedEntry without touching
+        the database. scrape_word then writes the ParsedEntry to the database
+        with a few bulk queries per table instead of one query per row.
+
+    request_entry_page(word, headers=None)
+    update_entry(base_word_, content)
+        Download the page of a word that's already in the dictionary again,
+        and bring its entry in line with it. Used by
+        dictionary/entry_refresh.py, which only hashes entry_section(content)
+        of a page to tell whether it changed.
+
+    scrape_words(words, search_synonym=False, workers=None,
+                 parse_workers=None, pools=None)
+        words: iterable of words to lookup
+        search_synonym: same as for scrape_word
+        workers: number of threads fetching pages at once, defaults to the
+        SCRAPER_WORKERS setting
+        parse_workers: number of processes parsing pages at once, defaults to
+        the SCRAPER_PARSE_WORKERS setting
+        pools: pools opened with pipeline_pools(), to share them between
+        calls. workers and parse_workers are ignored when they're given
+
+        Concurrent version of scrape_word used by the bulk loading functions.
+        Words go through a pipeline: pages are downloaded by a pool of
+        threads, parsed by a pool of processes so that every core is used,
+        and written to the database by a single writer, one word at a time so
+        that two words finishing at the same time can't step on each other.
+        Requests to Merriam-Webster are spaced out by a rate limiter shared
+        between all of the threads. Returns a dict mapping each word to the
+        return value of scrape_word.
+
+        Every page downloaded is also kept in the on-disk page cache (see
+        dictionary/page_cache.py), so looking up the same word again doesn't
+        go back to the network until the cached page expires.
+
+        Requests that time out, fail to connect or get a 429 or 5xx are
+        retried with backoff, and a circuit breaker stops making requests
+        for a while when Merriam-Webster keeps failing (see
+        dictionary/retry_policy.py). circuit_breaker.status() shows its
+        state.
+
+        Example:
+            python3 manage.py shell
+            from dictionary import merriam_webster_scraper as mws
+            mws.scrape_words(['bolster', 'capricious'], True, workers=2)
+
+    pipeline_pools(workers=None, parse_workers=None)
+        Context manager that opens the pools of threads and processes
+        scrape_words runs words through. Every call to scrape_words opens its
+        own, and starting the parse processes takes a while since each one
+        sets up Django, so callers looking words up in many batches open them
+        once and pass them to every call.
+
+        Example:
+            with mws.pipeline_pools() as pools:
+                for batch in batches:
+                    mws.scrape_words(batch, pools=pools)
+
+    parse_stats
+        Counts the pages parsed in this process or its parse processes and
+        the seconds spent parsing them. parse_stats.as_dict() returns them
+        and parse_stats.reset() sets them back to zero.
+
+    Lookups of the same word by different threads or processes are
+    coalesced, the first one downloads and writes the entry while the others
+    wait for it and then find the word in the database (see
+    dictionary/single_flight.py).
+
+    load_list_of_words(filename, workers=None, parse_workers=None)
         filename: name of file to lookup stored in dictionary/word_lists/
 
         Scraped the definition of every word in the file. Each line should be a
@@ -35,7 +112,7 @@ Main Functions:
             from dictionary import merriam_webster_scraper as mws
             mws.load_list_of_words('top_gre_words.txt')
 
-    fill_in_synonyms()
+    fill_in_synonyms(workers=None, parse_workers=None)
         This function will look at all of the synonyms for the base words whose
         synonyms we have not added yet. Depending on how many words are in the
         database, this function could take a while to complete. Fills in
@@ -47,19 +124,107 @@ Main Functions:
             mws.fill_in_synonyms()
 """
 
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer, UnicodeDammit
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor,
+                                ThreadPoolExecutor, wait)
+from contextlib import contextmanager, nullcontext
+from urllib.parse import urlsplit
+import django
+import multiprocessing
 import requests
+import threading
 import time
 import random
 import os
 import re
-from dictionary import models
-from django.db import transaction
+from dictionary import (entry_documents, http_client, http_replay, models,
+                        not_found_cache, single_flight)
+from dictionary.page_cache import page_cache
+from dictionary.retry_policy import (CircuitBreaker, CircuitOpenError,
+                                     RetryPolicy, RETRY_EXCEPTIONS,
+                                     RETRY_STATUSES)
+from dictionary.variant_index import variant_index
+from django.conf import settings
+from django.db import connection, transaction
 from django.db.models import F
 from django.db.utils import IntegrityError
 
 
-@transaction.atomic()
+BASE_URL = 'https://www.merriam-webster.com/dictionary/'
+#Start of the section of the page that has every part of the entry we use
+_WRAPPER_START = re.compile(
+    r'<div\b[^>]*\bid\s*=\s*["\']?definition-wrapper\b', re.IGNORECASE)
+#div tags, and the comments and scripts that might have text that looks like
+#one, which is skipped when looking for the end of the section
+_DIV_TAG = re.compile(r'<!--.*?-->|<(script|style)\b.*?</\1\s*>|<(/?)div\b',
+                      re.IGNORECASE | re.DOTALL)
+
+
+class RateLimiter:
+    """Spaces out requests made to the same host, shared between threads
+
+    Every request to a host has to wait until min_interval seconds have passed
+    since the previous request to that host was allowed through. The next free
+    slot is reserved while holding the lock and the actual sleeping is done
+    outside of it, so waiting threads don't block requests to other hosts.
+    """
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        """Blocks until a request to the host of url is allowed"""
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+rate_limiter = RateLimiter(getattr(settings, 'SCRAPER_MIN_REQUEST_INTERVAL',
+                                   1.0))
+retry_policy = RetryPolicy(getattr(settings, 'SCRAPER_MAX_RETRIES', 4),
+                           getattr(settings, 'SCRAPER_BACKOFF_BASE', 1.0),
+                           getattr(settings, 'SCRAPER_BACKOFF_MAX', 60))
+circuit_breaker = CircuitBreaker(
+    getattr(settings, 'SCRAPER_BREAKER_THRESHOLD', 5),
+    getattr(settings, 'SCRAPER_BREAKER_COOLDOWN', 60))
+#Only one thread at a time writes a dictionary entry or a lease to the db
+_db_lock = single_flight.write_lock
+
+
+class ParseStats:
+    """Thread safe counters for the pages parsed and the time it took
+
+    Pages are mostly parsed in other processes, which time themselves and
+    hand the seconds back with the ParsedEntry, so they're added up here.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.pages = 0
+            self.seconds = 0.0
+
+    def add(self, seconds):
+        with self._lock:
+            self.pages += 1
+            self.seconds += seconds
+
+    def as_dict(self):
+        with self._lock:
+            return {'pages': self.pages, 'seconds': self.seconds}
+
+
+parse_stats = ParseStats()
+
+
 def scrape_word(word, search_synonym=False):
     """Scrape entry for page and loads into database
 
@@ -67,148 +232,628 @@ def scrape_word(word, search_synonym=False):
     word -- word to add to database
     search_synonym -- boolean to add all synonyms listed to database as well
 
+    Only one lookup of a word runs at a time, even across processes, see
+    dictionary/single_flight.py. Pages are downloaded and parsed without
+    holding _db_lock, which is only taken to write them, so a slow request
+    doesn't hold up the other threads' writes. A page that redirects to
+    another word, and the synonyms of the word with search_synonym, are
+    looked up the same way once the entry is written, each in its own
+    lookup.
+
     Returns True if word found, False if not
     """
-    if _already_entered(word, search_synonym):
-        return True
-    url = 'https://www.merriam-webster.com/dictionary/' + word
-    try:
-        r = requests.get(url, timeout=10)
-    except requests.exceptions.Timeout:
-        time.sleep(5)
-        return scrape_word(word, search_synonym)
-    if r.status_code == 404:
-        return False
-    soup = BeautifulSoup(r.content, 'html5lib')
-    _manage_dictionary_entries(soup, word, search_synonym)
-    return True
+    return look_up_word(word, search_synonym) is not None
+
+
+def look_up_word(word, search_synonym=False):
+    """Same as scrape_word(), but returns the word whose entry was found
+
+    Keyword arguments:
+    word -- word to add to database
+    search_synonym -- boolean to add all synonyms listed to database as well
+
+    Returns word, or the word its page redirected to, whose entry is in the
+    database now. The spelling that redirected isn't always stored with the
+    entry. Returns None if no entry was found.
+    """
+    found = _look_up(word)
+    if found is not None and search_synonym:
+        _search_synonyms(found)
+    return found
+
+
+def scrape_words(words, search_synonym=False, workers=None,
+                 parse_workers=None, pools=None):
+    """Scrapes a batch of words with a fetch, parse and write pipeline
+
+    Keyword arguments:
+    words -- iterable of words to add to the database
+    search_synonym -- boolean to add all synonyms listed to database as well
+    workers -- number of threads, defaults to the SCRAPER_WORKERS setting
+    parse_workers -- number of processes parsing pages, defaults to the
+    SCRAPER_PARSE_WORKERS setting, 0 parses the pages in this thread
+    pools -- (fetch pool, parse pool) from pipeline_pools(), None opens new
+    pools for this batch
+
+    Pages are downloaded by a pool of threads and parsed into ParsedEntry
+    objects by a pool of processes, so parsing isn't held up by the GIL.
+    Every entry is then written by this thread alone while holding _db_lock,
+    so entries are still added one at a time and a word that was entered by
+    somebody else while we were downloading it is caught by _scrape_word
+    before anything gets written.
+
+    With search_synonym, the synonyms of every word are sent through the
+    pipeline as a second batch once the words are in, and are then linked to
+    their words.
+
+    A word that couldn't be downloaded, e.g. while Merriam-Webster is down,
+    doesn't stop the rest of the batch.
+
+    Returns dict of word -> True if word found, False if not, None if the
+    word couldn't be looked up
+    """
+    if pools is None:
+        with pipeline_pools(workers, parse_workers) as pools:
+            return scrape_words(words, search_synonym, pools=pools)
+    (fetch_pool, parse_pool) = pools
+    words = list(dict.fromkeys(words))
+    results = _run_pipeline(words, fetch_pool, parse_pool)
+    if search_synonym:
+        found = [word for word in words if results[word]]
+        _run_pipeline(_synonyms_to_look_up(found), fetch_pool, parse_pool)
+        for word in found:
+            try:
+                scrape_word(word, True)
+            except (CircuitOpenError, single_flight.LeaseTimeout,
+                    requests.exceptions.RequestException) as e:
+                print(f'{word}: {e}')
+    return results
 
 
-def load_list_of_words(filename):
+@contextmanager
+def pipeline_pools(workers=None, parse_workers=None):
+    """Opens the pools scrape_words runs words through, for several calls
+
+    Keyword arguments:
+    workers -- number of threads, defaults to the SCRAPER_WORKERS setting
+    parse_workers -- number of processes parsing pages, defaults to the
+    SCRAPER_PARSE_WORKERS setting, 0 parses the pages in the writing thread
+
+    Yields (fetch pool, parse pool), which are shut down when the block
+    ends.
+    """
+    if workers is None:
+        workers = getattr(settings, 'SCRAPER_WORKERS', 4)
+    if parse_workers is None:
+        parse_workers = getattr(settings, 'SCRAPER_PARSE_WORKERS', None)
+    if parse_workers is None:
+        parse_workers = os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=workers) as fetch_pool, \
+            _parse_pool(parse_workers) as parse_pool:
+        yield (fetch_pool, parse_pool)
+
+
+def load_list_of_words(filename, workers=None, parse_workers=None):
     """Loads list of words and adds to db if not already in"""
     word_list_file = os.path.join('dictionary', 'word_lists', filename)
     word_list = _load_word_list(word_list_file)
-    variant_word_set = models.VariantWord.objects.values_list('name', flat=True)
-    for word in word_list:
-        if word not in variant_word_set:
-            print(word)
-            scrape_word(word, search_synonym=True)
-            time.sleep(1)
+    words = [word for word in word_list if word not in variant_index]
+    results = scrape_words(words, search_synonym=True, workers=workers,
+                           parse_workers=parse_workers)
+    _print_results(results)
 
 
-def fill_in_synonyms():
+def fill_in_synonyms(workers=None, parse_workers=None):
     """Adds the synonyms for all basewords that haven't been added yet"""
     qs = models.BaseWord.objects.filter(searched_synonym=False)
-    for word in qs:
-        print(word.name)
-        scrape_word(word.name, search_synonym=True)
-        time.sleep(2)
-
-
-def _already_entered(word, search_synonym):
-    """Checks to see if a word is already entered.
-
-    If a word has been entered, check if the synonyms have been searched. If
-    they haven't and search_synonym is true, then lookup all of the words
-    associated with the baseword in the SynonymsToLookUp table
-    """
-    variant_word_set = models.VariantWord.objects.all().values_list('name',
-                                                                    flat=True)
-    if word in variant_word_set:
-        if search_synonym:
-            base_word_ = models.VariantWord.objects.get(name=word).base_word
-            if not base_word_.searched_synonym:
-                synonyms_to_lookup = base_word_.synonymstolookup_set.all()
-                for synonym in synonyms_to_lookup:
-                    if synonym.is_synonym:
-                        print(f'Looking up the synonym: {synonym.lookup_word}')
-                    else:
-                        print(f'Looking up the antonym: {synonym.lookup_word}')
-                    valid_word = scrape_word(synonym.lookup_word)
-                    synonym_word = synonym.lookup_word
-                    if valid_word:
-                        synonym_vw = models.VariantWord.objects \
-                                                       .get(name=synonym_word)
-                        if synonym.is_synonym:
-                            _ = models.Synonym.objects \
-                                      .get_or_create(base_word=base_word_,
-                                                     synonym=synonym_vw)
-                        else:
-                            _ = models.Antonym.objects \
-                                      .get_or_create(base_word=base_word_,
-                                                     antonym=synonym_vw)
-                    synonym.delete()
-                base_word_.searched_synonym = True
-                base_word_.save()
-        return True
-    else:
-        return False
+    words = qs.values_list('name', flat=True)
+    results = scrape_words(words, search_synonym=True, workers=workers,
+                           parse_workers=parse_workers)
+    _print_results(results)
+
+
+def _print_results(results):
+    """Prints the words of a batch that were found, one per line"""
+    for (word, found) in results.items():
+        if found:
+            print(word)
+
+
+def _look_up(word):
+    """Adds the entry for word to the db unless it's already there
+
+    The page is downloaded and parsed holding the lease on word, but not
+    _db_lock, which is only taken to write the entry. A page that redirects
+    to another word is followed once the lease on word is released.
+
+    Returns the word whose entry was found, the word the page redirected to
+    for a redirect, None if not found
+    """
+    with single_flight.lease(word):
+        if word in variant_index:
+            return word
+        content = _fetch_page(word)
+        if content is None:
+            return None
+        (entry, seconds) = _parse_page(word, content)
+        parse_stats.add(seconds)
+        if entry.redirect is None:
+            with _db_lock:
+                _scrape_word(word, entry)
+            return word
+    print(f'revising search from {word} to {entry.redirect}')
+    return _look_up(entry.redirect)
+
+
+@transaction.atomic()
+def _scrape_word(word, entry):
+    """Adds the ParsedEntry of the page for word to the db
+
+    Must be called holding _db_lock. Nothing is written if somebody else
+    entered the word since its page was downloaded. The synonyms on the page
+    are stored in SynonymsToLookUp, for _search_synonyms() to look up. The
+    entry documents of the words written are built once it commits.
+    """
+    if word in variant_index:
+        return
+    with entry_documents.rebuild_once():
+        base_word_ = _save_entry(entry, False)
+        if base_word_ is not None:
+            _create_synonym_lookups(base_word_, entry.synonyms)
+
+
+def _search_synonyms(word):
+    """Looks up the synonyms stored for the base word of word and links them
+
+    Every synonym that isn't in the db yet is looked up on its own with
+    scrape_word(), without holding _db_lock, and then they're all linked to
+    the base word in a single write.
+    """
+    base_word_ = models.BaseWord.objects.filter(variantword__name=word).first()
+    if base_word_ is None or base_word_.searched_synonym:
+        return
+    lookups = list(base_word_.synonymstolookup_set.all())
+    links = []
+    for lookup in lookups:
+        if lookup.lookup_word in variant_index:
+            synonym_vw = models.VariantWord.objects.get(name=lookup.lookup_word)
+        else:
+            synonym_vw = _handle_creating_synonyms(lookup.lookup_word,
+                                                   lookup.is_synonym)
+        if synonym_vw is not None:
+            links.append((synonym_vw, lookup.is_synonym))
+    with _db_lock, transaction.atomic(), entry_documents.rebuild_once():
+        link_synonyms(base_word_, links)
+        models.SynonymsToLookUp.objects \
+              .filter(id__in=[lookup.id for lookup in lookups]).delete()
+        models.BaseWord.objects.filter(id=base_word_.id) \
+                      .update(searched_synonym=True)
+        entry_documents.rebuild([base_word_.id])
+
+
+def _parse_pool(parse_workers):
+    """Returns the process pool pages are parsed in, None for no processes
+
+    Processes are spawned rather than forked, since forking a process that
+    already has threads and db connections isn't safe. Each one sets up
+    Django once when it starts, and only starts once there's a page for it.
+    """
+    if not parse_workers:
+        return nullcontext()
+    return ProcessPoolExecutor(max_workers=parse_workers,
+                               mp_context=multiprocessing.get_context('spawn'),
+                               initializer=django.setup)
+
+
+def _run_pipeline(words, fetch_pool, parse_pool):
+    """Fetches, parses and writes words, returns dict of word -> result
+
+    Keyword arguments:
+    fetch_pool -- ThreadPoolExecutor the pages are downloaded in
+    parse_pool -- ProcessPoolExecutor the pages are parsed in, None to parse
+    them in this thread
+
+    The lease on a word is taken by the thread downloading it and released
+    once its entry is written, so the word is still only looked up once
+    across processes.
+    """
+    results = {}
+    owners = {}
+    pending = {}
+    for word in words:
+        if word in variant_index:
+            results[word] = True
+        else:
+            pending[fetch_pool.submit(_fetch_in_thread, word)] = word
+    try:
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                word = pending.pop(future)
+                try:
+                    result = future.result()
+                except (CircuitOpenError, single_flight.LeaseTimeout,
+                        requests.exceptions.RequestException) as e:
+                    results[word] = None
+                    print(f'{word}: {e}')
+                    continue
+                if word not in owners:
+                    owners[word], content = result
+                    if content is None:
+                        results[word] = word in variant_index
+                        single_flight.release(word, owners.pop(word))
+                        continue
+                    if parse_pool is not None:
+                        pending[parse_pool.submit(_parse_page, word,
+                                                  content)] = word
+                        continue
+                    result = _parse_page(word, content)
+                (entry, seconds) = result
+                parse_stats.add(seconds)
+                results[word] = _write_entry(word, owners.pop(word), entry)
+    finally:
+        for future in pending:
+            future.cancel()
+        for (word, owner) in owners.items():
+            single_flight.release(word, owner)
+    return results
+
+
+def _fetch_in_thread(word):
+    """Takes the lease on word and downloads its page
+
+    Returns (lease owner, page content). The content is None if the word
+    has no page, or was entered by whoever had the lease before us.
+    """
+    try:
+        owner = single_flight.acquire(word)
+        try:
+            if word in variant_index:
+                return (owner, None)
+            return (owner, _fetch_page(word))
+        except BaseException:
+            single_flight.release(word, owner)
+            raise
+    finally:
+        #Each thread gets its own connection, which Django won't close for us
+        connection.close()
+
+
+def _write_entry(word, owner, entry):
+    """Writes the ParsedEntry of word and then releases the lease on it
+
+    A page that redirects to another word is followed once the lease is
+    released.
+    """
+    try:
+        if entry.redirect is None:
+            with _db_lock:
+                _scrape_word(word, entry)
+            return True
+    finally:
+        single_flight.release(word, owner)
+    print(f'revising search from {word} to {entry.redirect}')
+    return _look_up(entry.redirect) is not None
+
 
+def _parse_page(word, content):
+    """Parses a downloaded page, returns (ParsedEntry, seconds it took)
 
-def _manage_dictionary_entries(soup, word, search_synonym):
-    """Searches soup for pertinent sections and sends to functions to handle"""
+    Runs in the parse processes, so it must not touch the db.
+    """
+    start = time.perf_counter()
+    entry = parse_entry(_make_soup(content), word)
+    return (entry, time.perf_counter() - start)
+
+
+def _synonyms_to_look_up(words):
+    """Returns the synonyms stored for words that aren't in the db yet"""
+    lookups = (models.SynonymsToLookUp.objects
+                     .filter(base_word__variantword__name__in=words,
+                             base_word__searched_synonym=False)
+                     .values_list('lookup_word', flat=True))
+    return [word for word in dict.fromkeys(lookups)
+            if word not in variant_index]
+
+
+def _make_soup(content):
+    """Parses the bytes of an entry page into a BeautifulSoup
+
+    Everything parse_entry looks at is inside
+    div#definition-wrapper, so in the default 'targeted' SCRAPER_PARSE_MODE
+    the header, navigation and scripts before it and the footer and scripts
+    after it are cut off before the page is handed to the parser, which
+    only ever sees the few kilobytes of the entry. Its end is found by
+    counting the div tags opened and closed after its start. The
+    section is parsed into the same tree as when parsing the whole page.
+    Faster parsers set with SCRAPER_HTML_PARSER ('lxml' or 'html.parser')
+    also skip building anything outside of the wrapper. The 'full' mode
+    parses the whole page.
+    """
+    parser = getattr(settings, 'SCRAPER_HTML_PARSER', 'html5lib')
+    if getattr(settings, 'SCRAPER_PARSE_MODE', 'targeted') == 'full':
+        return BeautifulSoup(content, parser)
+    fragment = entry_section(content)
+    if fragment is None:
+        return BeautifulSoup(content, parser)
+    if parser == 'html5lib':
+        #html5lib doesn't support parse_only
+        return BeautifulSoup(fragment, parser)
+    strainer = SoupStrainer('div', id='definition-wrapper')
+    return BeautifulSoup(fragment, parser, parse_only=strainer)
+
+
+def entry_section(content):
+    """Returns the text of div#definition-wrapper of a page
+
+    Keyword arguments:
+    content -- bytes of an entry page
+
+    The wrapper has every part of the entry, without the ads, navigation and
+    scripts around it. Returns None if the page doesn't have one.
+    """
+    #We drop the <meta charset> tag, so decode the page while we still have it
+    text = UnicodeDammit(content, is_html=True).unicode_markup
+    match = _WRAPPER_START.search(text)
+    if match is None:
+        return None
+    return text[match.start():_section_end(text, match.start())]
+
+
+def _section_end(text, start):
+    """Returns where the div starting at start ends, len(text) if it doesn't
+
+    Comments and scripts are skipped, so a '</div>' in a string of a script
+    doesn't end the section early.
+    """
+    depth = 0
+    for match in _DIV_TAG.finditer(text, start):
+        closing = match.group(2)
+        if closing is None:
+            continue
+        depth += -1 if closing else 1
+        if depth == 0:
+            end = text.find('>', match.end())
+            return len(text) if end == -1 else end + 1
+    return len(text)
+
+
+def _fetch_page(word):
+    """Returns the entry page for word from the page cache or the site
+
+    Only successful responses are cached. Returns None on a 404, and for
+    words that got a 404 recently without asking again (see
+    dictionary/not_found_cache.py). Failed
+    requests are retried by retry_policy. If the request still fails, or
+    circuit_breaker is open, a stale copy of the page from the cache is
+    returned if there is one, otherwise the error is raised.
+    """
+    url = BASE_URL + word
+    if not_found_cache.is_missing(word):
+        return None
+    #Pages being recorded or replayed have to go through http_client
+    use_cache = http_replay.mode() == http_replay.LIVE
+    if use_cache:
+        content = page_cache.get(url)
+        if content is not None:
+            return content
+    try:
+        r = _request_page(url)
+    except (CircuitOpenError, requests.exceptions.RequestException):
+        content = page_cache.get(url, stale=True) if use_cache else None
+        if content is not None:
+            return content
+        raise
+    if r.status_code == 404:
+        not_found_cache.remember(word)
+        return None
+    if r.status_code == 200 and use_cache:
+        page_cache.put(url, r.content)
+    return r.content
+
+
+def request_entry_page(word, headers=None):
+    """Downloads the page of word, skipping the page cache
+
+    Keyword arguments:
+    word -- word to download the page of
+    headers -- extra request headers, e.g. If-None-Match for a conditional
+    request
+
+    Returns the Response whatever its status, after the same retries as
+    _fetch_page. A page that came back is stored in the page cache, so the
+    next lookup of the word doesn't download it again.
+    """
+    url = BASE_URL + word
+    r = _request_page(url, headers)
+    if r.status_code == 200 and http_replay.mode() == http_replay.LIVE:
+        page_cache.put(url, r.content)
+    return r
+
+
+def _request_page(url, headers=None):
+    """Downloads url with retries and records the outcome in circuit_breaker
+
+    Keyword arguments:
+    headers -- extra request headers, e.g. for a conditional request
+
+    Raises CircuitOpenError without making a request while the circuit is
+    open, and HTTPError if the site still answers with a 429 or 5xx after
+    every retry.
+    """
+    if not circuit_breaker.allow():
+        raise CircuitOpenError(f'Merriam-Webster is down, skipping {url}')
+
+    def send():
+        if http_replay.mode() != http_replay.REPLAY:
+            rate_limiter.wait(url)
+        return http_client.get(url, headers=headers)
+
+    try:
+        r = retry_policy.call(send)
+    except RETRY_EXCEPTIONS:
+        circuit_breaker.record_failure()
+        raise
+    if r.status_code in RETRY_STATUSES:
+        circuit_breaker.record_failure()
+        r.raise_for_status()
+    circuit_breaker.record_success()
+    return r
+
+
+class ParsedForm:
+    """One part of speech of a word and its definitions as found on the page
+
+    base_name -- name of the base word the form belongs to
+    pos -- name of the part of speech
+    definitions -- list of (definition, [example sentences]) tuples
+    """
+    def __init__(self, base_name, pos, definitions):
+        self.base_name = base_name
+        self.pos = pos
+        self.definitions = definitions
+
+    def __repr__(self):
+        return (f'ParsedForm({self.base_name!r}, {self.pos!r}, '
+                f'{self.definitions!r})')
+
+
+class ParsedEntry:
+    """Everything extracted from an entry page, before it is added to the db
+
+    word -- the word that was looked up
+    redirect -- more commonly spelled word the page tells us to look up
+    instead, None if the page has its own entry. Every other attribute is
+    empty when there's a redirect
+    word_name -- name of the word as shown by the first entry on the page
+    base_name -- name of the base word the spellings and synonyms belong to,
+    None if the page doesn't have an entry with a part of speech
+    forms -- list of ParsedForm, in the order they're listed on the page
+    spellings -- list of the different spellings of the word
+    synonyms -- list of (word, is_synonym) tuples of the synonyms and
+    antonyms listed on the page
+    """
+    def __init__(self, word, redirect=None, word_name=None, base_name=None,
+                 forms=None, spellings=None, synonyms=None):
+        self.word = word
+        self.redirect = redirect
+        self.word_name = word_name
+        self.base_name = base_name
+        self.forms = forms or []
+        self.spellings = spellings or []
+        self.synonyms = synonyms or []
+
+    def __repr__(self):
+        return (f'ParsedEntry({self.word!r}, redirect={self.redirect!r}, '
+                f'base_name={self.base_name!r}, forms={self.forms!r}, '
+                f'spellings={self.spellings!r}, synonyms={self.synonyms!r})')
+
+
+def parse_entry(soup, word):
+    """Extracts the entry for word from its page without touching the db
+
+    Keyword arguments:
+    soup -- BeautifulSoup of the entry page
+    word -- the word that was looked up
+
+    Returns a ParsedEntry
+    """
     def_wrapper = soup.find('div', {'id': 'definition-wrapper'})
     left_content = def_wrapper.find('div', {'id' : 'left-content'})
     #If there's an entry, probably a more commonly spelled name to search
     first_entry = left_content.find('div', {'id' : 'dictionary-entry-1'})
     new_word = first_entry.find('a', {'class' : 'cxt', 'rel' : 'prev'})
     if new_word is not None:
-        time.sleep(1)
-        new_word = new_word.getText().strip()
-        print(f'revising search from {word} to {new_word}')
-        return scrape_word(new_word, search_synonym)
-    variant_word_set = models.VariantWord.objects.all().values_list('name',
-                                                                    flat=True)
-    (word_name, base_word_) = _handle_main_dictionary_entry(left_content,
-                                                            variant_word_set,
-                                                            search_synonym)
-    if base_word_ is None:
-        return None
-    _compile_alternate_spellings(left_content, word_name, word, base_word_,
-                                 variant_word_set)
-    _add_synonyms(left_content, base_word_, search_synonym)
-
+        return ParsedEntry(word, redirect=new_word.getText().strip())
+    (word_name, forms) = _parse_main_dictionary_entry(left_content)
+    if not forms:
+        return ParsedEntry(word, word_name=word_name)
+    base_name = forms[0].base_name
+    spellings = _compile_alternate_spellings(left_content, word_name, word)
+    synonyms = [(synonym, is_synonym)
+                for (synonym, is_synonym) in _parse_synonyms(left_content)
+                if synonym != base_name]
+    return ParsedEntry(word, word_name=word_name, base_name=base_name,
+                       forms=forms, spellings=spellings, synonyms=synonyms)
+
+
+def update_entry(base_word_, content):
+    """Brings the entry of a base word in line with a newer copy of its page
 
-def _handle_main_dictionary_entry(left_content, variant_word_set,
-                                  search_synonym):
+    Keyword arguments:
+    base_word_ -- BaseWord whose page was downloaded again
+    content -- bytes of the page
+
+    New definitions, examples, spellings and synonyms are added like for a
+    new word, and definitions that are no longer on the page are deleted
+    along with their examples. Spellings are kept, since other words may
+    list them as synonyms, and synonyms that aren't linked yet are stored
+    to be looked up later. The page is parsed before taking _db_lock, which
+    is held while the entry is written.
+    """
+    entry = parse_entry(_make_soup(content), base_word_.name)
+    if entry.redirect is not None or entry.base_name is None:
+        return
+    with _db_lock, transaction.atomic(), entry_documents.rebuild_once():
+        _save_entry(entry, base_word_.searched_synonym)
+        current = {(form.base_name, form.pos, definition)
+                   for form in entry.forms
+                   for (definition, _) in form.definitions}
+        base_names = {form.base_name for form in entry.forms}
+        definitions = (models.WordDefinition.objects
+                             .filter(form_word__base_word__name__in=base_names)
+                             .values_list('id', 'form_word__base_word__name',
+                                          'form_word__pos__name',
+                                          'definition'))
+        stale = [row[0] for row in definitions if row[1:] not in current]
+        models.WordDefinition.objects.filter(id__in=stale).delete()
+        models.FormWord.objects.filter(base_word__name__in=base_names,
+                                       worddefinition__isnull=True).delete()
+        linked = set((name, True) for name in base_word_.synonym_set
+                     .values_list('synonym__name', flat=True))
+        linked.update((name, False) for name in base_word_.antonym_set
+                      .values_list('antonym__name', flat=True))
+        new_synonyms = [synonym for synonym in entry.synonyms
+                        if synonym not in linked]
+        if new_synonyms:
+            #Left for fill_in_synonyms() to look up
+            _create_synonym_lookups(base_word_, new_synonyms)
+            models.BaseWord.objects.filter(id=base_word_.id) \
+                          .update(searched_synonym=False)
+        entry_documents.rebuild([base_word_.id])
+
+
+def _parse_main_dictionary_entry(left_content):
     """Searches for content containing the main aspects of a dictionary entry
 
     Keyword argument:
     left_content -- section of wepage containing the text of the dictionary
     entries
-    variant_word_set -- list of all spellings of words currently in the
-    database
-    search_synonym -- whether or not we will search for synonyms for the word
 
-    Loops through the main sections of the webpage. Will create the base_word,
-    form_words, the definitions, pos, examples for a word
+    Loops through the main sections of the webpage, broken down by part of
+    speech, and collects the word name, pos, definitions and examples of each.
+
+    Returns:
+    (word_name, forms)
+    word_name -- The word_name of the first entry as appears on the webpage
+    (could be diff from what gets searched)
+    forms -- list of ParsedForm for every entry that has a word name and pos
     """
     entries = (left_content.find_all('div', {'class': 'entry-header'},
                recursive=False))
-    i = 1
-    first_entry = entries[0]
-    remaining_entries = entries[1:]
-    (base_word_, word_name) = _add_base_and_form(first_entry,
-                                                  i, left_content,
-                                                  variant_word_set,
-                                                  search_synonym)
-    #Loop through all definition sections, broken down by part of speech
-    for entry in remaining_entries:
-        i += 1
-        #We only use the return values for the first entry
-        if base_word_ is not None:
-            _ = _add_base_and_form(entry, i, left_content,
-                                   variant_word_set, search_synonym)
-        else:
-            (base_word_, _) = _add_base_and_form(entry, i, left_content,
-                                                    variant_word_set,
-                                                    search_synonym)
-    return (word_name, base_word_)
+    forms = []
+    word_name = None
+    for i, entry in enumerate(entries, start=1):
+        (entry_name, form) = _parse_base_and_form(entry, i, left_content)
+        if i == 1:
+            word_name = entry_name
+        if form is not None:
+            forms.append(form)
+    return (word_name, forms)
 
 
-def _add_base_and_form(entry, i, left_content, variant_word_set,
-                       search_synonym):
-    """Function to add baseword and formword entries to db
+def _parse_base_and_form(entry, i, left_content):
+    """Finds the word name and part of speech of an entry
 
     Keyword arguments:
     entry -- section of page that contains information on the word name and
@@ -217,42 +862,33 @@ def _add_base_and_form(entry, i, left_content, variant_word_set,
     is located
     left_content -- main section that contains all information on the entries
     for words
-    variant_word_set -- list of all spellings of words currently in the
-    database
-    search_synonym -- whether or not we will search for synonyms for the word
 
     Returns:
-    (base_word_, word_name)
-    base_word_ -- BaseWord object for the dictionary page
-    word_name -- The word_name as appears on the webpage (could be diff from
-    what gets searched)
+    (word_name, form)
+    word_name -- The word_name as appears on the webpage, None if it isn't a
+    valid word
+    form -- ParsedForm of the entry, None if the entry doesn't have a word name
+    or part of speech
     """
     word_name = entry.find('div').find(['h1', 'p'], {'class' : 'hword'}) \
                      .getText().lower()
     word_name = _clean_word_name(word_name)
     if word_name is None:
         return (None, None)
-    base_word_, _ = models.BaseWord.objects.get_or_create(name=word_name,
-                        searched_synonym=search_synonym)
-    pos_ = _find_pos(entry)
+    pos_name = _find_pos(entry)
     #If there's no pos, probably not a valid dictionary entry
-    if pos_ is None:
-        return (None, word_name)
-    form_word_, _ = (models.FormWord.objects
-                                    .get_or_create(pos=pos_,
-                                                   base_word=base_word_,))
-    _add_definition_and_examples(i, left_content, form_word_)
-    return (base_word_, word_name)
+    if pos_name is None:
+        return (word_name, None)
+    definitions = _parse_definition_and_examples(i, left_content)
+    return (word_name, ParsedForm(word_name, pos_name, definitions))
 
 
-def _add_definition_and_examples(dictionary_entry_num, left_content,
-                                 form_word_):
+def _parse_definition_and_examples(dictionary_entry_num, left_content):
     """Helper function to find the defintion & example sentence sections
 
     Keyword arguments:
     dictionary_entry_num -- Used to locate the correct HTML tag
     left_content -- The part of the webpage that contains all pertinent info
-    form_word_ -- FormWord object to link definition to
 
     Merriam webster does not keep all information for an entry in one parent
     HTML tag. Instead, it puts information regarding the word name and part of
@@ -260,13 +896,13 @@ def _add_definition_and_examples(dictionary_entry_num, left_content,
     sentence in the next tag. We use the dictionary_entry_num to locate the
     associated definition entry with the correct word and pos.
 
-    Returns nothing, as we just create the entries unless they are already in
-    the database.
+    Returns list of (definition, [example sentences]) tuples
     """
     def_entry_num = 'dictionary-entry-' + str(dictionary_entry_num)
     def_entry = left_content.find('div', {'id' :  def_entry_num})
     definition_headers = def_entry.find_all('div', {'class' : 'vg'},
                                             recursive=False)
+    definitions_list = []
     for def_header in definition_headers:
         definitions = def_header.find_all('span', {'class' : 'dtText'})
         for definition in definitions:
@@ -274,40 +910,33 @@ def _add_definition_and_examples(dictionary_entry_num, left_content,
             extra_text = definition.find_all('span', {'class' : 'ex-sent'})
             examples = definition.find_all('span', {'class' : 't'})
             clean_defs = _clean_definition(definition, extra_text)
+            example_texts = [_clean_example_text(example.getText())
+                             for example in examples]
             for clean_def in clean_defs:
-                word_def, _ = models.WordDefinition.objects \
-                                    .get_or_create(form_word=form_word_,
-                                                   definition=clean_def)
-                for example in examples:
-                    example_text = _clean_example_text(example.getText())
-                    _, _ = models.ExampleSentence.objects \
-                                 .get_or_create(definition=word_def,
-                                                sentence=example_text)
+                definitions_list.append((clean_def, example_texts))
+    return definitions_list
 
 
 def _find_pos(entry):
-    """Helper function to find the pos on the site and return pos object
+    """Helper function to find the pos on the site and return its name
 
     Keyword arguments:
     entry -- the section of HTML that contains word_name, def, and pos
 
     The part of speech can be found in different sections. Most of the time it
     it stored in the 'import-blue-link' class within the entry. Otherwise, it
-    is in the 'fl' class. If it isn't in either of those, return a None. If it
-    is found, returns a PartOfSpeech object.
+    is in the 'fl' class. If it isn't in either of those, return a None.
     """
     try:
-        pos_text = _clean_pos_text(entry
-                       .find('a', {'class' : 'important-blue-link'})
-                       .getText())
+        return _clean_pos_text(entry
+                   .find('a', {'class' : 'important-blue-link'})
+                   .getText())
     except AttributeError:
         try:
-            pos_text = _clean_pos_text(entry.find('span' , {'class' : 'fl'})
-                                       .getText())
+            return _clean_pos_text(entry.find('span' , {'class' : 'fl'})
+                                   .getText())
         except AttributeError:
             return None
-    pos_, _ = models.PartOfSpeech.objects.get_or_create(name=pos_text)
-    return pos_
 
 
 def _clean_example_text(example_text):
@@ -369,9 +998,8 @@ def _clean_word_name(word):
         return match.group(0)
 
 
-def _compile_alternate_spellings(left_content, word_name, word, base_word_,
-                             variant_word_set):
-    """Search the page to add all the alternatative spellings of a word
+def _compile_alternate_spellings(left_content, word_name, word):
+    """Search the page for all the alternatative spellings of a word
 
     Merriam webster sometimes stores this info in two parts, thus the adding
     of the words in 'variants' section an dalso the 'alternate_forms' sections
@@ -383,37 +1011,22 @@ def _compile_alternate_spellings(left_content, word_name, word, base_word_,
         other_words = other_word_section.find_all('div', {'class' : 'uro'})
     else:
         other_words = []
-    different_spellings = set()
-    different_spellings.add(word_name)
-    different_spellings.add(word)
+    different_spellings = [word_name, word]
     for variant in variants:
-        different_spellings.add(variant.getText().strip())
+        different_spellings.append(variant.getText().strip())
     for alternate_form in alternate_forms:
          different_forms = alternate_form.find_all('span', {'class' : 'if'})
          for different_form in different_forms:
-             different_spellings.add(different_form.getText().strip())
+             different_spellings.append(different_form.getText().strip())
     for other_word in other_words:
-        different_spellings.add(other_word.find('span', {'class' : 'ure'})
-                                          .getText().strip())
-    different_spellings = [spelling for spelling in different_spellings
-                           if spelling not in variant_word_set]
-    for spelling in different_spellings:
-        _, _ = (models.VariantWord.objects.get_or_create(base_word=base_word_,
-                                                         name=spelling))
-
+        different_spellings.append(other_word.find('span', {'class' : 'ure'})
+                                             .getText().strip())
+    return [spelling for spelling in dict.fromkeys(different_spellings)
+            if spelling]
 
-def _add_synonyms(left_content, base_word_, search_synonym):
-    """Adds synonyms to database
-
-    Keyword arguments:
-    left_content -- the portion of the merriam-webster webpage that stores the
-    pertinent information for building our entry
-    base_word_ -- BaseWord object associated with the word we are looking up
-    search_synonym -- tells us whether to lookup the synonyms or stow them in
-    the SynonymsToLookUp table
 
-    Adds synonyms listed on page, checks to see if words are in database,
-    if they are not, call scrape_word() to add them and then add to database.
+def _parse_synonyms(left_content):
+    """Finds the synonyms and antonyms listed on the page
 
     The large issue with getting synonyms on Merriam-Webster is that sometimes
     Merriam-Webster's entry for a word does not have the synonym/antonym section
@@ -422,6 +1035,8 @@ def _add_synonyms(left_content, base_word_, search_synonym):
     section, while _scrape_alternative_synonym_section() handles the alternative
     synonym section. They return a list that contains a tuple that stores a list
     of words to add to the dictionary and synonym table.
+
+    Returns list of (word, is_synonym) tuples without duplicates
     """
     try:
         synonym_list = _scrape_main_synonym_section(left_content)
@@ -429,11 +1044,17 @@ def _add_synonyms(left_content, base_word_, search_synonym):
         try:
             synonym_list = _scrape_alternative_synonym_section(left_content)
         except AttributeError:
-            return
-    if search_synonym:
-        _create_synonyms(left_content, base_word_, synonym_list)
-    else:
-        _create_synonym_lookups(left_content, base_word_, synonym_list)
+            return []
+    p = re.compile('(^[\w\-]*)')
+    synonyms = []
+    for (pos_synonym_flag, word_list) in synonym_list:
+        synonym_flag = p.match(pos_synonym_flag).group(1)
+        is_synonym = synonym_flag == 'synonyms'
+        for word in word_list:
+            word_text = _clean_word_name(word.getText().lower())
+            if word_text is not None:
+                synonyms.append((word_text, is_synonym))
+    return list(dict.fromkeys(synonyms))
 
 
 def _scrape_main_synonym_section(left_content):
@@ -472,57 +1093,139 @@ def _scrape_alternative_synonym_section(left_content):
     return synonym_list
 
 
-def _create_synonyms(left_content, base_word_, synonym_list):
-    """Creates synonyms for a word"""
-    p = re.compile('(^[\w\-]*)')
-    for (pos_synonym_flag, word_list) in synonym_list:
-        for word in word_list:
-            variant_word_set = models.VariantWord.objects.values_list('name',
-                                                                      flat=True)
-            word_text = _clean_word_name(word.getText().lower())
-            if word_text == base_word_.name:
-                continue
-            m = p.match(pos_synonym_flag)
-            synonym_flag = m.group(1)
-            if word_text not in variant_word_set:
-                synonym_variant_word = _handle_creating_synonyms(word_text,
-                                           variant_word_set, synonym_flag)
-            else:
-                synonym_variant_word = models.VariantWord.objects.all() \
-                                             .get(name=word_text)
-            if synonym_flag == 'synonyms':
-                _, _ = models.Synonym.objects \
-                             .get_or_create(base_word=base_word_,
-                                            synonym=synonym_variant_word)
-            else:
-                _, _ = models.Antonym.objects \
-                             .get_or_create(base_word=base_word_,
-                                            antonym=synonym_variant_word)
-
-
-def _create_synonym_lookups(left_content, base_word_, synonym_list):
+def _save_entry(entry, search_synonym):
+    """Adds a ParsedEntry to the db with a few bulk queries per table
+
+    Keyword arguments:
+    entry -- ParsedEntry returned by parse_entry()
+    search_synonym -- value of searched_synonym for newly created base words
+
+    Rows that are already in the db are left alone, so saving the same entry
+    twice doesn't create duplicates. Returns the BaseWord the spellings and
+    synonyms belong to, None if the entry doesn't have one.
+    """
+    if entry.base_name is None:
+        return None
+    base_names = [form.base_name for form in entry.forms]
+    base_word_ids = _get_or_create_ids(
+        models.BaseWord, ['name'], [(name,) for name in base_names],
+        searched_synonym=search_synonym)
+    pos_ids = _get_or_create_ids(models.PartOfSpeech, ['name'],
+                                 [(form.pos,) for form in entry.forms])
+    form_keys = [(base_word_ids[(form.base_name,)], pos_ids[(form.pos,)])
+                 for form in entry.forms]
+    form_word_ids = _get_or_create_ids(models.FormWord,
+                                       ['base_word_id', 'pos_id'], form_keys)
+    definition_keys = []
+    example_rows = []
+    for form, form_key in zip(entry.forms, form_keys):
+        for (definition, examples) in form.definitions:
+            definition_key = (form_word_ids[form_key], definition)
+            definition_keys.append(definition_key)
+            example_rows.extend((definition_key, example)
+                                for example in examples)
+    definition_ids = _get_or_create_ids(models.WordDefinition,
+                                        ['form_word_id', 'definition'],
+                                        definition_keys)
+    example_keys = [(definition_ids[definition_key], example)
+                    for (definition_key, example) in example_rows]
+    _get_or_create_ids(models.ExampleSentence, ['definition_id', 'sentence'],
+                       example_keys)
+    base_word_id = base_word_ids[(entry.base_name,)]
+    known_spellings = set(models.VariantWord.objects
+                                .filter(name__in=entry.spellings)
+                                .values_list('name', flat=True))
+    new_spellings = [spelling for spelling in entry.spellings
+                     if spelling not in known_spellings]
+    models.VariantWord.objects.bulk_create(
+        [models.VariantWord(base_word_id=base_word_id, name=spelling)
+         for spelling in new_spellings])
+    #bulk_create doesn't send the post_save signal that updates the index
+    variant_index.add(new_spellings)
+    entry_documents.rebuild(base_word_ids.values())
+    return models.BaseWord.objects.get(id=base_word_id)
+
+
+def _get_or_create_ids(model, fields, keys, **defaults):
+    """Bulk version of get_or_create, returns a dict of key -> id
+
+    Keyword arguments:
+    model -- model class to look up and create rows for
+    fields -- field names that together identify a row
+    keys -- list of tuples of values for fields, missing rows are created in
+    this order
+    defaults -- extra field values for the rows that get created
+
+    Uses one query to find the existing rows and one bulk insert for the
+    missing ones. Not every database hands back the ids of bulk created rows,
+    so on those they are looked up again afterwards.
+    """
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return {}
+    lookup = {f'{fields[0]}__in': {key[0] for key in keys}}
+
+    def existing_ids():
+        rows = model.objects.filter(**lookup).values_list(*fields, 'id')
+        return {tuple(row[:-1]): row[-1] for row in rows}
+
+    ids = existing_ids()
+    missing = [key for key in keys if key not in ids]
+    if missing:
+        created = model.objects.bulk_create(
+            [model(**dict(zip(fields, key)), **defaults) for key in missing])
+        if all(obj.pk is not None for obj in created):
+            ids.update((key, obj.pk) for key, obj in zip(missing, created))
+        else:
+            ids = existing_ids()
+    return ids
+
+
+def link_synonyms(base_word_, links):
+    """Creates the Synonym and Antonym rows for a base word in bulk
+
+    Keyword arguments:
+    base_word_ -- BaseWord object the synonyms belong to
+    links -- list of (VariantWord, is_synonym) tuples
+    """
+    synonym_ids = set(base_word_.synonym_set
+                                .values_list('synonym_id', flat=True))
+    antonym_ids = set(base_word_.antonym_set
+                                .values_list('antonym_id', flat=True))
+    synonyms = []
+    antonyms = []
+    for (variant_word, is_synonym) in links:
+        if is_synonym and variant_word.id not in synonym_ids:
+            synonym_ids.add(variant_word.id)
+            synonyms.append(models.Synonym(base_word=base_word_,
+                                           synonym=variant_word))
+        elif not is_synonym and variant_word.id not in antonym_ids:
+            antonym_ids.add(variant_word.id)
+            antonyms.append(models.Antonym(base_word=base_word_,
+                                           antonym=variant_word))
+    models.Synonym.objects.bulk_create(synonyms)
+    models.Antonym.objects.bulk_create(antonyms)
+    if synonyms or antonyms:
+        entry_documents.rebuild([base_word_.id])
+
+
+def _create_synonym_lookups(base_word_, synonyms):
     """Stows away synonyms to lookup when we don't have to look them up now"""
-    p = re.compile('(^[\w\-]*)')
-    for (pos_synonym_flag, word_list) in synonym_list:
-        for word in word_list:
-            word_text = _clean_word_name(word.getText().lower())
-            if word_text == base_word_.name:
-                continue
-            m = p.match(pos_synonym_flag)
-            synonym_flag = m.group(1)
-            is_synonym = synonym_flag == 'synonyms'
-            _, _ = models.SynonymsToLookUp.objects \
-                         .get_or_create(base_word=base_word_,
-                                        lookup_word=word_text,
-                                        is_synonym=is_synonym)
+    existing = set(base_word_.synonymstolookup_set
+                             .values_list('lookup_word', 'is_synonym'))
+    models.SynonymsToLookUp.objects.bulk_create(
+        [models.SynonymsToLookUp(base_word=base_word_, lookup_word=word_text,
+                                 is_synonym=is_synonym)
+         for (word_text, is_synonym) in synonyms
+         if (word_text, is_synonym) not in existing])
 
 
-def _handle_creating_synonyms(word_text, variant_word_set, synonym_flag):
-    """Adds synonym to db and returns the associated base word
+def _handle_creating_synonyms(word_text, is_synonym):
+    """Adds synonym to db and returns the associated variant word
 
     Keyword arguments:
     word_text -- the synonym/anonym listed to lookup
-    variant_word_set -- list of all different spellings of words in the db
+    is_synonym -- False if word_text is an antonym
 
     Sometimes a word will be listed as a synonym that and has an entry page that
     lists an alternative spelling that has its own page. If later on, a synonym
@@ -536,20 +1239,21 @@ def _handle_creating_synonyms(word_text, variant_word_set, synonym_flag):
     page. When we try to add 'settling' to the database, there will be an error,
     because 'settling' was already added to the variant word set. Thus, we try
     to remove an 's' if the main spelling fails.
+
+    Returns None if Merriam-Webster doesn't have an entry for the word.
     """
-    if synonym_flag == 'synonyms':
+    if is_synonym:
         msg = 'synonym'
     else:
         msg = 'antonym'
     print(f'looking up the {msg}: {word_text}')
-    time.sleep(2)
     try:
         scrape_word(word_text)
     except IntegrityError:
         word_text = re.sub('s$', '', word_text)
-        if word_text not in variant_word_set:
+        if word_text not in variant_index:
             scrape_word(word_text)
-    return models.VariantWord.objects.all().get(name=word_text)
+    return models.VariantWord.objects.filter(name=word_text).first()
 
 
 def _load_word_list(filename):
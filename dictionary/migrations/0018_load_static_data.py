@@ -1,7 +1,7 @@
+from django.core.management.color import no_style
 from django.db import migrations
-from django.core.management import call_command
-from dictionary import models
-import dictionary.sql_views as sql_views
+import gzip
+import json
 import os
 
 
@@ -9,9 +9,33 @@ class Migration(migrations.Migration):
 
 
     def load_data(apps, schema_editor):
-        fixture_file = os.path.join((os.path.dirname(__file__)), '../fixtures',
-                                    'initial_data.json')
-        call_command('loaddata', fixture_file)
+        #Reads the dump on its own with the models as of this migration, so
+        #later changes to dictionary_dump can't change what it loads
+        dump_file = os.path.join((os.path.dirname(__file__)), '../fixtures',
+                                 'initial_data.jsonl.gz')
+        loaded = []
+        with gzip.open(dump_file, 'rt', encoding='utf-8') as f:
+            f.readline()
+            model = None
+            objects = []
+            for line in f:
+                value = json.loads(line)
+                if isinstance(value, dict):
+                    if objects:
+                        model.objects.bulk_create(objects, batch_size=2000)
+                    model = apps.get_model('dictionary', value['table'])
+                    fields = value['fields']
+                    objects = []
+                    loaded.append(model)
+                else:
+                    objects.append(model(**dict(zip(fields, value))))
+            if objects:
+                model.objects.bulk_create(objects, batch_size=2000)
+        connection = schema_editor.connection
+        with connection.cursor() as cursor:
+            for statement in connection.ops.sequence_reset_sql(no_style(),
+                                                               loaded):
+                cursor.execute(statement)
 
     dependencies = [
         ('dictionary', '0017_useraccuracy'),
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dictionary', '0019_auto_20181227_1143'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='synonymstolookup',
+            name='lookup_word',
+            field=models.CharField(db_index=True, max_length=50),
+        ),
+        migrations.CreateModel(
+            name='CrawlFrontier',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('word', models.CharField(max_length=50, unique=True)),
+                ('depth', models.PositiveIntegerField(default=0)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('not_found', 'Not found'), ('failed', 'Failed')], default='pending', max_length=10)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'depth', 'id'], name='dictionary__status_2e3c60_idx')],
+            },
+        ),
+    ]
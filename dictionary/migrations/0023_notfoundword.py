@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dictionary', '0022_scrapelease'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotFoundWord',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('word', models.CharField(max_length=50, unique=True)),
+                ('checked', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dictionary', '0023_notfoundword'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='baseword',
+            name='view_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='EntryVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('etag', models.CharField(blank=True, max_length=200)),
+                ('last_modified', models.CharField(blank=True, max_length=50)),
+                ('digest', models.CharField(blank=True, max_length=64)),
+                ('fetched', models.DateTimeField(db_index=True)),
+                ('base_word', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='dictionary.baseword')),
+            ],
+        ),
+    ]
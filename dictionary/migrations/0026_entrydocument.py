@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dictionary', '0025_importcheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntryDocument',
+            fields=[
+                ('base_word', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='dictionary.baseword')),
+                ('version', models.PositiveSmallIntegerField()),
+                ('document', models.JSONField()),
+                ('built', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dictionary', '0026_entrydocument'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizIndex',
+            fields=[
+                ('word_list', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='dictionary.wordlist')),
+                ('size', models.PositiveIntegerField()),
+                ('entries', models.JSONField()),
+                ('built', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:31
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dictionary', '0027_quizindex'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='useraccuracy',
+            name='due',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='useraccuracy',
+            name='ease',
+            field=models.FloatField(default=2.5),
+        ),
+        migrations.AddField(
+            model_name='useraccuracy',
+            name='interval',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='useraccuracy',
+            name='repetitions',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='useraccuracy',
+            index=models.Index(fields=['user', 'due'], name='dictionary__user_id_96b779_idx'),
+        ),
+    ]
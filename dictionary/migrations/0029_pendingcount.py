@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dictionary', '0028_useraccuracy_schedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=30)),
+                ('object_id', models.PositiveIntegerField()),
+                ('field', models.CharField(max_length=30)),
+                ('amount', models.IntegerField(default=1)),
+                ('batch', models.CharField(blank=True, db_index=True, max_length=32)),
+            ],
+        ),
+    ]
@@ -0,0 +1,76 @@
+from django.db import migrations
+from django.db.models import Prefetch
+
+
+class Migration(migrations.Migration):
+
+
+    def build_documents(apps, schema_editor):
+        #Builds version 1 documents, see dictionary/entry_documents.py, with
+        #the models as of this migration so later changes don't affect it
+        BaseWord = apps.get_model('dictionary', 'BaseWord')
+        EntryDocument = apps.get_model('dictionary', 'EntryDocument')
+        FormWord = apps.get_model('dictionary', 'FormWord')
+        WordDefinition = apps.get_model('dictionary', 'WordDefinition')
+        ExampleSentence = apps.get_model('dictionary', 'ExampleSentence')
+        VariantWord = apps.get_model('dictionary', 'VariantWord')
+        Synonym = apps.get_model('dictionary', 'Synonym')
+        Antonym = apps.get_model('dictionary', 'Antonym')
+        base_word_ids = list(BaseWord.objects.filter(entrydocument=None)
+                                             .order_by('id')
+                                             .values_list('id', flat=True))
+        for start in range(0, len(base_word_ids), 500):
+            base_words = BaseWord.objects.filter(
+                id__in=base_word_ids[start:start + 500]).prefetch_related(
+                Prefetch('formword_set',
+                         queryset=FormWord.objects.select_related('pos')
+                                          .order_by('id')),
+                Prefetch('formword_set__worddefinition_set',
+                         queryset=WordDefinition.objects.order_by('id')),
+                Prefetch('formword_set__worddefinition_set'
+                         '__examplesentence_set',
+                         queryset=ExampleSentence.objects.order_by('id')),
+                Prefetch('variantword_set',
+                         queryset=VariantWord.objects.order_by('id')),
+                Prefetch('synonym_set',
+                         queryset=Synonym.objects.select_related('synonym')
+                                         .order_by('id')),
+                Prefetch('antonym_set',
+                         queryset=Antonym.objects.select_related('antonym')
+                                         .order_by('id')))
+            EntryDocument.objects.bulk_create(
+                [EntryDocument(base_word_id=base_word.id, version=1,
+                               document=Migration.document(base_word))
+                 for base_word in base_words])
+
+    def document(base_word):
+        return {
+            'id': base_word.id,
+            'name': base_word.name,
+            'searched_synonym': base_word.searched_synonym,
+            'variants': [variant_word.name for variant_word
+                         in base_word.variantword_set.all()],
+            'forms': [{'pos': form_word.pos.name,
+                       'definitions': [
+                           {'definition': definition.definition,
+                            'examples': [example.sentence for example
+                                         in definition.examplesentence_set
+                                                      .all()]}
+                           for definition
+                           in form_word.worddefinition_set.all()]}
+                      for form_word in base_word.formword_set.all()],
+            'synonyms': [{'name': synonym.synonym.name,
+                          'base_word_id': synonym.synonym.base_word_id}
+                         for synonym in base_word.synonym_set.all()],
+            'antonyms': [{'name': antonym.antonym.name,
+                          'base_word_id': antonym.antonym.base_word_id}
+                         for antonym in base_word.antonym_set.all()],
+        }
+
+    dependencies = [
+        ('dictionary', '0029_pendingcount'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_documents, migrations.RunPython.noop)
+    ]
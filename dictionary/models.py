@@ -2,7 +2,32 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from django.db.models import F
+from django.db.models import F, Prefetch
+from django.utils import timezone
+
+
+class BaseWordQuerySet(models.QuerySet):
+    def with_entry(self):
+        """Loads everything the entry page shows with a query per table
+
+        Parts of speech come with their forms and variant words with their
+        synonyms and antonyms, so building the entry's document (see
+        dictionary/entry_documents.py) doesn't query the db again, however
+        big the entry is.
+        """
+        return self.prefetch_related(
+            Prefetch('formword_set',
+                     queryset=FormWord.objects.select_related('pos')
+                                      .order_by('id')),
+            Prefetch('formword_set__worddefinition_set',
+                     queryset=WordDefinition.objects.order_by('id')),
+            Prefetch('synonym_set',
+                     queryset=Synonym.objects.select_related('synonym')
+                                     .order_by('id')),
+            Prefetch('antonym_set',
+                     queryset=Antonym.objects.select_related('antonym')
+                                     .order_by('id')),
+        )
 
 
 class BaseWord(models.Model):
@@ -15,6 +40,9 @@ class BaseWord(models.Model):
     searched_synonym = models.BooleanField(default=False)
     total_guesses = models.PositiveIntegerField(default=0)
     correct_guesses = models.PositiveIntegerField(default=0)
+    view_count = models.PositiveIntegerField(default=0)
+
+    objects = BaseWordQuerySet.as_manager()
 
     @property
     def accuracy(self):
@@ -166,6 +194,28 @@ class WordListEntry(models.Model):
         return f'Word List: {self.word_list.list_name}, Word Name: {self.word}'
 
 
+class QuizIndex(models.Model):
+    """What the vocab game needs to know about a word list, in one row
+
+    entries holds the words of the list that have synonyms, each with its
+    first part of speech and the names and base word ids of its synonyms,
+    and size is the number of words in the list. It's rebuilt whenever words
+    are added to or removed from the list, or their synonyms change. See
+    dictionary/quiz_index.py.
+    """
+    word_list = models.OneToOneField(WordList, primary_key=True,
+                                     on_delete=models.CASCADE)
+    size = models.PositiveIntegerField()
+    entries = models.JSONField()
+    built = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.word_list} ({len(self.entries)} of {self.size} words)'
+
+    def __repr__(self):
+        return f'QuizIndex({self.word_list_id!r}, {self.size!r})'
+
+
 class SynonymsToLookUp(models.Model):
     """Lists synonyms we haven't looked up yet for a word
 
@@ -176,7 +226,7 @@ class SynonymsToLookUp(models.Model):
     looked up.
     """
     base_word = models.ForeignKey(BaseWord, on_delete=models.CASCADE)
-    lookup_word = models.CharField(max_length=50)
+    lookup_word = models.CharField(max_length=50, db_index=True)
     is_synonym = models.BooleanField()
     unique_together = ('base_word', 'lookup_word')
 
@@ -184,6 +234,41 @@ class SynonymsToLookUp(models.Model):
         return f'BaseWord: {self.base_word} Word to lookup: {self.lookup_word}'
 
 
+class CrawlFrontier(models.Model):
+    """Words found by the synonym crawler and whether they've been crawled
+
+    The crawler looks words up breadth first, so the pending word with the
+    lowest depth, and then the lowest id, is always crawled next. Each word is
+    only ever added once, and since a word's row is updated in the same
+    transaction that adds its entry, a crawl that gets killed picks up where
+    it stopped the next time it runs.
+    """
+    PENDING = 'pending'
+    DONE = 'done'
+    NOT_FOUND = 'not_found'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (DONE, 'Done'),
+        (NOT_FOUND, 'Not found'),
+        (FAILED, 'Failed'),
+    )
+    word = models.CharField(max_length=50, unique=True)
+    depth = models.PositiveIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES,
+                              default=PENDING)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'depth', 'id'])]
+
+    def __str__(self):
+        return f'{self.word} (depth {self.depth}, {self.status})'
+
+    def __repr__(self):
+        return (f'CrawlFrontier({self.id!r}, {self.word!r}, {self.depth!r}, '
+                f'{self.status!r})')
+
+
 class Profile(models.Model):
     """Extension of Django-default User, allows us to track active wordlists"""
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -209,13 +294,25 @@ def save_user_profile(sender, instance, **kwargs):
 
 
 class UserAccuracy(models.Model):
-    """Class to keep track a user's accuracy of identifying words"""
+    """Class to keep track a user's accuracy of identifying words
+
+    Also holds the user's spaced repetition schedule for the word: ease,
+    interval (in days) and repetitions are the SM-2 state, and due is when
+    the word should be reviewed next. See dictionary/spaced_repetition.py.
+    """
     base_word = models.ForeignKey(BaseWord, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     total_guesses = models.PositiveIntegerField(default=0)
     correct_guesses = models.PositiveIntegerField(default=0)
+    ease = models.FloatField(default=2.5)
+    interval = models.PositiveIntegerField(default=0)
+    repetitions = models.PositiveIntegerField(default=0)
+    due = models.DateTimeField(default=timezone.now)
     unique_together = ('base_word', 'user')
 
+    class Meta:
+        indexes = [models.Index(fields=['user', 'due'])]
+
     @property
     def accuracy(self):
         """Returns formatted string to nearest hundreth"""
@@ -229,3 +326,176 @@ class UserAccuracy(models.Model):
         return (f'Username: {self.user.username} '
                 f'BaseWord: {self.base_word.name}\n'
                 f'Accuracy: {self.accuracy}')
+
+
+class ScrapeJob(models.Model):
+    """A word waiting to be looked up on Merriam-Webster by a worker
+
+    Views add jobs instead of scraping while the user waits, and the
+    run_scrape_worker command works through them oldest first. If word_list
+    is set, the word is added to it once its entry has been created.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    NOT_FOUND = 'not_found'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (NOT_FOUND, 'Not found'),
+        (FAILED, 'Failed'),
+    )
+    ACTIVE_STATUSES = (QUEUED, RUNNING)
+    word = models.CharField(max_length=50)
+    search_synonym = models.BooleanField(default=True)
+    word_list = models.ForeignKey(WordList, null=True, blank=True,
+                                  on_delete=models.SET_NULL)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES,
+                              default=QUEUED)
+    base_word = models.ForeignKey(BaseWord, null=True, blank=True,
+                                  on_delete=models.SET_NULL)
+    error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'id']),
+                   models.Index(fields=['word', 'status'])]
+
+    @property
+    def is_active(self):
+        return self.status in self.ACTIVE_STATUSES
+
+    def __str__(self):
+        return f'{self.word}: {self.status}'
+
+    def __repr__(self):
+        return f'ScrapeJob({self.id!r}, {self.word!r}, {self.status!r})'
+
+
+class ScrapeLease(models.Model):
+    """Claim on looking up a word, held by one process or thread at a time
+
+    The row is created by the first lookup of a word and deleted once its
+    entry has been written, while other lookups of the same word wait for it
+    to go away. A lease left behind by a process that died is taken over once
+    it expires.
+    """
+    word = models.CharField(max_length=50, unique=True)
+    owner = models.CharField(max_length=32)
+    expires = models.DateTimeField()
+
+    def __str__(self):
+        return f'{self.word} (until {self.expires})'
+
+    def __repr__(self):
+        return f'ScrapeLease({self.word!r}, {self.owner!r}, {self.expires!r})'
+
+
+class NotFoundWord(models.Model):
+    """Word that Merriam-Webster didn't have an entry for when we checked
+
+    The scraper doesn't ask for the word again until SCRAPER_NOT_FOUND_TTL
+    seconds after checked, so repeated searches for a misspelling don't each
+    cost a request. See dictionary/not_found_cache.py.
+    """
+    word = models.CharField(max_length=50, unique=True)
+    checked = models.DateTimeField()
+
+    def __str__(self):
+        return self.word
+
+    def __repr__(self):
+        return f'NotFoundWord({self.word!r}, {self.checked!r})'
+
+
+class EntryVersion(models.Model):
+    """Which version of a base word's Merriam-Webster page we last saw
+
+    The refresh_entries command sends etag and last_modified back to the site
+    so it only downloads pages that changed, and compares digest, the sha256
+    of the entry part of the page, so it only rewrites entries that changed.
+    """
+    base_word = models.OneToOneField(BaseWord, on_delete=models.CASCADE)
+    etag = models.CharField(max_length=200, blank=True)
+    last_modified = models.CharField(max_length=50, blank=True)
+    digest = models.CharField(max_length=64, blank=True)
+    fetched = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f'{self.base_word.name} (fetched {self.fetched})'
+
+    def __repr__(self):
+        return (f'EntryVersion({self.base_word_id!r}, {self.etag!r}, '
+                f'{self.last_modified!r}, {self.fetched!r})')
+
+
+class ImportCheckpoint(models.Model):
+    """How far the import_words command got through a word file
+
+    lines is the number of lines of the file that have been dealt with, it's
+    only moved forward once every word up to it has been written, so an
+    import that gets killed starts again from the last checkpoint.
+    """
+    path = models.CharField(max_length=500, unique=True)
+    lines = models.PositiveIntegerField(default=0)
+    found = models.PositiveIntegerField(default=0)
+    not_found = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    finished = models.BooleanField(default=False)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.path} (line {self.lines})'
+
+    def __repr__(self):
+        return (f'ImportCheckpoint({self.path!r}, {self.lines!r}, '
+                f'{self.finished!r})')
+
+
+class EntryDocument(models.Model):
+    """The whole entry of a base word in one row, see entry_documents.py
+
+    document holds the word's spellings, parts of speech, definitions,
+    examples, synonyms and antonyms as json, so the entry can be read by
+    primary key instead of joining eight tables. It's rebuilt by the scraper
+    whenever it writes the entry, and version is the format it was built
+    with, older documents are rebuilt by build_entry_documents.
+    """
+    base_word = models.OneToOneField(BaseWord, primary_key=True,
+                                     on_delete=models.CASCADE)
+    version = models.PositiveSmallIntegerField()
+    document = models.JSONField()
+    built = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.document.get("name")} (built {self.built})'
+
+    def __repr__(self):
+        return (f'EntryDocument({self.base_word_id!r}, {self.version!r}, '
+                f'{self.built!r})')
+
+
+class PendingCount(models.Model):
+    """Increment of a counter that hasn't been added to its row yet
+
+    Views and guesses are added up in memory and written as one of these
+    per counted field instead of updating the counted row, and
+    counters.flush() adds them up and applies them to their rows in batches.
+    batch is set while a flush is applying the count. See
+    dictionary/counters.py.
+    """
+    model = models.CharField(max_length=30)
+    object_id = models.PositiveIntegerField()
+    field = models.CharField(max_length=30)
+    amount = models.IntegerField(default=1)
+    batch = models.CharField(max_length=32, blank=True, db_index=True)
+
+    def __str__(self):
+        return f'{self.model} {self.object_id}: {self.field} +{self.amount}'
+
+    def __repr__(self):
+        return (f'PendingCount({self.model!r}, {self.object_id!r}, '
+                f'{self.field!r}, {self.amount!r})')
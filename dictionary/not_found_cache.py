@@ -0,0 +1,60 @@
+"""Remembers the words Merriam-Webster doesn't have an entry for
+
+A 404 used to be forgotten right away, so every search for a misspelled word
+cost a full request to Merriam-Webster. Now the scraper stores words it gets
+a 404 for in the NotFoundWord table and checks it before fetching a page. A
+word is only asked for again once SCRAPER_NOT_FOUND_TTL seconds have passed,
+in case Merriam-Webster has added it since.
+
+Main Functions:
+    is_missing(word)
+        Returns True if Merriam-Webster didn't have word when it was last
+        checked, less than SCRAPER_NOT_FOUND_TTL seconds ago
+
+    remember(word)
+        Records that Merriam-Webster doesn't have word
+
+    purge(words=None, expired_only=False)
+        Forgets the given words, every word if words is None. With
+        expired_only, only words checked more than the ttl ago are
+        forgotten. Returns the number of words forgotten.
+
+        Example:
+            python3 manage.py purge_not_found_words --expired
+
+Settings:
+    SCRAPER_NOT_FOUND_TTL -- seconds before a missing word is checked again
+"""
+
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from dictionary import models, single_flight
+
+
+def _cutoff():
+    """Returns the time before which a check is considered out of date"""
+    ttl = getattr(settings, 'SCRAPER_NOT_FOUND_TTL', 7 * 24 * 60 * 60)
+    return timezone.now() - timedelta(seconds=ttl)
+
+
+def is_missing(word):
+    return models.NotFoundWord.objects.filter(word=word,
+                                              checked__gte=_cutoff()).exists()
+
+
+def remember(word):
+    #Pages are fetched by threads outside of _db_lock, see single_flight
+    with single_flight.write_lock:
+        models.NotFoundWord.objects.update_or_create(
+            word=word, defaults={'checked': timezone.now()})
+
+
+def purge(words=None, expired_only=False):
+    qs = models.NotFoundWord.objects.all()
+    if words is not None:
+        qs = qs.filter(word__in=words)
+    if expired_only:
+        qs = qs.filter(checked__lt=_cutoff())
+    deleted, _ = qs.delete()
+    return deleted
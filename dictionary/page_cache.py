@@ -0,0 +1,189 @@
+"""Compressed on-disk cache of the pages downloaded by the scraper
+
+Looking up a word often downloads the same page more than once, e.g. when a
+synonym is listed by several words or when _handle_creating_synonyms retries a
+word after an IntegrityError. The scraper checks this cache before going to
+the network.
+
+Every page is stored gzipped in its own file, named by the sha256 of the
+normalized url and spread over 256 subdirectories. A page older than the ttl
+is treated as missing, but is kept for another stale_ttl seconds so the
+scraper can still fall back on it while Merriam-Webster is down. After that
+it's deleted. When the files in the cache take up more than max_bytes, the
+oldest pages are deleted until it fits again.
+
+Main Functions:
+    page_cache.get(url, stale=False)
+        Returns the cached bytes of the page or None if it isn't cached.
+        With stale=True, pages past the ttl are returned as well.
+
+    page_cache.put(url, content)
+        Stores the bytes of a page in the cache
+
+    page_cache.clear()
+        Deletes every page in the cache
+
+Settings:
+    SCRAPER_CACHE_DIR -- directory to store pages in, None turns caching off
+    SCRAPER_CACHE_TTL -- seconds a page is kept for
+    SCRAPER_CACHE_STALE_TTL -- extra seconds an expired page is kept for
+    SCRAPER_CACHE_MAX_BYTES -- max size of all the compressed pages together
+"""
+
+import gzip
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from urllib.parse import quote, unquote, urlsplit, urlunsplit
+from django.conf import settings
+
+
+def normalize_url(url):
+    """Returns url in a canonical form so equivalent urls share an entry
+
+    The scheme, host and path are lowercased, the path is unquoted and quoted
+    again so that escaped and unescaped words match, and any trailing slash,
+    query string or fragment is dropped.
+    """
+    parts = urlsplit(url.strip())
+    path = quote(unquote(parts.path).lower().rstrip('/'))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, '',
+                       ''))
+
+
+class PageCache:
+    """Content addressed store of gzipped pages with ttl and size limits"""
+    def __init__(self, directory, ttl, max_bytes, stale_ttl=0):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stale_ttl = stale_ttl
+        self._total_bytes = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.directory is not None
+
+    def path_for(self, url):
+        """Returns the file a url's page is stored in"""
+        digest = hashlib.sha256(normalize_url(url).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest + '.gz')
+
+    def get(self, url, stale=False):
+        """Returns the bytes of a cached page, None if missing or expired
+
+        Keyword arguments:
+        stale -- also return pages that expired less than stale_ttl ago
+        """
+        if not self.enabled:
+            return None
+        path = self.path_for(url)
+        try:
+            age = time.time() - os.path.getmtime(path)
+            if age > self.ttl + self.stale_ttl:
+                self._remove(path)
+                return None
+            if age > self.ttl and not stale:
+                return None
+            with gzip.open(path, 'rb') as f:
+                return f.read()
+        except (OSError, EOFError):
+            return None
+
+    def put(self, url, content):
+        """Stores the bytes of a page, then evicts pages if over max_bytes"""
+        if not self.enabled:
+            return
+        path = self.path_for(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        #Write to a temporary file first so readers never see half a page
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(gzip.compress(content))
+        with self._lock:
+            self._ensure_total()
+            self._total_bytes -= _file_size(path)
+            os.replace(tmp_path, path)
+            self._total_bytes += _file_size(path)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def clear(self):
+        """Deletes every page in the cache"""
+        if not self.enabled:
+            return
+        with self._lock:
+            for path, _, _ in self._scan():
+                _remove_file(path)
+            self._total_bytes = 0
+
+    def total_bytes(self):
+        """Returns the size of all the cached pages together"""
+        with self._lock:
+            self._ensure_total()
+            return self._total_bytes
+
+    def _scan(self):
+        """Returns a list of (path, mtime, size) for every cached page"""
+        pages = []
+        if not os.path.isdir(self.directory):
+            return pages
+        for subdirectory in os.scandir(self.directory):
+            if not subdirectory.is_dir():
+                continue
+            for entry in os.scandir(subdirectory.path):
+                if entry.name.endswith('.gz'):
+                    stat = entry.stat()
+                    pages.append((entry.path, stat.st_mtime, stat.st_size))
+        return pages
+
+    def _ensure_total(self):
+        """Sums the size of the cache the first time it's needed"""
+        if self._total_bytes is None:
+            self._total_bytes = sum(size for _, _, size in self._scan())
+
+    def _evict(self):
+        """Deletes expired pages and then the oldest ones until under size"""
+        now = time.time()
+        pages = sorted(self._scan(), key=lambda page: page[1])
+        total = sum(size for _, _, size in pages)
+        for path, mtime, size in pages:
+            if (total <= self.max_bytes
+                    and now - mtime <= self.ttl + self.stale_ttl):
+                continue
+            _remove_file(path)
+            total -= size
+        self._total_bytes = total
+
+    def _remove(self, path):
+        with self._lock:
+            size = _file_size(path)
+            if _remove_file(path) and self._total_bytes is not None:
+                self._total_bytes -= size
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _remove_file(path):
+    """Deletes a file, returns False if another thread already deleted it"""
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+page_cache = PageCache(
+    getattr(settings, 'SCRAPER_CACHE_DIR', None),
+    getattr(settings, 'SCRAPER_CACHE_TTL', 7 * 24 * 60 * 60),
+    getattr(settings, 'SCRAPER_CACHE_MAX_BYTES', 200 * 1024 * 1024),
+    getattr(settings, 'SCRAPER_CACHE_STALE_TTL', 30 * 24 * 60 * 60),
+)
@@ -0,0 +1,114 @@
+"""Index of the words of each word list the vocab game can ask about
+
+Every question of the game used to load the words of the list, then the
+synonyms of each of them, and queue the words whose synonyms hadn't been
+looked up yet. Each word list now has a QuizIndex row instead, holding the
+words of the list that have synonyms, so a question reads a single row:
+
+    {"size": 12,
+     "entries": [{"id": 2, "name": "bolster", "pos": "verb",
+                  "synonyms": [{"name": "support", "base_word_id": 7}]}]}
+
+size is the number of words in the list, pos the first part of speech of
+the word and base_word_id the base word each synonym belongs to, which the
+game keeps out of the wrong answers.
+
+The index of a list is rebuilt from the entry documents once the
+transaction that adds words to the list or removes them commits, and when
+the scraper rebuilds the document of one of its words, e.g. once the word's
+synonyms have been looked up. Words whose synonyms haven't been looked up
+yet are queued for the scrape workers while the index is built.
+
+Main Functions:
+    get_quiz(word_list_id)
+        Returns a dict with the size and entries of a word list's index,
+        building it if needed. Returns None if there's no such word list.
+
+    rebuild(word_list_id)
+        Builds the index of a word list again and returns it.
+
+    rebuild_on_commit(word_list_ids)
+        Rebuilds the indexes of the given word lists once the current
+        transaction commits.
+
+    words_changed(base_word_ids)
+        Rebuilds the indexes of every word list with one of the given base
+        words once the current transaction commits.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from dictionary import entry_documents, models, scrape_jobs
+
+
+def get_quiz(word_list_id):
+    """Returns the index of a word list, None if there's no such list"""
+    quiz = (models.QuizIndex.objects.filter(word_list_id=word_list_id)
+                  .values('size', 'entries')
+                  .first())
+    if quiz is None:
+        quiz = rebuild(word_list_id)
+    return quiz
+
+
+def rebuild(word_list_id):
+    """Builds the index of a word list, None if there's no such list"""
+    if not models.WordList.objects.filter(id=word_list_id).exists():
+        return None
+    base_word_ids = list(models.WordListEntry.objects
+                               .filter(word_list_id=word_list_id)
+                               .order_by('id')
+                               .values_list('word_id', flat=True))
+    documents = entry_documents.get_documents(base_word_ids)
+    entries = []
+    for base_word_id in dict.fromkeys(base_word_ids):
+        document = documents.get(base_word_id)
+        if document is None:
+            continue
+        if not document['searched_synonym']:
+            scrape_jobs.enqueue(document['name'])
+        if document['synonyms']:
+            entries.append(_entry(document))
+    quiz = {'size': len(base_word_ids), 'entries': entries}
+    models.QuizIndex.objects.bulk_create(
+        [models.QuizIndex(word_list_id=word_list_id, **quiz)],
+        update_conflicts=True, unique_fields=['word_list'],
+        update_fields=['size', 'entries', 'built'])
+    return quiz
+
+
+def _entry(document):
+    forms = document['forms']
+    return {'id': document['id'],
+            'name': document['name'],
+            'pos': forms[0]['pos'] if forms else None,
+            'synonyms': document['synonyms']}
+
+
+def rebuild_on_commit(word_list_ids):
+    """Rebuilds the indexes of word lists once the transaction commits"""
+    for word_list_id in set(word_list_ids):
+        transaction.on_commit(lambda word_list_id=word_list_id:
+                              rebuild(word_list_id))
+
+
+def words_changed(base_word_ids):
+    """Rebuilds the indexes of the word lists with any of the base words"""
+    word_list_ids = (models.WordListEntry.objects
+                           .filter(word_id__in=set(base_word_ids))
+                           .values_list('word_list_id', flat=True)
+                           .distinct())
+    rebuild_on_commit(list(word_list_ids))
+
+
+@receiver(post_save, sender=models.WordListEntry)
+def word_added(sender, instance, created, **kwargs):
+    if created:
+        rebuild_on_commit([instance.word_list_id])
+
+
+@receiver(post_delete, sender=models.WordListEntry)
+def word_removed(sender, instance, **kwargs):
+    """Also sent for every word of a word list that gets deleted"""
+    rebuild_on_commit([instance.word_list_id])
@@ -0,0 +1,148 @@
+"""Vocab game questions generated a batch at a time and kept in the session
+
+Every answer to the game used to set up the next question from scratch, and
+graded the answer against the correct choice the page sent back. Instead,
+the first visit to the game generates QUIZ_BATCH_SIZE questions from the
+word list's quiz index and keeps them in the user's session:
+
+    {"word_list_id": 3, "mode": "practice", "position": 0,
+     "questions": [{"base_word_id": 2, "word": "bolster",
+                    "choices": ["shore up", "ferocious", "deride", "lax"],
+                    "answer": "shore up"}, ...]}
+
+Each answer is graded against the question at position, which then moves
+on to the next one, so answering only writes the session. A new batch is
+generated once the batch runs out or the user plays another word list.
+
+In PRACTICE mode the words are picked at random. In REVIEW mode the batch
+is made of the words of the list that are due for the user, see
+dictionary/spaced_repetition.py, and once they've all been answered the
+next batch is made of the words that are due by then.
+
+Main Functions:
+    current_question(session, word_list_id, mode=PRACTICE, user=None)
+        Returns (position, question) of the question the user is on,
+        generating a new batch if needed. Raises QuizUnavailable if the word
+        list doesn't have enough words with synonyms, or in REVIEW mode if
+        none of them are due for user.
+
+    answer(session, word_list_id, position, choice, mode=PRACTICE)
+        Grades choice against the question at position and moves on to the
+        next one. Returns (question, correct), or None if that isn't the
+        question the user is on, e.g. when the page was sent twice.
+
+    start(session, word_list_id, size=None, mode=PRACTICE, user=None)
+        Generates a new batch of up to size questions, QUIZ_BATCH_SIZE by
+        default.
+
+Settings:
+    QUIZ_BATCH_SIZE -- questions generated at a time
+"""
+
+import random
+from django.conf import settings
+from django.utils import timezone
+from dictionary import quiz_index, spaced_repetition
+from dictionary.distractor_pool import NotEnoughDistractors, distractor_pool
+
+SESSION_KEY = 'quiz'
+PRACTICE = 'practice'
+REVIEW = 'review'
+#Words a list needs before it can be played
+MIN_WORDS = 5
+
+
+class QuizUnavailable(Exception):
+    """Raised when a word list doesn't have the words to play with"""
+
+
+def current_question(session, word_list_id, mode=PRACTICE, user=None):
+    """Returns (position, question) of the question the user is on"""
+    quiz = session.get(SESSION_KEY)
+    if (not _is_playing(quiz, word_list_id, mode)
+            or quiz['position'] >= len(quiz['questions'])):
+        quiz = start(session, word_list_id, mode=mode, user=user)
+    return (quiz['position'], quiz['questions'][quiz['position']])
+
+
+def answer(session, word_list_id, position, choice, mode=PRACTICE):
+    """Grades an answer, returns (question, correct) or None if it's stale"""
+    quiz = session.get(SESSION_KEY)
+    if (not _is_playing(quiz, word_list_id, mode)
+            or quiz['position'] != position
+            or position >= len(quiz['questions'])):
+        return None
+    question = quiz['questions'][position]
+    quiz['position'] += 1
+    session.modified = True
+    return (question, choice == question['answer'])
+
+
+def _is_playing(quiz, word_list_id, mode):
+    return (quiz is not None and quiz['word_list_id'] == word_list_id
+            and quiz.get('mode', PRACTICE) == mode)
+
+
+def start(session, word_list_id, size=None, mode=PRACTICE, user=None):
+    """Generates a batch of questions for a word list, returns the quiz"""
+    if size is None:
+        size = getattr(settings, 'QUIZ_BATCH_SIZE', 20)
+    index = quiz_index.get_quiz(word_list_id)
+    if index['size'] < MIN_WORDS:
+        raise QuizUnavailable('You must have at least five entries to '
+                              'practice')
+    if len(index['entries']) == 0:
+        raise QuizUnavailable('None of your words have synonyms to test')
+    if mode == REVIEW:
+        entries = _due_entries(index['entries'], user, word_list_id, size)
+    else:
+        entries = _pick_entries(index['entries'], size)
+    quiz = {'word_list_id': word_list_id, 'mode': mode, 'position': 0,
+            'questions': [make_question(entry) for entry in entries]}
+    session[SESSION_KEY] = quiz
+    return quiz
+
+
+def _pick_entries(entries, size):
+    """Returns size entries, going through them all before repeating one"""
+    picked = []
+    while len(picked) < size:
+        picked.extend(random.sample(entries, len(entries)))
+    return picked[:size]
+
+
+def _due_entries(entries, user, word_list_id, size):
+    """Returns up to size entries due for user, most overdue first"""
+    by_id = {entry['id']: entry for entry in entries}
+    due = spaced_repetition.due_words(user, word_list_id, size, by_id)
+    if not due:
+        next_due = spaced_repetition.next_due(user, word_list_id)
+        raise QuizUnavailable(f'None of your words are due for review, come '
+                              f'back after '
+                              f'{timezone.localtime(next_due):%b %d %H:%M}')
+    return [by_id[base_word_id] for base_word_id in due]
+
+
+def make_question(entry):
+    """Returns a question about an entry of a quiz index
+
+    Takes all synonyms of the word and choses one of the synonym as the
+    correct synonym. Three incorrect synonyms are picked from the distractor
+    pool, preferably of the word's first part of speech, leaving out the word
+    and all of its synonyms.
+    """
+    #List of {'name', 'base_word_id'} dicts
+    choice_synonyms = entry['synonyms']
+    correct_choice = random.choice(choice_synonyms)['name']
+    excluded = [entry['id']] + [synonym['base_word_id']
+                                for synonym in choice_synonyms]
+    try:
+        non_choice_answers = distractor_pool.sample(
+            3, pos=entry['pos'], exclude_base_word_ids=excluded)
+    except NotEnoughDistractors:
+        raise ValueError('You must add more entries to the database before'
+                         ' starting a game')
+    choices = [correct_choice] + non_choice_answers
+    random.shuffle(choices)
+    return {'base_word_id': entry['id'], 'word': entry['name'],
+            'choices': choices, 'answer': correct_choice}
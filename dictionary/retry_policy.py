@@ -0,0 +1,189 @@
+"""Retrying failed requests and backing off while Merriam-Webster is down
+
+A request that times out, can't connect or gets a 429 or 5xx response is
+retried a limited number of times. Between attempts the scraper waits for a
+random delay of up to base * 2 ** attempt seconds (exponential backoff with
+full jitter, so workers that failed together don't all retry together), or
+for as long as a Retry-After header asks.
+
+Every request that still fails after its retries counts against a circuit
+breaker. After enough failures in a row the circuit opens and requests fail
+right away with CircuitOpenError instead of piling up on a site that isn't
+answering. Once the cooldown has passed, a single request is let through to
+test the site. If it works the circuit closes again, otherwise it stays open
+for another cooldown. While the circuit is open the scraper serves stale pages
+from the page cache where it has them.
+
+Main Functions:
+    RetryPolicy.call(send)
+        Calls send() until it returns a response that doesn't need a retry,
+        sleeping between attempts. Returns the last response, or raises the
+        last exception if every attempt failed.
+
+    CircuitBreaker.allow()
+        Returns True if a request may be made, False while the circuit is open
+
+    CircuitBreaker.status()
+        Returns a dict with the state of the circuit, the number of failures
+        in a row and the seconds left until the next test request, for
+        monitoring.
+
+Settings:
+    SCRAPER_MAX_RETRIES -- retries after the first attempt of a request
+    SCRAPER_BACKOFF_BASE -- seconds the backoff delay starts from
+    SCRAPER_BACKOFF_MAX -- longest delay between attempts, also caps the
+    delay asked for by Retry-After
+    SCRAPER_BREAKER_THRESHOLD -- failed requests in a row that open the circuit
+    SCRAPER_BREAKER_COOLDOWN -- seconds the circuit stays open
+"""
+
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import requests
+
+#Responses that mean the site is overloaded or briefly broken
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+RETRY_EXCEPTIONS = (requests.exceptions.Timeout,
+                    requests.exceptions.ConnectionError)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of making a request while the circuit is open"""
+
+
+def parse_retry_after(value):
+    """Returns the seconds asked for by a Retry-After header, None if invalid
+
+    The header is either a number of seconds or an HTTP date.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class RetryPolicy:
+    """Retries a request with jittered exponential backoff
+
+    Keyword arguments:
+    max_retries -- retries after the first attempt
+    base -- seconds the backoff starts from, doubled after every attempt
+    max_delay -- longest wait between two attempts
+    """
+    def __init__(self, max_retries, base, max_delay, sleep=time.sleep):
+        self.max_retries = max_retries
+        self.base = base
+        self.max_delay = max_delay
+        self.sleep = sleep
+
+    def delay(self, attempt, response=None):
+        """Returns the seconds to wait before retrying after attempt failed"""
+        if response is not None:
+            retry_after = parse_retry_after(
+                response.headers.get('Retry-After'))
+            if retry_after is not None:
+                return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base * 2 ** attempt))
+
+    def call(self, send):
+        """Calls send() until its response doesn't need to be retried"""
+        attempt = 0
+        while True:
+            try:
+                response = send()
+            except RETRY_EXCEPTIONS:
+                if attempt >= self.max_retries:
+                    raise
+                self.sleep(self.delay(attempt))
+            else:
+                if (response.status_code not in RETRY_STATUSES
+                        or attempt >= self.max_retries):
+                    return response
+                self.sleep(self.delay(attempt, response))
+            attempt += 1
+
+
+class CircuitBreaker:
+    """Stops sending requests after too many failures in a row
+
+    Keyword arguments:
+    threshold -- failures in a row that open the circuit
+    cooldown -- seconds before a test request is let through an open circuit
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+
+    def allow(self):
+        """Returns True if a request may be made right now
+
+        Once the cooldown of an open circuit has passed, only the first
+        caller is let through until the result of its request is recorded
+        or another cooldown has passed.
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            #A test request that never reported back is given up on too
+            if now - self.opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+                self.opened_at = now
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                print('Merriam-Webster is answering again, circuit closed')
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if (self.state == self.HALF_OPEN
+                    or self.failures >= self.threshold):
+                if self.state != self.OPEN:
+                    print(f'Merriam-Webster failed {self.failures} times in '
+                          f'a row, circuit open for {self.cooldown}s')
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def status(self):
+        """Returns the state of the circuit as a dict"""
+        with self._lock:
+            retry_in = 0.0
+            if self.state == self.OPEN:
+                elapsed = time.monotonic() - self.opened_at
+                retry_in = max(self.cooldown - elapsed, 0.0)
+            return {'state': self.state,
+                    'failures': self.failures,
+                    'retry_in': retry_in,
+                    }
@@ -0,0 +1,170 @@
+"""Queue of words to look up in the background
+
+Looking up a new word, along with all of its synonyms, can take a minute, so
+views shouldn't scrape while the user waits. Instead they add a ScrapeJob with
+enqueue() and show a page that polls the job's status until the entry is
+ready. Jobs are run by a separate process:
+
+    python3 manage.py run_scrape_worker
+
+Main Functions:
+    enqueue(word, search_synonym=True, word_list=None)
+        Adds a job to look up word and returns it. If the same word is already
+        waiting to be looked up for the same word list, that job is returned
+        instead of adding another one.
+
+    enqueue_synonyms(word)
+        Adds a job to look up word with its synonyms, unless this process
+        already did in the last SCRAPER_SYNONYM_JOB_TTL seconds. Returns the
+        job, or None if it wasn't added. Checked in the default cache, so
+        entry pages served from the cache don't query the jobs on every
+        visit.
+
+    run_next()
+        Claims the oldest queued job, runs it and returns it. Returns None if
+        there's nothing to do. Several workers can run at once, a job is only
+        ever claimed by one of them.
+
+    requeue_stale(timeout)
+        Puts running jobs that haven't been updated in timeout seconds back in
+        the queue, e.g. when the worker running them was killed. While a job
+        runs, its worker touches its updated time every SCRAPER_JOB_HEARTBEAT
+        seconds, so a job that's just slow is never put back.
+
+Settings:
+    SCRAPER_SYNONYM_JOB_TTL -- seconds before enqueue_synonyms() adds a job
+    for the same word again, e.g. if the last one failed
+    SCRAPER_JOB_HEARTBEAT -- seconds between updates of a running job, has to
+    be well under the timeout given to requeue_stale()
+"""
+
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+from dictionary import models
+from dictionary import merriam_webster_scraper as mws
+
+
+def enqueue(word, search_synonym=True, word_list=None):
+    """Adds a job to look up word unless one is already waiting"""
+    job = (models.ScrapeJob.objects
+                 .filter(word=word, word_list=word_list,
+                         status__in=models.ScrapeJob.ACTIVE_STATUSES)
+                 .first())
+    if job is None:
+        job = models.ScrapeJob.objects.create(word=word,
+                                              search_synonym=search_synonym,
+                                              word_list=word_list)
+    return job
+
+
+def enqueue_synonyms(word):
+    """Adds a job to look up the synonyms of word unless one was just added"""
+    timeout = getattr(settings, 'SCRAPER_SYNONYM_JOB_TTL', 600)
+    if not cache.add(f'synonym-job:{word}', True, timeout=timeout):
+        return None
+    return enqueue(word)
+
+
+def claim_next():
+    """Marks the oldest queued job as running and returns it
+
+    The status is only changed if the job is still queued, so when two
+    workers pick the same job only one of them gets it and the other one
+    moves on to the next job.
+    """
+    while True:
+        job = (models.ScrapeJob.objects
+                     .filter(status=models.ScrapeJob.QUEUED)
+                     .order_by('id')
+                     .first())
+        if job is None:
+            return None
+        claimed = (models.ScrapeJob.objects
+                         .filter(id=job.id, status=models.ScrapeJob.QUEUED)
+                         .update(status=models.ScrapeJob.RUNNING,
+                                 updated=timezone.now()))
+        if claimed:
+            job.status = models.ScrapeJob.RUNNING
+            return job
+
+
+def run_job(job):
+    """Looks up the word of a claimed job and records how it went"""
+    try:
+        with _heartbeat(job):
+            #The word the page redirected to, if it did
+            found = mws.look_up_word(job.word, job.search_synonym)
+        variant_word = (models.VariantWord.objects.filter(name=found)
+                              .select_related('base_word').first())
+        if found is not None and variant_word is not None:
+            job.base_word = variant_word.base_word
+            job.status = models.ScrapeJob.DONE
+            if job.word_list is not None:
+                models.WordListEntry.objects \
+                      .get_or_create(word_list=job.word_list,
+                                     word=job.base_word)
+        else:
+            job.status = models.ScrapeJob.NOT_FOUND
+    except Exception as e:
+        job.status = models.ScrapeJob.FAILED
+        job.error = repr(e)
+    job.save()
+    return job
+
+
+@contextmanager
+def _heartbeat(job):
+    """Touches the updated time of job while the with block runs
+
+    The updates are made by a thread of their own, since the lookup can
+    spend minutes in a single request or backoff sleep.
+    """
+    interval = getattr(settings, 'SCRAPER_JOB_HEARTBEAT', 30)
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(interval):
+                with mws._db_lock:
+                    (models.ScrapeJob.objects
+                           .filter(id=job.id,
+                                   status=models.ScrapeJob.RUNNING)
+                           .update(updated=timezone.now()))
+        finally:
+            #Each thread gets its own connection, which Django won't close
+            connection.close()
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run_next():
+    """Runs the oldest queued job, returns it or None if the queue is empty"""
+    job = claim_next()
+    if job is not None:
+        run_job(job)
+    return job
+
+
+def requeue_stale(timeout):
+    """Puts jobs whose worker stopped updating them back in the queue
+
+    A running job is updated every SCRAPER_JOB_HEARTBEAT seconds, so one
+    that wasn't for timeout seconds lost its worker. Returns the number of
+    jobs put back.
+    """
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    return (models.ScrapeJob.objects
+                  .filter(status=models.ScrapeJob.RUNNING, updated__lt=cutoff)
+                  .update(status=models.ScrapeJob.QUEUED,
+                          updated=timezone.now()))
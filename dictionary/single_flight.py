@@ -0,0 +1,129 @@
+"""Makes sure only one lookup of a word hits Merriam-Webster at a time
+
+When several users search for the same new word at once, each of their
+lookups used to download the page and try to write the same entry, and all
+but the first one failed on the unique VariantWord names. Now the first lookup
+of a word takes a lease on it, a row in the ScrapeLease table, which works
+across threads, web server processes and scrape workers. Every other lookup
+of the word waits until the lease is released and then finds the word
+already in the database, so the page is only downloaded and written once.
+
+Every lookup takes a lease, including the redirects and synonyms looked up
+while adding a word, which the scraper looks up one at a time outside of
+the transaction that writes the word. A lease taken inside of a transaction
+still keeps out every other lookup, since inserting the same word into the
+unique word column blocks until that transaction ends. A thread that
+already holds the lease on a word can look it up again without waiting on
+itself.
+
+A lookup gives up waiting with LeaseTimeout after SCRAPER_LEASE_WAIT
+seconds. A lease that wasn't released, e.g. by a process that was killed,
+expires after SCRAPER_LEASE_TTL seconds, and expired leases are deleted the
+next time anybody takes one.
+
+Main Functions:
+    lease(word)
+        Context manager that holds the lease on word while the block runs,
+        waiting for it first if another lookup has it.
+
+        Example:
+            with single_flight.lease('bolster'):
+                ...
+
+    acquire(word, timeout=None) / release(word, owner)
+        Take and free the lease, for lookups that hand a word from one thread
+        to another.
+
+Settings:
+    SCRAPER_LEASE_TTL -- seconds after which a lease that wasn't released is
+    considered abandoned and can be taken over
+    SCRAPER_LEASE_WAIT -- seconds to wait on another lookup before giving up
+    SCRAPER_LEASE_POLL_INTERVAL -- seconds between checks while waiting
+"""
+
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.utils import IntegrityError
+from django.utils import timezone
+from dictionary import models
+
+#Held by every thread of this process while it writes to the db. SQLite only
+#lets one connection write at a time, so a lease written by one thread while
+#another is adding an entry would fail with 'database is locked'. The scraper
+#uses the same lock as its _db_lock.
+write_lock = threading.RLock()
+#Words whose lease is held by the current thread through lease()
+_held = threading.local()
+
+
+class LeaseTimeout(Exception):
+    """Raised when another lookup of a word held on to it for too long"""
+
+
+@contextmanager
+def lease(word):
+    """Holds the lease on word for the duration of the with block"""
+    held = getattr(_held, 'words', None)
+    if held is None:
+        held = _held.words = set()
+    if word in held:
+        yield
+        return
+    owner = acquire(word)
+    held.add(word)
+    try:
+        yield
+    finally:
+        held.discard(word)
+        release(word, owner)
+
+
+def acquire(word, timeout=None):
+    """Waits until the lease on word is free, takes it and returns the owner
+
+    Keyword arguments:
+    word -- word to take the lease on
+    timeout -- seconds to wait before raising LeaseTimeout, defaults to the
+    SCRAPER_LEASE_WAIT setting
+    """
+    owner = uuid.uuid4().hex
+    if timeout is None:
+        timeout = getattr(settings, 'SCRAPER_LEASE_WAIT', 300)
+    poll_interval = getattr(settings, 'SCRAPER_LEASE_POLL_INTERVAL', 0.2)
+    deadline = time.monotonic() + timeout
+    while not try_acquire(word, owner):
+        if time.monotonic() >= deadline:
+            raise LeaseTimeout(f'Gave up waiting on the lookup of {word}')
+        time.sleep(poll_interval)
+    return owner
+
+
+def try_acquire(word, owner):
+    """Takes the lease on word for owner, returns False if it's taken
+
+    Deletes every expired lease first, not only the one on word, so the
+    leases left behind by killed processes don't pile up.
+    """
+    ttl = getattr(settings, 'SCRAPER_LEASE_TTL', 600)
+    with write_lock:
+        now = timezone.now()
+        models.ScrapeLease.objects.filter(expires__lt=now).delete()
+        try:
+            with transaction.atomic():
+                models.ScrapeLease.objects.create(
+                    word=word, owner=owner,
+                    expires=now + timedelta(seconds=ttl))
+            return True
+        except IntegrityError:
+            return False
+
+
+def release(word, owner):
+    """Frees the lease on word, unless it expired and was taken over"""
+    with write_lock:
+        models.ScrapeLease.objects.filter(word=word, owner=owner).delete()
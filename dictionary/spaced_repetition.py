@@ -0,0 +1,111 @@
+"""SM-2 spaced repetition schedule of the words each user is learning
+
+The review game asks about the words of a list that are due for the user,
+instead of picking them at random. Every answer in it moves the word's
+UserAccuracy row along the SM-2 schedule: a right answer waits 1 day, then
+6 days, then the last wait times the word's ease, and a wrong answer starts
+over at 1 day. Each answer also changes the ease, lowering it more the worse
+the answer was, but never below MIN_EASE.
+
+The game only has right and wrong answers, so a right answer is graded
+QUALITY_CORRECT and a wrong one QUALITY_WRONG on SM-2's scale of 0 to 5.
+
+Due words are read from the (user, due) index of UserAccuracy, oldest due
+first, so finding them doesn't go through the user's other words however
+many lists they have. Words of the list the user hasn't answered yet come
+after the due ones, in the order they were added to the list.
+
+Main Functions:
+    review(accuracy, correct, now=None)
+        Moves a UserAccuracy along the schedule after an answer, doesn't
+        save it.
+
+    due_words(user, word_list_id, limit, quizzable, now=None)
+        Returns the ids of up to limit base words of the list to review that
+        are in quizzable, due words first and then new words.
+
+    next_due(user, word_list_id)
+        Returns when the next word of the list is due, None if there are
+        no words to review.
+"""
+
+from datetime import timedelta
+from django.utils import timezone
+from dictionary import models
+
+QUALITY_CORRECT = 4
+QUALITY_WRONG = 1
+#Answers graded below this start the schedule over
+MIN_PASSING_QUALITY = 3
+MIN_EASE = 1.3
+
+
+def review(accuracy, correct, now=None):
+    """Schedules the next review of a word after an answer
+
+    Keyword arguments:
+    accuracy -- UserAccuracy of the user and word that was answered
+    correct -- whether the answer was right
+    now -- time of the answer, defaults to the current time
+    """
+    if now is None:
+        now = timezone.now()
+    quality = QUALITY_CORRECT if correct else QUALITY_WRONG
+    if quality >= MIN_PASSING_QUALITY:
+        if accuracy.repetitions == 0:
+            accuracy.interval = 1
+        elif accuracy.repetitions == 1:
+            accuracy.interval = 6
+        else:
+            accuracy.interval = round(accuracy.interval * accuracy.ease)
+        accuracy.repetitions += 1
+    else:
+        accuracy.repetitions = 0
+        accuracy.interval = 1
+    accuracy.ease = max(MIN_EASE, accuracy.ease + 0.1 - (5 - quality)
+                        * (0.08 + (5 - quality) * 0.02))
+    accuracy.due = now + timedelta(days=accuracy.interval)
+
+
+def due_words(user, word_list_id, limit, quizzable, now=None):
+    """Returns ids of base words of a list to review, most overdue first
+
+    Keyword arguments:
+    user -- User doing the review
+    word_list_id -- id of the word list being reviewed
+    limit -- max number of words to return
+    quizzable -- ids of the words of the list the game can ask about, e.g.
+    the ones with synonyms
+    now -- time of the review, defaults to the current time
+    """
+    if now is None:
+        now = timezone.now()
+    due = (models.UserAccuracy.objects
+                 .filter(user=user, due__lte=now,
+                         base_word__wordlistentry__word_list=word_list_id)
+                 .order_by('due')
+                 .values_list('base_word_id', flat=True))
+    #Words the user hasn't answered yet
+    new = (models.WordListEntry.objects
+                 .filter(word_list_id=word_list_id)
+                 .exclude(word__useraccuracy__user=user)
+                 .order_by('id')
+                 .values_list('word_id', flat=True))
+    base_word_ids = {}
+    for words in (due, new):
+        for base_word_id in words.iterator():
+            if base_word_id in quizzable:
+                base_word_ids[base_word_id] = None
+                if len(base_word_ids) >= limit:
+                    return list(base_word_ids)
+    return list(base_word_ids)
+
+
+def next_due(user, word_list_id):
+    """Returns when the next word of the list is due for the user"""
+    return (models.UserAccuracy.objects
+                  .filter(user=user,
+                          base_word__wordlistentry__word_list=word_list_id)
+                  .order_by('due')
+                  .values_list('due', flat=True)
+                  .first())
@@ -0,0 +1,177 @@
+"""Breadth-first crawler that fills the dictionary through synonyms
+
+Looking up a word with search_synonym=True recursively looks up every synonym
+and antonym on its page inside of one transaction, so if anything goes wrong
+along the way every word looked up so far is lost. The crawler instead keeps
+the words it still has to look up in the CrawlFrontier table and looks up one
+word per transaction, nearest to the seed words first.
+
+For each word it crawls, the crawler:
+    1. adds the word's entry with scrape_word(), which stores the synonyms
+       and antonyms on its page in SynonymsToLookUp
+    2. links every base word that was waiting on this word as a synonym or
+       antonym to it
+    3. links the word's own synonyms that are already in the dictionary
+    4. adds all of the word's synonyms and antonyms to the frontier one level
+       deeper. Ones that are already in the dictionary are crawled without
+       going to the network, but are still expanded further
+
+A base word is marked searched_synonym once none of its synonyms are left to
+look up. Synonyms past max_depth stay in SynonymsToLookUp, so they're still
+picked up later by fill_in_synonyms() or a deeper crawl.
+
+Main Functions:
+    crawl(seeds=(), max_depth=2, max_words=None, limit=None)
+        seeds: words to start from, added to the frontier at depth 0
+        max_depth: synonyms deeper than this aren't added to the frontier
+        max_words: the frontier never grows past this many words, counting
+        the ones already crawled
+        limit: stop after crawling this many words, None crawls until the
+        frontier is empty
+
+        Calling crawl() without seeds resumes the current crawl. Returns the
+        number of words crawled.
+
+        Example:
+            python3 manage.py crawl_synonyms bolster capricious --max-depth 2
+"""
+
+from django.db import transaction
+from django.db.utils import IntegrityError
+from dictionary import entry_documents, models, single_flight
+from dictionary import merriam_webster_scraper as mws
+from dictionary.variant_index import variant_index
+
+
+def crawl(seeds=(), max_depth=2, max_words=None, limit=None):
+    """Crawls pending words breadth first, returns number of words crawled"""
+    enqueue(seeds, 0, max_words)
+    crawled = 0
+    while limit is None or crawled < limit:
+        item = (models.CrawlFrontier.objects
+                      .filter(status=models.CrawlFrontier.PENDING)
+                      .order_by('depth', 'id')
+                      .first())
+        if item is None:
+            break
+        _crawl_word(item, max_depth, max_words)
+        crawled += 1
+        print(f'{item.word} (depth {item.depth}): {item.status}')
+    return crawled
+
+
+def enqueue(words, depth, max_words=None):
+    """Adds the words that aren't in the frontier yet, up to max_words"""
+    words = list(dict.fromkeys(words))
+    known = set(models.CrawlFrontier.objects.filter(word__in=words)
+                                            .values_list('word', flat=True))
+    new_words = [word for word in words if word not in known]
+    if max_words is not None:
+        room = max(max_words - models.CrawlFrontier.objects.count(), 0)
+        new_words = new_words[:room]
+    models.CrawlFrontier.objects.bulk_create(
+        [models.CrawlFrontier(word=word, depth=depth) for word in new_words])
+
+
+def reset():
+    """Forgets the current crawl"""
+    models.CrawlFrontier.objects.all().delete()
+
+
+def _crawl_word(item, max_depth, max_words):
+    """Looks up one word of the frontier and updates it in one transaction
+
+    The word's entry is added by scrape_word(), which downloads the page
+    before it starts its own transaction, so the database isn't locked
+    while the crawler waits on Merriam-Webster. Only linking the word and
+    updating the frontier run in the crawler's transaction. The lease on
+    the word is held over both, so other processes looking up the same word
+    wait until it commits. The entry documents of every word it changed are
+    rebuilt once, after the commit.
+    """
+    try:
+        with single_flight.lease(item.word):
+            found = mws.scrape_word(item.word)
+            with entry_documents.rebuild_once(), transaction.atomic():
+                item.status = _link(item, found, max_depth, max_words)
+                item.save()
+    except IntegrityError:
+        item.status = models.CrawlFrontier.FAILED
+        item.save()
+
+
+def _link(item, found, max_depth, max_words):
+    """Links a frontier word that was just looked up, returns its status"""
+    if not found or item.word not in variant_index:
+        #Nobody can link to a word Merriam-Webster doesn't have
+        lookups = models.SynonymsToLookUp.objects \
+                        .filter(lookup_word=item.word)
+        base_words = list(models.BaseWord.objects
+                                .filter(synonymstolookup__in=lookups)
+                                .distinct())
+        lookups.delete()
+        for base_word_ in base_words:
+            _mark_searched_if_done(base_word_)
+        return models.CrawlFrontier.NOT_FOUND
+    variant_word = models.VariantWord.objects.get(name=item.word)
+    _link_waiting_base_words(variant_word)
+    base_word_ = variant_word.base_word
+    remaining = _link_known_synonyms(base_word_)
+    if item.depth < max_depth:
+        enqueue(remaining + _linked_words(base_word_), item.depth + 1,
+                max_words)
+    return models.CrawlFrontier.DONE
+
+
+def _linked_words(base_word_):
+    """Returns the names of the synonyms and antonyms linked to a base word"""
+    synonyms = base_word_.synonym_set.values_list('synonym__name', flat=True)
+    antonyms = base_word_.antonym_set.values_list('antonym__name', flat=True)
+    return list(synonyms) + list(antonyms)
+
+
+def _link_waiting_base_words(variant_word):
+    """Links the base words that listed variant_word as a synonym/antonym"""
+    lookups = (models.SynonymsToLookUp.objects
+                     .filter(lookup_word=variant_word.name)
+                     .select_related('base_word'))
+    base_words = {}
+    for lookup in lookups:
+        base_words.setdefault(lookup.base_word, []) \
+                  .append((variant_word, lookup.is_synonym))
+    for base_word_, links in base_words.items():
+        mws.link_synonyms(base_word_, links)
+    lookups.delete()
+    for base_word_ in base_words:
+        _mark_searched_if_done(base_word_)
+
+
+def _link_known_synonyms(base_word_):
+    """Links the synonyms of base_word_ that are already in the dictionary
+
+    Returns the list of synonyms that still have to be looked up.
+    """
+    lookups = list(base_word_.synonymstolookup_set.all())
+    links = []
+    resolved = []
+    remaining = []
+    for lookup in lookups:
+        if lookup.lookup_word in variant_index:
+            variant_word = models.VariantWord.objects \
+                                 .get(name=lookup.lookup_word)
+            links.append((variant_word, lookup.is_synonym))
+            resolved.append(lookup.id)
+        else:
+            remaining.append(lookup.lookup_word)
+    mws.link_synonyms(base_word_, links)
+    models.SynonymsToLookUp.objects.filter(id__in=resolved).delete()
+    _mark_searched_if_done(base_word_)
+    return remaining
+
+
+def _mark_searched_if_done(base_word_):
+    """Sets searched_synonym once a base word has nothing left to look up"""
+    if not base_word_.synonymstolookup_set.exists():
+        models.BaseWord.objects.filter(id=base_word_.id) \
+                      .update(searched_synonym=True)
+        entry_documents.rebuild([base_word_.id])
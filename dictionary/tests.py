@@ -1,11 +1,73 @@
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import OperationalError, connection
+from django.core.cache import cache
 from django.contrib.auth.models import User
 from .models import (BaseWord, FormWord, PartOfSpeech, WordDefinition,
-    VariantWord, Profile, WordList)
+    VariantWord, Profile, WordList, ExampleSentence, SynonymsToLookUp,
+    CrawlFrontier, Synonym, Antonym, ScrapeJob, ScrapeLease, WordListEntry,
+    NotFoundWord, EntryVersion, ImportCheckpoint, EntryDocument, QuizIndex,
+    UserAccuracy, PendingCount)
 from dictionary import merriam_webster_scraper as mws
+from dictionary import (benchmark, counters, dictionary_dump, entry_cache,
+    entry_documents, entry_refresh, http_client, http_replay, not_found_cache,
+    quiz_index, quiz_sessions, scrape_jobs, single_flight, spaced_repetition,
+    synonym_crawler, word_importer)
+from dictionary.distractor_pool import (DistractorPool, NotEnoughDistractors,
+    distractor_pool)
+from dictionary.forms import SearchWordForm
+from dictionary.page_cache import PageCache
+from dictionary.retry_policy import (CircuitBreaker, CircuitOpenError,
+    RetryPolicy, parse_retry_after)
+from dictionary.variant_index import VariantNameIndex, variant_index
 from django.db.models import F
 from bs4 import BeautifulSoup
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
+from datetime import timedelta
+from django.utils import timezone
+import gzip
+import io
+import json
 import os
+import requests
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+
+PAGES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures',
+                         'synthetic_pages')
+#Tests replay recorded responses unless told to go to the site
+HTTP_MODE = os.environ.get('SCRAPER_HTTP_MODE', http_replay.REPLAY)
+#Entries cached by an earlier run would be served for the new test db
+_entry_cache_settings = override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'entries': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'test-entries'},
+})
+
+
+def setUpModule():
+    _entry_cache_settings.enable()
+
+
+def tearDownModule():
+    _entry_cache_settings.disable()
+    #Counts left in memory by the tests aren't written at exit
+    counters.clear()
+
+
+def _read_page(word):
+    """Returns the bytes of a saved entry page, None if there isn't one"""
+    try:
+        with open(os.path.join(PAGES_DIR, word + '.html'), 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
 
 
 class BaseWordModelTest(TestCase):
@@ -40,12 +102,1420 @@ class ScraperHelperFunctionTest(TestCase):
         self.assertEqual(mws._clean_pos_text('verb:'), 'verb')
         self.assertEqual(mws._clean_pos_text('abverb-sense1:'), 'abverb')
 
+    def test_rate_limiter_spaces_requests_per_host(self):
+        """Requests to one host wait on each other, other hosts don't"""
+        limiter = mws.RateLimiter(0.05)
+        start = time.monotonic()
+        for _ in range(3):
+            limiter.wait('https://www.merriam-webster.com/dictionary/back')
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+        start = time.monotonic()
+        limiter.wait('https://example.com/')
+        self.assertLess(time.monotonic() - start, 0.05)
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    """Answers every GET with a small page without closing the connection"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = b'<html><body>ok</body></html>'
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _ClosingHandler(_KeepAliveHandler):
+    """Same small page, but the connection is closed after each response"""
+    protocol_version = 'HTTP/1.0'
+
+
+class HttpClientTest(TestCase):
+    """Checks that the shared session keeps connections alive"""
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), _KeepAliveHandler)
+        thread = threading.Thread(target=self.server.serve_forever,
+                                  daemon=True)
+        thread.start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}/dictionary/'
+        http_client.configure(pool_size=2)
+        http_client.reset_stats()
+
+    def tearDown(self):
+        #Closing the session drops the kept alive connection to the server
+        http_client.configure()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connection_reused(self):
+        for word in ['back', 'bolster', 'endorse']:
+            r = http_client.get(self.url + word)
+            self.assertEqual(r.status_code, 200)
+        self.assertEqual(http_client.stats(), {'requests': 3,
+                                               'new_connections': 1,
+                                               'reused_connections': 2})
+
+
+class HttpReplayTest(TestCase):
+    """Records responses from a local server and plays them back"""
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.server = HTTPServer(('127.0.0.1', 0), _ClosingHandler)
+        thread = threading.Thread(target=self.server.serve_forever,
+                                  daemon=True)
+        thread.start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}/dictionary/'
+
+    def test_record_then_replay(self):
+        with self.settings(SCRAPER_HTTP_MODE=http_replay.RECORD,
+                           SCRAPER_HTTP_FIXTURE_DIR=self.tmp_dir.name):
+            recorded = http_client.get(self.url + 'back')
+        self.server.shutdown()
+        self.server.server_close()
+        with self.settings(SCRAPER_HTTP_MODE=http_replay.REPLAY,
+                           SCRAPER_HTTP_FIXTURE_DIR=self.tmp_dir.name):
+            replayed = http_client.get(self.url + 'Back/')
+            self.assertEqual(replayed.status_code, 200)
+            self.assertEqual(replayed.content, recorded.content)
+            self.assertEqual(replayed.headers['Content-Type'], 'text/html')
+            self.assertFalse(replayed.synthetic)
+            with self.assertRaises(http_replay.MissingRecording):
+                http_client.get(self.url + 'bolster')
+
+    def test_synthetic_recording_kept(self):
+        url = 'https://www.merriam-webster.com/dictionary/back'
+        self.assertTrue(http_replay.is_synthetic(url))
+        with self.settings(SCRAPER_HTTP_MODE=http_replay.RECORD), \
+                mock.patch.object(http_client, 'get_session') as get_session:
+            response = http_client.get(url)
+        get_session.assert_not_called()
+        self.assertTrue(response.synthetic)
+
+
+class BenchmarkTest(TestCase):
+    """Checks the pages made up by the mock dictionary server"""
+    def test_generated_page_is_renamed(self):
+        server = benchmark.MockDictionary(page_size=20000)
+        page = server.generate_page('benchword')
+        self.assertGreaterEqual(len(page), 20000)
+        entry = mws.parse_entry(mws._make_soup(page), 'benchword')
+        self.assertEqual(entry.word_name, 'benchword')
+        self.assertIn('benchworded', entry.spellings)
+        self.assertIn(('benchwordboost', True), entry.synonyms)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 0.5), 50)
+        self.assertEqual(benchmark.percentile(values, 0.99), 99)
+        self.assertIsNone(benchmark.percentile([], 0.5))
+
+    def test_run_restore(self):
+        base_words = BaseWord.objects.count()
+        report = benchmark.run_restore(copies=2)
+        self.assertEqual(report['copies'], 2)
+        self.assertGreater(report['restore_rows_per_second'], 0)
+        #Left with the copies loaded by loaddata
+        self.assertEqual(BaseWord.objects.count(), 2 * base_words)
+
+
+class EntryPageQueryTest(TestCase):
+    """The entry page takes the same few queries however big the entry is"""
+    def setUp(self):
+        BaseWord.objects.update(searched_synonym=True)
+        self.bolster = BaseWord.objects.get(name='bolster')
+        self.argot = BaseWord.objects.get(name='argot')
+        for word in BaseWord.objects.exclude(id=self.bolster.id)[:10]:
+            variant_word = word.variantword_set.first()
+            Synonym.objects.create(base_word=self.bolster,
+                                   synonym=variant_word)
+            Antonym.objects.create(base_word=self.bolster,
+                                   antonym=variant_word)
+        variant_index.warm()
+        #The entries were changed without the scraper rebuilding them
+        entry_documents.backfill(rebuild_all=True)
+        entry_cache.clear()
+        counters.clear()
+        self.addCleanup(counters.clear)
+
+    def test_detail_queries_fixed(self):
+        self.assertGreater(self.bolster.formword_set.count(),
+                           self.argot.formword_set.count())
+        for word in [self.argot, self.bolster]:
+            #The entry document, the view is counted in memory
+            with self.assertNumQueries(1):
+                response = self.client.get(f'/dictionary/{word.id}/')
+            self.assertEqual(response.status_code, 200)
+        self.assertContains(response, f'/dictionary/{self.argot.id}\'')
+        #None once the entry is cached
+        with self.assertNumQueries(0):
+            response = self.client.get(f'/dictionary/{self.bolster.id}/')
+        self.assertContains(response, 'Synonyms:')
+
+    def test_search_result_queries_fixed(self):
+        #The variant word and the entry document
+        with self.assertNumQueries(2):
+            response = self.client.get('/', {'search_term': 'bolster'})
+        self.assertContains(response, 'Synonyms:')
+        with self.assertNumQueries(1):
+            self.client.get('/', {'search_term': 'bolster'})
+
+    def test_scraper_writes_invalidate_entry(self):
+        entry = entry_cache.get_entry(self.argot.id)
+        self.assertNotIn('Synonyms:', entry['html'])
+        with self.assertNumQueries(0):
+            self.assertEqual(entry_cache.get_entry(self.argot.id), entry)
+        variant_word = self.bolster.variantword_set.first()
+        with self.captureOnCommitCallbacks(execute=True):
+            mws.link_synonyms(self.argot, [(variant_word, True)])
+        self.assertIn('Synonyms:', entry_cache.get_entry(self.argot.id)['html'])
+        document = EntryDocument.objects.get(base_word=self.argot).document
+        self.assertEqual(document['synonyms'],
+                         [{'name': variant_word.name,
+                           'base_word_id': self.bolster.id}])
+
+    def test_missing_word(self):
+        response = self.client.get('/dictionary/999999/')
+        self.assertEqual(response.status_code, 404)
+
+
+class EntryDocumentTest(TestCase):
+    """Every entry can be read from a single row"""
+    def setUp(self):
+        self.bolster = BaseWord.objects.get(name='bolster')
+
+    def test_document_matches_entry(self):
+        document = entry_documents.get_document(self.bolster.id)
+        self.assertEqual(document['name'], 'bolster')
+        self.assertIn('bolster', document['variants'])
+        definitions = [definition['definition']
+                       for form in document['forms']
+                       for definition in form['definitions']]
+        self.assertCountEqual(
+            definitions,
+            WordDefinition.objects.filter(form_word__base_word=self.bolster)
+                                  .values_list('definition', flat=True))
+        with self.assertNumQueries(1):
+            self.assertEqual(entry_documents.get_document(self.bolster.id),
+                             document)
+        self.assertIsNone(entry_documents.get_document(999999))
+
+    def test_built_by_migration(self):
+        self.assertEqual(EntryDocument.objects.count(),
+                         BaseWord.objects.count())
+        self.assertEqual(EntryDocument.objects.get(base_word=self.bolster)
+                                              .document,
+                         entry_documents.build(BaseWord.objects.with_entry()
+                                                       .get(name='bolster')))
+
+    def test_backfill(self):
+        EntryDocument.objects.all().delete()
+        #Reading builds the document without saving it
+        self.assertEqual(entry_documents.get_document(self.bolster.id)['name'],
+                         'bolster')
+        self.assertFalse(EntryDocument.objects.exists())
+        built = entry_documents.backfill(batch_size=10)
+        self.assertEqual(built, BaseWord.objects.count())
+        self.assertEqual(EntryDocument.objects.count(),
+                         BaseWord.objects.count())
+        self.assertEqual(entry_documents.backfill(), 0)
+        EntryDocument.objects.filter(base_word=self.bolster).update(version=0)
+        self.assertEqual(entry_documents.backfill(), 1)
+
+    def test_rebuilt_once_per_write(self):
+        (entry, _) = mws._parse_page('bolster', _read_page('bolster'))
+        BaseWord.objects.filter(name='bolster').delete()
+        with mock.patch.object(entry_documents, '_save_documents',
+                               wraps=entry_documents._save_documents) as save:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                mws._scrape_word('bolster', entry)
+                #Nothing is built until the transaction commits
+                save.assert_not_called()
+        bolster = BaseWord.objects.get(name='bolster')
+        save.assert_called_once_with({bolster.id})
+        self.assertTrue(callbacks)
+        self.assertTrue(EntryDocument.objects.filter(base_word=bolster)
+                                             .exists())
+
+
+class DictionaryDumpTest(TestCase):
+    """Dumps the initial data and restores it over itself"""
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.path = os.path.join(tmp_dir.name, 'dictionary.jsonl.gz')
+
+    def test_dump_and_restore(self):
+        before = list(WordDefinition.objects.order_by('id')
+                                    .values_list('id', 'form_word__base_word'
+                                                 '__name', 'definition'))
+        user = User.objects.create_user(username='learner', password='test')
+        word_list = WordList.objects.create(list_name='to learn', user=user)
+        bolster = BaseWord.objects.get(name='bolster')
+        WordListEntry.objects.create(word_list=word_list, word=bolster)
+        UserAccuracy.objects.create(user=user, base_word=bolster,
+                                    total_guesses=3)
+        counts = dictionary_dump.dump(self.path)
+        self.assertEqual(counts['baseword'], BaseWord.objects.count())
+        #Not in the dump, so its entry can't be kept
+        zeugma = BaseWord.objects.create(name='zeugma')
+        WordListEntry.objects.create(word_list=word_list, word=zeugma)
+        with self.assertRaises(dictionary_dump.DumpError):
+            dictionary_dump.restore(self.path)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(dictionary_dump.restore(self.path, replace=True),
+                             {**counts, 'wordlistentry': 1,
+                              'useraccuracy': 1})
+        self.assertEqual(list(WordListEntry.objects
+                                           .values_list('word__name',
+                                                        flat=True)),
+                         ['bolster'])
+        self.assertEqual(UserAccuracy.objects.get(user=user).total_guesses, 3)
+        #A query per chunk of rows instead of one per row
+        self.assertLess(len(queries), counts['synonymstolookup'])
+        after = list(WordDefinition.objects.order_by('id')
+                                   .values_list('id', 'form_word__base_word'
+                                                '__name', 'definition'))
+        self.assertEqual(after, before)
+        self.assertTrue('bolster' in variant_index)
+
+    def test_not_a_dump(self):
+        with gzip.open(self.path, 'wt') as f:
+            f.write('[{"model": "dictionary.baseword"}]\n')
+        with self.assertRaises(dictionary_dump.DumpError):
+            dictionary_dump.restore(self.path)
+
+
+class PageCacheTest(TestCase):
+    """Checks storing, expiring and evicting pages in the page cache"""
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = PageCache(self.tmp_dir.name, ttl=60, max_bytes=10 ** 6)
+        self.url = 'https://www.merriam-webster.com/dictionary/bolster'
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_round_trip_with_normalized_url(self):
+        self.cache.put(self.url, b'<html>bolster</html>')
+        same_url = 'https://WWW.merriam-webster.com/dictionary/Bolster/'
+        self.assertEqual(self.cache.get(same_url), b'<html>bolster</html>')
+        self.assertIsNone(self.cache.get(self.url + 's'))
+
+    def test_expired_page_is_missing(self):
+        self.cache.put(self.url, b'<html>bolster</html>')
+        path = self.cache.path_for(self.url)
+        old = time.time() - 120
+        os.utime(path, (old, old))
+        self.assertIsNone(self.cache.get(self.url))
+        self.assertFalse(os.path.exists(path))
+
+    def test_oldest_pages_evicted_when_full(self):
+        page = os.urandom(2000)
+        self.cache.max_bytes = 5000
+        for i, word in enumerate(['back', 'bolster', 'endorse']):
+            url = 'https://www.merriam-webster.com/dictionary/' + word
+            self.cache.put(url, page)
+            written = time.time() - 10 + i
+            os.utime(self.cache.path_for(url), (written, written))
+        self.assertIsNone(self.cache.get(
+            'https://www.merriam-webster.com/dictionary/back'))
+        self.assertEqual(self.cache.get(self.url), page)
+        self.assertLessEqual(self.cache.total_bytes(), 5000)
+
+
+class RetryPolicyTest(TestCase):
+    """Checks retrying, backing off and opening the circuit"""
+    def setUp(self):
+        self.sleeps = []
+        self.policy = RetryPolicy(max_retries=3, base=1.0, max_delay=30,
+                                  sleep=self.sleeps.append)
+
+    def _responses(self, *responses):
+        """Returns a send() that answers with each response in turn"""
+        responses = list(responses)
+
+        def send():
+            response = responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+        return send
+
+    def test_retries_until_success(self):
+        busy = mock.Mock(status_code=503, headers={'Retry-After': '7'})
+        ok = mock.Mock(status_code=200, headers={})
+        send = self._responses(requests.exceptions.Timeout(), busy, ok)
+        self.assertIs(self.policy.call(send), ok)
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertLessEqual(self.sleeps[0], 1.0)
+        self.assertEqual(self.sleeps[1], 7.0)
+
+    def test_gives_up_after_max_retries(self):
+        send = self._responses(*[requests.exceptions.ConnectionError()] * 4)
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.policy.call(send)
+        self.assertEqual(len(self.sleeps), 3)
+        #Backoff delays never go past base * 2 ** attempt
+        for attempt, delay in enumerate(self.sleeps):
+            self.assertLessEqual(delay, 2 ** attempt)
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after('120'), 120.0)
+        self.assertEqual(parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'),
+                         0.0)
+        self.assertIsNone(parse_retry_after('soon'))
+
+    def test_circuit_opens_and_recovers(self):
+        breaker = CircuitBreaker(threshold=2, cooldown=60)
+        with mock.patch('dictionary.retry_policy.time.monotonic') as clock:
+            clock.return_value = 1000.0
+            breaker.record_failure()
+            self.assertTrue(breaker.allow())
+            breaker.record_failure()
+            self.assertFalse(breaker.allow())
+            self.assertEqual(breaker.status(), {'state': 'open',
+                                                'failures': 2,
+                                                'retry_in': 60.0})
+            clock.return_value = 1060.0
+            #Only one test request once the cooldown is over
+            self.assertTrue(breaker.allow())
+            self.assertFalse(breaker.allow())
+            breaker.record_success()
+            self.assertEqual(breaker.status()['state'], 'closed')
+
+    def test_stale_page_served_while_circuit_open(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        cache = PageCache(tmp_dir.name, ttl=60, max_bytes=10 ** 6,
+                          stale_ttl=3600)
+        breaker = CircuitBreaker(threshold=1, cooldown=60)
+        breaker.record_failure()
+        url = mws.BASE_URL + 'bolster'
+        cache.put(url, b'<html>bolster</html>')
+        old = time.time() - 120
+        os.utime(cache.path_for(url), (old, old))
+        with mock.patch.object(mws, 'page_cache', cache), \
+             mock.patch.object(mws, 'circuit_breaker', breaker), \
+             mock.patch.object(http_client, 'get') as get:
+            self.assertEqual(mws._fetch_page('bolster'),
+                             b'<html>bolster</html>')
+            with self.assertRaises(CircuitOpenError):
+                mws._fetch_page('bolsters')
+        get.assert_not_called()
+
+
+class NotFoundCacheTest(TestCase):
+    """Words that got a 404 aren't requested again until the ttl passes"""
+    def setUp(self):
+        patcher = mock.patch.object(http_client, 'get',
+                                    return_value=mock.Mock(status_code=404))
+        self.get = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_404_remembered(self):
+        self.assertIsNone(mws._fetch_page('bolsterr'))
+        self.assertIsNone(mws._fetch_page('bolsterr'))
+        self.assertEqual(self.get.call_count, 1)
+        self.assertTrue(not_found_cache.is_missing('bolsterr'))
+        form = SearchWordForm({'search_term': 'bolsterr'})
+        self.assertFalse(form.is_valid())
+
+    def test_expired_word_requested_again(self):
+        with self.settings(SCRAPER_NOT_FOUND_TTL=-1):
+            mws._fetch_page('bolsterr')
+            mws._fetch_page('bolsterr')
+            self.assertEqual(self.get.call_count, 2)
+            self.assertEqual(not_found_cache.purge(expired_only=True), 1)
+        self.assertFalse(NotFoundWord.objects.exists())
+
+
+class EntryRefreshTest(TestCase):
+    """Refreshes bolster from the initial data with the saved bolster page"""
+    def setUp(self):
+        self.bolster = BaseWord.objects.get(name='bolster')
+        self.page = _read_page('bolster')
+        patcher = mock.patch.object(http_client, 'get')
+        self.get = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _respond(self, status_code, content=b''):
+        self.get.return_value = mock.Mock(
+            status_code=status_code, content=content,
+            headers={'ETag': '"v1"', 'Last-Modified':
+                     'Wed, 21 Oct 2015 07:28:00 GMT'})
+
+    def test_only_changed_pages_rewritten(self):
+        self._respond(200, self.page)
+        old_definition = WordDefinition.objects.create(
+            form_word=self.bolster.formword_set.first(),
+            definition='not on the page anymore')
+        self.assertEqual(entry_refresh.refresh_word(self.bolster),
+                         entry_refresh.CHANGED)
+        self.assertFalse(WordDefinition.objects
+                                       .filter(id=old_definition.id).exists())
+        self.assertTrue(WordDefinition.objects.filter(
+            form_word__base_word=self.bolster,
+            definition='a long pillow or cushion').exists())
+        version = EntryVersion.objects.get(base_word=self.bolster)
+        self.assertEqual(version.etag, '"v1"')
+
+        self._respond(304)
+        self.assertEqual(entry_refresh.refresh_word(self.bolster),
+                         entry_refresh.UNCHANGED)
+        headers = self.get.call_args[1]['headers']
+        self.assertEqual(headers['If-None-Match'], '"v1"')
+        self.assertIn('If-Modified-Since', headers)
+
+        self._respond(200, self.page)
+        with mock.patch.object(mws, 'update_entry') as update_entry:
+            self.assertEqual(entry_refresh.refresh_word(self.bolster),
+                             entry_refresh.UNCHANGED)
+        update_entry.assert_not_called()
+
+    def test_due_words_by_staleness_and_views(self):
+        capricious = BaseWord.objects.get(name='capricious')
+        BaseWord.objects.filter(id=capricious.id).update(view_count=5)
+        with CaptureQueriesContext(connection) as queries:
+            due = entry_refresh.due_words(limit=2)
+        self.assertEqual(due[0], capricious)
+        #Sorted and limited by the db, not after loading every word
+        self.assertEqual(len(queries), 1)
+        self.assertIn('LIMIT 2', queries[0]['sql'])
+        now = timezone.now()
+        EntryVersion.objects.create(base_word=self.bolster,
+                                    fetched=now - timedelta(days=40))
+        EntryVersion.objects.create(base_word=capricious,
+                                    fetched=now - timedelta(days=31))
+        EntryVersion.objects.bulk_create(
+            [EntryVersion(base_word=base_word, fetched=now)
+             for base_word in BaseWord.objects
+                                      .filter(entryversion__isnull=True)])
+        #31 days * 6 views beats 40 days * 1 view
+        self.assertEqual(entry_refresh.due_words(), [capricious, self.bolster])
+
+
+class TargetedParserTest(TestCase):
+    """The targeted parse modes must extract the same entry as parsing the
+    whole page with html5lib"""
+    def setUp(self):
+        BaseWord.objects.all().delete()
+
+    def _pages(self):
+        """Returns dict of word -> page to compare the parse modes on
+
+        Besides the saved pages, the bolster page is also checked with
+        markup that could be mistaken for the end of the entry section, and
+        as the mock dictionary of the benchmark serves it for other words.
+        """
+        pages = {name[:-len('.html')]: _read_page(name[:-len('.html')])
+                 for name in sorted(os.listdir(PAGES_DIR))
+                 if name.endswith('.html')}
+        tricky = pages['bolster'].decode('utf-8')
+        tricky = tricky.replace(
+            '<div id="right-content"',
+            '<!-- </div></div> <div id="definition-wrapper"> -->\n'
+            '<script>document.write("</div></div>");</script>\n'
+            '<style>div:after { content: "</div>"; }</style>\n'
+            '<DIV class="spacer"><div></div></DIV>\n'
+            '<div id="right-content"')
+        pages['tricky'] = tricky.encode('utf-8')
+        pages['benchword'] = (benchmark.MockDictionary(page_size=20000)
+                                       .generate_page('benchword'))
+        return pages
+
+    def _scrape_saved_page(self, word, page=None):
+        """Scrapes word from its page and returns what was added"""
+        if page is None:
+            page = _read_page(word)
+        with mock.patch.object(mws, '_fetch_page', lambda word: page):
+            mws.scrape_word(word)
+        entry = {
+            'base_words': list(BaseWord.objects.order_by('id')
+                                       .values_list('name', flat=True)),
+            'pos': list(FormWord.objects.order_by('id')
+                                .values_list('pos__name', flat=True)),
+            'definitions': list(WordDefinition.objects.order_by('id')
+                                      .values_list('definition', flat=True)),
+            'examples': list(ExampleSentence.objects.order_by('id')
+                                    .values_list('sentence', flat=True)),
+            'variants': sorted(VariantWord.objects
+                                          .values_list('name', flat=True)),
+            'lookups': list(SynonymsToLookUp.objects.order_by('id')
+                                    .values_list('lookup_word', 'is_synonym')),
+        }
+        BaseWord.objects.all().delete()
+        return entry
+
+    def test_same_entry_as_full_parse(self):
+        for (name, page) in self._pages().items():
+            word = 'benchword' if name == 'benchword' else 'bolster'
+            with override_settings(SCRAPER_PARSE_MODE='full',
+                                   SCRAPER_HTML_PARSER='html5lib'):
+                expected = self._scrape_saved_page(word, page)
+            self.assertTrue(expected['definitions'])
+            for parser in ['html5lib', 'html.parser']:
+                with self.subTest(page=name, parser=parser), \
+                     override_settings(SCRAPER_PARSE_MODE='targeted',
+                                       SCRAPER_HTML_PARSER=parser):
+                    self.assertEqual(self._scrape_saved_page(word, page),
+                                     expected)
+
+    def test_bolster_page_extracted(self):
+        with override_settings(SCRAPER_PARSE_MODE='targeted'):
+            entry = self._scrape_saved_page('bolster')
+        self.assertEqual(entry['pos'], ['noun', 'verb'])
+        self.assertEqual(entry['definitions'],
+                         ['a long pillow or cushion',
+                          'a structural part designed to eliminate friction or '
+                              'provide support or bearing',
+                          'to support with or as if with a bolster',
+                          'reinforce',
+                          'to give a boost to',
+                         ])
+        self.assertEqual(entry['variants'], ['bolster', 'bolstered',
+                                             'bolsterer', 'bolstering'])
+
+    def test_targeted_html5lib_tree_matches(self):
+        for (name, page) in self._pages().items():
+            with self.subTest(page=name):
+                with override_settings(SCRAPER_PARSE_MODE='full'):
+                    full = mws._make_soup(page)
+                with override_settings(SCRAPER_PARSE_MODE='targeted'):
+                    targeted = mws._make_soup(page)
+                self.assertEqual(
+                    str(targeted.find('div', {'id': 'definition-wrapper'})),
+                    str(full.find('div', {'id': 'definition-wrapper'})))
+                #Only the entry section was parsed
+                self.assertIsNone(targeted.find('footer'))
+                self.assertIsNone(targeted.find('header'))
+
+
+class ParseAndSaveEntryTest(TestCase):
+    """The parse stage must not use the db and the save stage must only use a
+    few queries no matter how many definitions a word has"""
+    def setUp(self):
+        BaseWord.objects.all().delete()
+        self.soup = mws._make_soup(_read_page('bolster'))
+
+    def test_parse_entry_without_queries(self):
+        with self.assertNumQueries(0):
+            entry = mws.parse_entry(self.soup, 'bolster')
+        self.assertIsNone(entry.redirect)
+        self.assertEqual(entry.base_name, 'bolster')
+        self.assertEqual([form.pos for form in entry.forms], ['noun', 'verb'])
+        self.assertEqual(entry.forms[1].definitions[-1],
+                         ('to give a boost to',
+                          ['news that bolstered their spirits ']))
+        self.assertEqual(entry.synonyms[:2], [('boost', True),
+                                              ('brace', True)])
+        self.assertIn(('weaken', False), entry.synonyms)
+
+    def test_save_entry_in_bulk(self):
+        entry = mws.parse_entry(self.soup, 'bolster')
+        with CaptureQueriesContext(connection) as queries:
+            base_word = mws._save_entry(entry, False)
+        #Databases that don't return bulk created ids need four more queries,
+        #rebuilding the entry document takes ten
+        self.assertLessEqual(len(queries), 26)
+        self.assertEqual(base_word.name, 'bolster')
+        self.assertEqual(WordDefinition.objects.count(), 5)
+        self.assertEqual(ExampleSentence.objects.count(), 3)
+        #Saving again finds every row and creates nothing
+        mws._save_entry(entry, False)
+        self.assertEqual(FormWord.objects.count(), 2)
+        self.assertEqual(WordDefinition.objects.count(), 5)
+        self.assertEqual(ExampleSentence.objects.count(), 3)
+        self.assertEqual(VariantWord.objects.count(), 4)
+
+
+class DistractorPoolTest(TestCase):
+    """Wrong answers for the game are drawn from memory, never synonyms"""
+    def setUp(self):
+        self.pool = DistractorPool()
+        self.bolster = BaseWord.objects.get(name='bolster')
+        self.others = list(BaseWord.objects.exclude(id=self.bolster.id)
+                                   .order_by('id'))
+        for word in self.others:
+            Synonym.objects.create(base_word=self.bolster,
+                                   synonym=word.variantword_set.first())
+        self.synonyms = self.others[:3]
+        self.excluded = [self.bolster.id] + [word.id for word in self.synonyms]
+
+    def _base_word_ids(self, names):
+        return set(VariantWord.objects.filter(name__in=names)
+                              .values_list('base_word_id', flat=True))
+
+    def test_never_picks_synonyms(self):
+        for _ in range(50):
+            names = self.pool.sample(3, exclude_base_word_ids=self.excluded)
+            base_word_ids = self._base_word_ids(names)
+            self.assertEqual(len(base_word_ids), 3)
+            self.assertFalse(base_word_ids & set(self.excluded))
+
+    def test_grouped_by_part_of_speech(self):
+        verbs = set(FormWord.objects.filter(pos__name='verb')
+                            .values_list('base_word_id', flat=True))
+        for _ in range(20):
+            names = self.pool.sample(3, pos='verb',
+                                     exclude_base_word_ids=self.excluded)
+            self.assertLessEqual(self._base_word_ids(names), verbs)
+        #Not enough words of a part of speech falls back to all of them
+        self.assertEqual(len(self.pool.sample(3, pos='interjection')), 3)
+
+    def test_refreshed_incrementally(self):
+        self.pool.sample(3)
+        #Only asks for synonyms linked since the last draw
+        with self.assertNumQueries(1):
+            self.pool.sample(3)
+        word = BaseWord.objects.create(name='zyzzyva')
+        VariantWord.objects.create(base_word=word, name='zyzzyva')
+        Synonym.objects.create(base_word=self.bolster,
+                               synonym=word.variantword_set.first())
+        everyone_else = [other.id for other in self.others] + [self.bolster.id]
+        self.assertEqual(self.pool.sample(1, exclude_base_word_ids=
+                                          everyone_else), ['zyzzyva'])
+
+    def test_not_enough_words(self):
+        everyone = BaseWord.objects.values_list('id', flat=True)
+        with self.assertRaises(NotEnoughDistractors):
+            self.pool.sample(3, exclude_base_word_ids=everyone[1:])
+
+
+class GameTestCase(TestCase):
+    """A word list of six words, the first three of which have synonyms"""
+    def setUp(self):
+        self.user = user = User.objects.create_user(username='learner',
+                                                    password='test')
+        self.client.login(username='learner', password='test')
+        self.word_list = WordList.objects.create(list_name='to learn',
+                                                 user=user)
+        self.words = list(BaseWord.objects.order_by('id')[:6])
+        self.others = list(BaseWord.objects.order_by('id')[6:])
+        BaseWord.objects.update(searched_synonym=True)
+        #Only the first three words of the list have synonyms
+        for (word, other) in zip(self.words[:3], self.others):
+            Synonym.objects.create(base_word=word,
+                                   synonym=other.variantword_set.first())
+        #Names for the wrong answers
+        for word in self.others[1:]:
+            Synonym.objects.create(base_word=self.others[0],
+                                   synonym=word.variantword_set.first())
+        entry_documents.backfill(rebuild_all=True)
+        distractor_pool.clear()
+        self.addCleanup(distractor_pool.clear)
+        counters.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            for word in self.words:
+                self.word_list.add_word(word)
+
+
+
+class QuizIndexTest(GameTestCase):
+    """The game reads a word list's quizzable words from a single row"""
+    def _quizzable(self):
+        quiz = QuizIndex.objects.get(word_list=self.word_list)
+        return [entry['id'] for entry in quiz.entries]
+
+    def test_built_when_words_added_or_removed(self):
+        self.assertEqual(self._quizzable(),
+                         [word.id for word in self.words[:3]])
+        entry = self.word_list.wordlistentry_set.get(word=self.words[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            entry.delete()
+        self.assertEqual(self._quizzable(),
+                         [word.id for word in self.words[1:3]])
+        with self.assertNumQueries(1):
+            quiz = quiz_index.get_quiz(self.word_list.id)
+        self.assertEqual(quiz['size'], 5)
+        self.assertEqual(quiz['entries'][0]['synonyms'],
+                         [{'name': self.others[1].variantword_set.first().name,
+                           'base_word_id': self.others[1].id}])
+
+    def test_rebuilt_when_synonyms_linked(self):
+        variant_word = self.others[-1].variantword_set.first()
+        with self.captureOnCommitCallbacks(execute=True):
+            mws.link_synonyms(self.words[4], [(variant_word, True)])
+        self.assertIn(self.words[4].id, self._quizzable())
+
+    def test_queues_words_without_synonyms_looked_up(self):
+        BaseWord.objects.filter(id=self.words[5].id) \
+                .update(searched_synonym=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            entry_documents.rebuild([self.words[5].id])
+        self.assertTrue(ScrapeJob.objects.filter(word=self.words[5].name)
+                                         .exists())
+
+    def test_play_game(self):
+        response = self.client.get(f'/dictionary/word_list/'
+                                   f'{self.word_list.id}/play_game')
+        self.assertEqual(response.status_code, 200)
+        test_word = response.context['test_word']
+        self.assertIn(test_word, [word.name for word in self.words[:3]])
+        synonyms = BaseWord.objects.get(name=test_word).synonym_set \
+                           .values_list('synonym__name', flat=True)
+        #One right answer, never a synonym among the wrong ones
+        self.assertEqual(len(set(response.context['choices'])
+                             & set(synonyms)), 1)
+
+    @override_settings(QUIZ_BATCH_SIZE=4)
+    def test_answers_graded_against_batch(self):
+        url = f'/dictionary/word_list/{self.word_list.id}/play_game'
+        self.client.get(url)
+        quiz = self.client.session[quiz_sessions.SESSION_KEY]
+        self.assertEqual(len(quiz['questions']), 4)
+        #Every word is asked about before one is asked again
+        self.assertEqual(len({question['word']
+                              for question in quiz['questions'][:3]}), 3)
+        with mock.patch.object(quiz_index, 'get_quiz',
+                               wraps=quiz_index.get_quiz) as get_quiz:
+            for (position, question) in enumerate(quiz['questions']):
+                response = self.client.post(url, {
+                    'question': position, 'choice': question['answer']})
+                self.assertEqual(response.context['msg'],
+                                 'Nice! Correct synonym')
+            #A new batch once the first one is used up
+            self.assertEqual(get_quiz.call_count, 1)
+        counters.flush()
+        self.assertEqual(sum(BaseWord.objects.values_list('correct_guesses',
+                                                          flat=True)), 4)
+        #Sending an answer again doesn't count it twice
+        response = self.client.post(url, {'question': 3, 'choice': 'x'})
+        self.assertEqual(response.context['msg'],
+                         'That question was already answered')
+        counters.flush()
+        self.assertEqual(sum(BaseWord.objects.values_list('total_guesses',
+                                                          flat=True)), 4)
+
+
+class SpacedRepetitionTest(GameTestCase):
+    """Review asks about the words that are due, most overdue first"""
+    def _schedule(self, word, days):
+        UserAccuracy.objects.create(user=self.user, base_word=word,
+                                    due=timezone.now() + timedelta(days=days))
+
+    def test_review_schedule(self):
+        accuracy = UserAccuracy(user=self.user, base_word=self.words[0])
+        now = timezone.now()
+        for interval in [1, 6, 15, 38]:
+            spaced_repetition.review(accuracy, True, now)
+            self.assertEqual(accuracy.interval, interval)
+        self.assertEqual(accuracy.due, now + timedelta(days=38))
+        spaced_repetition.review(accuracy, False, now)
+        self.assertEqual((accuracy.repetitions, accuracy.interval), (0, 1))
+        self.assertAlmostEqual(accuracy.ease, 1.96)
+        for _ in range(5):
+            spaced_repetition.review(accuracy, False, now)
+        self.assertEqual(accuracy.ease, spaced_repetition.MIN_EASE)
+
+    def test_due_words(self):
+        self._schedule(self.words[1], -1)
+        self._schedule(self.words[0], -2)
+        self._schedule(self.words[3], -3)
+        quizzable = {word.id for word in self.words[:3]}
+        #Due words, then the words that were never answered
+        with self.assertNumQueries(2):
+            due = spaced_repetition.due_words(self.user, self.word_list.id,
+                                              10, quizzable)
+        self.assertEqual(due, [self.words[0].id, self.words[1].id,
+                               self.words[2].id])
+        self.assertEqual(spaced_repetition.due_words(
+            self.user, self.word_list.id, 1, quizzable), [self.words[0].id])
+        self._schedule(self.words[2], 1)
+        self.assertEqual(spaced_repetition.due_words(
+            self.user, self.word_list.id, 10, quizzable),
+            [self.words[0].id, self.words[1].id])
+
+    def test_review_game(self):
+        self._schedule(self.words[2], -1)
+        self._schedule(self.words[0], 1)
+        self._schedule(self.words[1], 2)
+        url = f'/dictionary/word_list/{self.word_list.id}/review'
+        response = self.client.get(url)
+        self.assertEqual(response.context['test_word'], self.words[2].name)
+        question = self.client.session[quiz_sessions.SESSION_KEY] \
+                                      ['questions'][0]
+        self.client.post(url, {'question': 0, 'choice': question['answer']})
+        counters.flush()
+        accuracy = UserAccuracy.objects.get(user=self.user,
+                                            base_word=self.words[2])
+        self.assertEqual((accuracy.repetitions, accuracy.correct_guesses),
+                         (1, 1))
+        self.assertGreater(accuracy.due, timezone.now())
+        response = self.client.get(url)
+        self.assertContains(response, 'None of your words are due')
+
+
+class CountersTest(TestCase):
+    """Counts are added up in memory and added to their rows later"""
+    def setUp(self):
+        self.bolster = BaseWord.objects.get(name='bolster')
+        counters.clear()
+        self.addCleanup(counters.clear)
+
+    def test_increment_and_flush(self):
+        with self.assertNumQueries(0):
+            counters.increment(BaseWord, self.bolster.id, total_guesses=1,
+                               correct_guesses=1)
+            counters.increment(BaseWord, self.bolster.id, total_guesses=1,
+                               correct_guesses=0)
+        self.bolster.refresh_from_db()
+        self.assertEqual(self.bolster.total_guesses, 0)
+        #One pending count per field
+        self.assertEqual(counters.flush(), 2)
+        self.bolster.refresh_from_db()
+        self.assertEqual((self.bolster.total_guesses,
+                          self.bolster.correct_guesses), (2, 1))
+        self.assertFalse(PendingCount.objects.exists())
+        self.assertEqual(counters.flush(), 0)
+        with self.assertRaises(ValueError):
+            counters.increment(BaseWord, self.bolster.id, name=1)
+
+    @override_settings(COUNTER_BUFFER_SIZE=2)
+    def test_buffer_written_when_full(self):
+        for _ in range(3):
+            counters.increment(BaseWord, self.bolster.id, view_count=1)
+        self.assertFalse(PendingCount.objects.exists())
+        #The insert, in a savepoint
+        with self.assertNumQueries(3):
+            counters.increment(BaseWord, self.bolster.id, total_guesses=1)
+        self.assertEqual(sorted(PendingCount.objects.values_list(
+            'field', 'amount')), [('total_guesses', 1), ('view_count', 3)])
+
+    @override_settings(COUNTER_BUFFER_SIZE=1)
+    def test_counts_kept_when_write_fails(self):
+        with mock.patch.object(PendingCount.objects, 'bulk_create',
+                               side_effect=OperationalError('locked')), \
+                self.assertLogs('dictionary.counters', 'WARNING'):
+            counters.increment(BaseWord, self.bolster.id, view_count=1)
+        self.assertFalse(PendingCount.objects.exists())
+        counters.flush()
+        self.bolster.refresh_from_db()
+        self.assertEqual(self.bolster.view_count, 1)
+
+    @override_settings(COUNTER_BUFFER_SIZE=1, COUNTER_MAX_PENDING=1)
+    def test_flushed_past_max_pending(self):
+        counters.increment(BaseWord, self.bolster.id, view_count=1)
+        self.assertEqual(PendingCount.objects.count(), 1)
+        counters.increment(BaseWord, self.bolster.id, total_guesses=1)
+        self.assertFalse(PendingCount.objects.exists())
+        self.bolster.refresh_from_db()
+        self.assertEqual((self.bolster.view_count,
+                          self.bolster.total_guesses), (1, 1))
+
+    def test_detail_counts_view(self):
+        self.client.get(f'/dictionary/{self.bolster.id}/')
+        self.client.get(f'/dictionary/{self.bolster.id}/')
+        counters.flush()
+        self.bolster.refresh_from_db()
+        self.assertEqual(self.bolster.view_count, 2)
+
+
+class ConcurrentCountersTest(TransactionTestCase):
+    """Counting from many threads at once doesn't lose any counts"""
+    def setUp(self):
+        user = User.objects.create_user(username='viewer')
+        self.word_list = WordList.objects.create(list_name='popular',
+                                                 user=user)
+        self.addCleanup(variant_index.clear)
+        counters.clear()
+        self.addCleanup(counters.clear)
+
+    def test_no_lost_counts(self):
+        def count():
+            try:
+                #The in-memory test db only lets one thread write at a time
+                for _ in range(10):
+                    with mws._db_lock:
+                        counters.increment(WordList, self.word_list.id,
+                                           view_count=1)
+                    with mws._db_lock:
+                        counters.flush()
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=count) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        counters.flush()
+        self.word_list.refresh_from_db()
+        self.assertEqual(self.word_list.view_count, 40)
+
+
+class VariantNameIndexTest(TestCase):
+    """Checks that the variant name index stays in sync with the db"""
+    def setUp(self):
+        self.index = VariantNameIndex()
+        self.back = BaseWord.objects.create(name='back')
+        VariantWord.objects.create(base_word=self.back, name='backed')
+
+    def test_hit_after_warm_needs_no_query(self):
+        self.index.warm()
+        with self.assertNumQueries(0):
+            self.assertTrue('backed' in self.index)
+
+    def test_miss_checks_db(self):
+        self.index.warm()
+        VariantWord.objects.bulk_create([VariantWord(base_word=self.back,
+                                                     name='backing')])
+        self.assertTrue('backing' in self.index)
+        self.assertFalse('bakc' in self.index)
+
+    def test_deleted_word_removed(self):
+        self.assertTrue('backed' in variant_index)
+        self.back.delete()
+        self.assertFalse('backed' in variant_index)
+
+    def test_word_deleted_elsewhere_treated_as_missing(self):
+        self.index.warm()
+        #Gone from the db without a signal, as when another process deletes it
+        VariantWord.objects.filter(name='backed').update(name='bakced')
+        self.assertTrue('backed' in self.index)
+        self.assertIsNone(self.index.base_word_id('backed'))
+        self.assertFalse('backed' in self.index)
+
+    def test_search_for_word_deleted_elsewhere_looks_it_up(self):
+        self.assertTrue('backed' in variant_index)
+        VariantWord.objects.filter(name='backed').update(name='bakced')
+        self.addCleanup(variant_index.clear)
+        response = self.client.get('/', {'search_term': 'backed'})
+        job = ScrapeJob.objects.get(word='backed')
+        self.assertRedirects(response, f'/dictionary/lookup/{job.id}/')
+
+
+class SynonymCrawlerTest(TestCase):
+    """Crawls from the saved bolster page, every other word is a 404"""
+    def setUp(self):
+        BaseWord.objects.all().delete()
+        brace = BaseWord.objects.create(name='brace')
+        VariantWord.objects.create(base_word=brace, name='brace')
+        patcher = mock.patch.object(mws, '_fetch_page', _read_page)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_crawl_resumes_breadth_first(self):
+        crawled = synonym_crawler.crawl(['bolster'], max_depth=1, limit=1)
+        self.assertEqual(crawled, 1)
+        bolster = BaseWord.objects.get(name='bolster')
+        #brace was already in the dictionary so it's linked right away
+        self.assertEqual(list(Synonym.objects.filter(base_word=bolster)
+                                     .values_list('synonym__name', flat=True)),
+                         ['brace'])
+        pending = CrawlFrontier.objects.filter(status=CrawlFrontier.PENDING)
+        self.assertEqual(sorted(pending.values_list('word', flat=True)),
+                         ['boost', 'brace', 'buttress', 'prop', 'undermine',
+                          'weaken'])
+        self.assertEqual(set(pending.values_list('depth', flat=True)), {1})
+        #Starting again picks up the pending words
+        self.assertEqual(synonym_crawler.crawl(max_depth=1), 6)
+        statuses = dict(CrawlFrontier.objects.values_list('word', 'status'))
+        self.assertEqual(statuses['brace'], CrawlFrontier.DONE)
+        self.assertEqual(statuses['weaken'], CrawlFrontier.NOT_FOUND)
+        self.assertFalse(SynonymsToLookUp.objects.exists())
+        bolster.refresh_from_db()
+        self.assertTrue(bolster.searched_synonym)
+
+    def test_pages_downloaded_outside_transaction(self):
+        depth = len(connection.savepoint_ids)
+        depths = []
+
+        def fetch_page(word):
+            depths.append(len(connection.savepoint_ids))
+            return _read_page(word)
+
+        with mock.patch.object(mws, '_fetch_page', fetch_page):
+            synonym_crawler.crawl(['bolster'], max_depth=1, limit=2)
+        self.assertEqual(depths, [depth, depth])
+
+    def test_max_words(self):
+        synonym_crawler.crawl(['bolster'], max_depth=3, max_words=3)
+        self.assertEqual(CrawlFrontier.objects.count(), 3)
+
+
+class ScrapeJobTest(TestCase):
+    """Runs lookup jobs against the saved pages, every other word is a 404"""
+    def setUp(self):
+        user = User.objects.create_user(username='worker', password='test')
+        self.word_list = WordList.objects.create(list_name='to learn',
+                                                 user=user)
+        patcher = mock.patch.object(mws, '_fetch_page', _read_page)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_enqueue_reuses_waiting_job(self):
+        job = scrape_jobs.enqueue('bolster', word_list=self.word_list)
+        self.assertEqual(scrape_jobs.enqueue('bolster',
+                                             word_list=self.word_list), job)
+        self.assertNotEqual(scrape_jobs.enqueue('bolster'), job)
+
+    def test_run_next_adds_word_to_list(self):
+        job = scrape_jobs.enqueue('bolster', search_synonym=False,
+                                  word_list=self.word_list)
+        self.assertEqual(scrape_jobs.run_next(), job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ScrapeJob.DONE)
+        self.assertEqual(job.base_word.name, 'bolster')
+        self.assertTrue(WordListEntry.objects
+                                     .filter(word_list=self.word_list,
+                                             word=job.base_word).exists())
+        self.assertIsNone(scrape_jobs.run_next())
+
+    def test_redirected_word_found(self):
+        with open(http_replay.recording_path(
+                'https://www.merriam-webster.com/dictionary/indorse'),
+                encoding='utf-8') as f:
+            page = json.load(f)['body'].replace('endorse', 'bolster') \
+                                       .replace('indorse', 'bolstre')
+
+        def fetch_page(word):
+            return page.encode('utf-8') if word == 'bolstre' \
+                else _read_page(word)
+
+        job = scrape_jobs.enqueue('bolstre', search_synonym=False,
+                                  word_list=self.word_list)
+        with mock.patch.object(mws, '_fetch_page', fetch_page):
+            scrape_jobs.run_next()
+        job.refresh_from_db()
+        #The misspelling isn't kept as a spelling of bolster
+        self.assertFalse(VariantWord.objects.filter(name='bolstre').exists())
+        self.assertEqual(job.status, ScrapeJob.DONE)
+        self.assertEqual(job.base_word.name, 'bolster')
+        self.assertTrue(WordListEntry.objects
+                                     .filter(word_list=self.word_list,
+                                             word=job.base_word).exists())
+
+    def test_missing_word(self):
+        job = scrape_jobs.enqueue('weaken')
+        scrape_jobs.run_next()
+        job.refresh_from_db()
+        self.assertEqual(job.status, ScrapeJob.NOT_FOUND)
+        response = self.client.get(f'/dictionary/lookup/{job.id}/status')
+        self.assertEqual(response.json()['status'], ScrapeJob.NOT_FOUND)
+
+    def test_entry_page_queues_synonyms_once(self):
+        bolster = BaseWord.objects.get(name='bolster')
+        BaseWord.objects.filter(id=bolster.id).update(searched_synonym=False)
+        entry_documents.backfill(rebuild_all=True)
+        entry_cache.clear()
+        cache.clear()
+        counters.clear()
+        self.addCleanup(counters.clear)
+        self.client.get(f'/dictionary/{bolster.id}/')
+        job = ScrapeJob.objects.get(word='bolster')
+        self.assertTrue(job.search_synonym)
+        with self.assertNumQueries(0):
+            self.client.get(f'/dictionary/{bolster.id}/')
+        self.assertEqual(ScrapeJob.objects.count(), 1)
+
+    def test_search_never_scrapes(self):
+        with mock.patch.object(mws, 'scrape_word') as scrape_word:
+            response = self.client.get('/', {'search_term': 'buttress'})
+        scrape_word.assert_not_called()
+        job = ScrapeJob.objects.get(word='buttress')
+        self.assertRedirects(response, f'/dictionary/lookup/{job.id}/')
+
+
+@override_settings(SCRAPER_JOB_HEARTBEAT=0.05)
+class ScrapeJobHeartbeatTest(TransactionTestCase):
+    """The heartbeat is written by another thread, so no TestCase
+    transaction"""
+    def test_slow_job_not_requeued(self):
+        requeued = []
+
+        def slow_scrape(word, search_synonym):
+            time.sleep(0.5)
+            with mws._db_lock:
+                requeued.append(scrape_jobs.requeue_stale(0.25))
+            return None
+
+        scrape_jobs.enqueue('bolster')
+        with mock.patch.object(mws, 'look_up_word', slow_scrape):
+            job = scrape_jobs.run_next()
+        self.assertEqual(requeued, [0])
+        self.assertEqual(job.status, ScrapeJob.NOT_FOUND)
+        self.assertEqual(ScrapeJob.objects.get().status, ScrapeJob.NOT_FOUND)
+
+    def test_abandoned_job_requeued(self):
+        job = scrape_jobs.enqueue('bolster')
+        scrape_jobs.claim_next()
+        ScrapeJob.objects.filter(id=job.id).update(
+            updated=timezone.now() - timedelta(seconds=60))
+        self.assertEqual(scrape_jobs.requeue_stale(30), 1)
+        self.assertEqual(ScrapeJob.objects.get().status, ScrapeJob.QUEUED)
+
+
+class WordImporterTest(TestCase):
+    """Imports a gzipped word file, scrape_words is replaced by a fake"""
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.path = os.path.join(tmp_dir.name, 'words.txt.gz')
+        with gzip.open(self.path, 'wt') as f:
+            f.write('Zeugma\nbolster\n\nzeugma\n  Tête   à  tête \n'
+                    'qwxz\nboondoggle\n')
+        self.batches = []
+        self.pools = set()
+
+    def scrape_words(self, words, search_synonym=False, pools=None):
+        self.pools.add(pools)
+        self.batches.append(words)
+        return {word: word != 'qwxz' for word in words}
+
+    def test_words_normalized_and_deduped(self):
+        output = io.StringIO()
+        with mock.patch.object(mws, 'scrape_words', self.scrape_words):
+            checkpoint = word_importer.import_words(self.path, batch_size=2,
+                                                    stdout=output)
+        #bolster is in the initial data
+        self.assertEqual(self.batches, [['zeugma', 'tête à tête'],
+                                        ['qwxz', 'boondoggle']])
+        #Both batches went through the same pools
+        self.assertEqual(len(self.pools), 1)
+        self.assertNotIn(None, self.pools)
+        self.assertEqual((checkpoint.lines, checkpoint.found,
+                          checkpoint.not_found, checkpoint.finished),
+                         (7, 3, 1, True))
+        self.assertIn('line 7: 3 found, 1 not found', output.getvalue())
+
+    def test_words_found_by_earlier_batches_skipped(self):
+        def scrape_words(words, search_synonym=False, pools=None):
+            self.batches.append(words)
+            for word in words:
+                base_word = BaseWord.objects.create(name=word)
+                VariantWord.objects.create(base_word=base_word, name=word)
+            return {word: True for word in words}
+
+        with open(self.path, 'wb') as f:
+            f.write(b'alpha\nbeta\nalpha\ngamma\nbeta\n')
+        with mock.patch.object(mws, 'scrape_words', scrape_words):
+            word_importer.import_words(self.path, batch_size=2,
+                                       stdout=io.StringIO())
+        self.assertEqual(self.batches, [['alpha', 'beta'], ['gamma']])
+
+    def test_resumes_from_checkpoint(self):
+        def site_down(words, search_synonym=False, pools=None):
+            return {word: None for word in words}
+
+        with mock.patch.object(mws, 'scrape_words', self.scrape_words):
+            word_importer.import_words(self.path, batch_size=2,
+                                       stdout=io.StringIO())
+        ImportCheckpoint.objects.update(lines=5, finished=False)
+        with mock.patch.object(mws, 'scrape_words', site_down):
+            with self.assertRaises(word_importer.ImportStopped):
+                word_importer.import_words(self.path, batch_size=2,
+                                           stdout=io.StringIO())
+        self.assertEqual(ImportCheckpoint.objects.get().lines, 5)
+        self.batches = []
+        with mock.patch.object(mws, 'scrape_words', self.scrape_words):
+            word_importer.import_words(self.path, batch_size=2,
+                                       stdout=io.StringIO())
+        self.assertEqual(self.batches, [['qwxz', 'boondoggle']])
+        self.assertTrue(ImportCheckpoint.objects.get().finished)
+
+
+def _scrape_in_process(db_name, base_url, word):
+    """Looks up word with its synonyms on its own, in a process of its own
+
+    Run by SingleFlightProcessTest in a new python process, on db_name with
+    the pages of the mock dictionary at base_url. Returns the names of the
+    synonyms and antonyms linked to word.
+    """
+    connection.settings_dict['NAME'] = db_name
+    _entry_cache_settings.enable()
+    with override_settings(SCRAPER_HTTP_MODE=http_replay.LIVE,
+                           SCRAPER_LEASE_POLL_INTERVAL=0.01), \
+         mock.patch.object(mws, 'BASE_URL', base_url), \
+         mock.patch.object(mws, 'rate_limiter', mws.RateLimiter(0)), \
+         mock.patch.object(mws, 'page_cache', PageCache(None, 0, 0)):
+        mws.scrape_word(word, True)
+    base_word = BaseWord.objects.get(name=word)
+    return sorted(base_word.synonym_set.values_list('synonym__name',
+                                                    flat=True)
+                  .union(base_word.antonym_set.values_list('antonym__name',
+                                                           flat=True)))
+
+
+class _SharedSynonymsDictionary(benchmark.MockDictionary):
+    """Mock dictionary whose pages for alpha and beta both have the synonyms
+    of bolster, and that remembers every word it was asked for"""
+    def __init__(self, latency):
+        super().__init__(latency)
+        self.requests = []
+
+    def page(self, word):
+        self.requests.append(word)
+        if word in ('alpha', 'beta'):
+            return (200, _read_page('bolster').replace(b'bolster',
+                                                       word.encode()))
+        return super().page(word)
+
+
+class SingleFlightProcessTest(TransactionTestCase):
+    """Two processes looking up words that share their synonyms, on a copy
+    of the test db in a file since they can't share an in-memory one"""
+    def test_shared_synonyms_looked_up_once(self):
+        BaseWord.objects.all().delete()
+        self.addCleanup(variant_index.clear)
+        server = _SharedSynonymsDictionary(latency=0.2).start()
+        self.addCleanup(server.stop)
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        db_name = os.path.join(tmp_dir.name, 'db.sqlite3')
+        connection.ensure_connection()
+        with sqlite3.connect(db_name) as copy:
+            connection.connection.backup(copy)
+        code = ('import django, json, sys; django.setup(); '
+                'from dictionary import tests; '
+                'print(json.dumps(tests._scrape_in_process(*sys.argv[1:])))')
+        processes = [subprocess.Popen([sys.executable, '-c', code, db_name,
+                                       server.base_url, word],
+                                      stdout=subprocess.PIPE,
+                                      stderr=subprocess.PIPE, text=True,
+                                      cwd=os.path.dirname(
+                                          os.path.dirname(__file__)))
+                     for word in ('alpha', 'beta')]
+        outputs = [process.communicate(timeout=120)
+                   for process in processes]
+        for (process, (stdout, stderr)) in zip(processes, outputs):
+            self.assertEqual(process.returncode, 0, stderr)
+            self.assertEqual(json.loads(stdout.splitlines()[-1]),
+                             ['boost', 'brace', 'buttress', 'prop',
+                              'undermine', 'weaken'])
+        #Each synonym was downloaded and written by only one of them
+        self.assertEqual(sorted(server.requests),
+                         ['alpha', 'beta', 'boost', 'brace', 'buttress',
+                          'prop', 'undermine', 'weaken'])
+        with sqlite3.connect(db_name) as copy:
+            self.assertEqual(copy.execute('SELECT COUNT(*) FROM '
+                                          'dictionary_scrapelease')
+                                 .fetchone(), (0,))
+
+
+@override_settings(SCRAPER_LEASE_POLL_INTERVAL=0.01)
+class SingleFlightTest(TransactionTestCase):
+    """Leases have to be committed to be seen, so no TestCase transaction"""
+    def test_lease_is_exclusive(self):
+        owner = single_flight.acquire('bolster')
+        self.assertFalse(single_flight.try_acquire('bolster', 'other'))
+        single_flight.release('bolster', owner)
+        self.assertTrue(single_flight.try_acquire('bolster', 'other'))
+
+    @override_settings(SCRAPER_LEASE_TTL=-1)
+    def test_abandoned_lease_taken_over(self):
+        single_flight.acquire('bolster')
+        self.assertTrue(single_flight.try_acquire('bolster', 'other'))
+
+    def test_waiting_lookup_shares_result(self):
+        fetched = []
+
+        def fetch(word):
+            fetched.append(word)
+            return _read_page(word)
+
+        def other_lookup_finishes(seconds):
+            #Stands in for another process that took the lease first
+            (entry, _) = mws._parse_page('bolster', mws._fetch_page('bolster'))
+            with mws._db_lock:
+                mws._scrape_word('bolster', entry)
+            single_flight.release('bolster', 'other')
+
+        self.assertTrue(single_flight.try_acquire('bolster', 'other'))
+        with mock.patch.object(mws, '_fetch_page', fetch), \
+             mock.patch.object(single_flight.time, 'sleep',
+                               side_effect=other_lookup_finishes) as sleep:
+            self.assertTrue(mws.scrape_word('bolster'))
+        sleep.assert_called_once()
+        self.assertEqual(fetched, ['bolster'])
+        self.assertEqual(VariantWord.objects.filter(name='bolster').count(), 1)
+        self.assertFalse(ScrapeLease.objects.exists())
+
+
+@override_settings(SCRAPER_LEASE_POLL_INTERVAL=0.01)
+class ScrapePipelineTest(TransactionTestCase):
+    """Runs scrape_words on the saved pages, every other word is a 404"""
+    def setUp(self):
+        BaseWord.objects.all().delete()
+        #The tables are emptied after each test without the index knowing
+        self.addCleanup(variant_index.clear)
+        patcher = mock.patch.object(mws, '_fetch_page', _read_page)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_parsed_in_writer(self):
+        #Callers like import_words report progress themselves
+        with mock.patch('sys.stdout', new_callable=io.StringIO) as stdout:
+            results = mws.scrape_words(['bolster', 'weaken'], workers=2,
+                                       parse_workers=0)
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertEqual(results, {'bolster': True, 'weaken': False})
+        bolster = BaseWord.objects.get(name='bolster')
+        self.assertFalse(bolster.searched_synonym)
+        self.assertEqual(bolster.synonymstolookup_set.count(), 6)
+        self.assertFalse(ScrapeLease.objects.exists())
+
+    def test_fetched_without_db_lock(self):
+        fetched = []
+        written = []
+
+        def fetch(word):
+            #Another thread has to be able to write while the page downloads
+            def write():
+                if mws._db_lock.acquire(timeout=5):
+                    mws._db_lock.release()
+                    written.append(word)
+            thread = threading.Thread(target=write)
+            thread.start()
+            thread.join()
+            fetched.append(word)
+            return _read_page(word)
+
+        with mock.patch.object(mws, '_fetch_page', fetch):
+            self.assertTrue(mws.scrape_word('bolster', True))
+        #bolster and then each of its synonyms, which are all 404s
+        self.assertEqual(len(fetched), 7)
+        self.assertEqual(written, fetched)
+        self.assertTrue(BaseWord.objects.get(name='bolster').searched_synonym)
+
+    def test_parsed_in_other_processes(self):
+        mws.parse_stats.reset()
+        results = mws.scrape_words(['bolster'], True, workers=2,
+                                   parse_workers=1)
+        self.assertEqual(results, {'bolster': True})
+        stats = mws.parse_stats.as_dict()
+        self.assertEqual(stats['pages'], 1)
+        self.assertGreater(stats['seconds'], 0)
+        bolster = BaseWord.objects.get(name='bolster')
+        self.assertTrue(bolster.searched_synonym)
+        #Every synonym was looked up in the second batch and is a 404
+        self.assertFalse(SynonymsToLookUp.objects.exists())
+        self.assertFalse(ScrapeLease.objects.exists())
+
+
+@override_settings(SCRAPER_HTTP_MODE=HTTP_MODE)
+class ScraperTestCase(TestCase):
+    """Base class for tests that look words up on Merriam-Webster
+
+    The responses recorded in dictionary/fixtures/http are replayed, so the
+    tests run offline. A test that needs a response that hasn't been recorded
+    fails with MissingRecording, run the tests with SCRAPER_HTTP_MODE=record
+    to record it.
+    """
+    def scrape_word(self, word, search_synonym=False):
+        return mws.scrape_word(word, search_synonym)
+
 
-class BackDefinitionEntryTest(TestCase):
+class BackDefinitionEntryTest(ScraperTestCase):
     """Class to test that the scraper successfully extracts info from the
     entry of the word 'back'"""
     def setUp(self):
-        mws.scrape_word('back')
+        self.scrape_word('back')
 
     def test_db_created_successfully(self):
         base_words = BaseWord.objects.all()
@@ -131,11 +1601,11 @@ class BackDefinitionEntryTest(TestCase):
         self.assertEqual(db_definitions, definitions)
 
 
-class BolsterDefinitionEntryTest(TestCase):
+class BolsterDefinitionEntryTest(ScraperTestCase):
     """Class to test that the scraper successfully extracts info from the
     entry of the word 'bolster'"""
     def setUp(self):
-        mws.scrape_word('bolster')
+        self.scrape_word('bolster')
 
     def test_db_created_successfully(self):
         base_words = BaseWord.objects.all()
@@ -161,13 +1631,13 @@ class BolsterDefinitionEntryTest(TestCase):
         self.assertEqual(db_definitions, definitions)
 
 
-class CapriciousPrecipitateDefinitionEntryTest(TestCase):
+class CapriciousPrecipitateDefinitionEntryTest(ScraperTestCase):
     """Class to test that the scraper successfully extracts info from the
     entry of the word 'capricious' and then 'precipitate'"""
     def setUp(self):
         BaseWord.objects.all().delete()
-        mws.scrape_word('precipitate')
-        mws.scrape_word('capricious')
+        self.scrape_word('precipitate')
+        self.scrape_word('capricious')
 
     def test_db_created_successfully(self):
         db_base_words = BaseWord.objects.all()
@@ -213,14 +1683,14 @@ class CapriciousPrecipitateDefinitionEntryTest(TestCase):
         self.assertEqual(db_definitions, definitions)
 
 
-class OstentatiousAffectedDefinitionEntryTest(TestCase):
+class OstentatiousAffectedDefinitionEntryTest(ScraperTestCase):
     """Class to test that the scraper successfully extracts info from the
     entry of the word 'Ostentatious' and then 'affected'
     """
     def setUp(self):
         BaseWord.objects.all().delete()
-        mws.scrape_word('ostentatious')
-        mws.scrape_word('affected')
+        self.scrape_word('ostentatious')
+        self.scrape_word('affected')
 
     def test_db_created_successfully(self):
         db_variant_words = VariantWord.objects.values_list('name', flat=True)
@@ -255,14 +1725,14 @@ class OstentatiousAffectedDefinitionEntryTest(TestCase):
         self.assertEqual(db_definitions, definitions)
 
 
-class EndorseDefinitionEntryTest(TestCase):
+class EndorseDefinitionEntryTest(ScraperTestCase):
     """Class to test that the scraper successfully choses the word 'Endorse'
     instead of 'indorse.' We want to use the more common spelling as the main
     entry whenever possible
     """
     def setUp(self):
         BaseWord.objects.all().delete()
-        mws.scrape_word('indorse')
+        self.scrape_word('indorse')
 
     def test_db_created_successfully(self):
         db_base_words = BaseWord.objects.all()
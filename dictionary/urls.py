@@ -4,6 +4,9 @@ from . import views
 app_name = 'dictionary'
 urlpatterns = [
     path('<int:base_word_id>/', views.detail, name='detail'),
+    path('lookup/<int:job_id>/', views.scrape_job, name='scrape_job'),
+    path('lookup/<int:job_id>/status', views.scrape_job_status,
+         name='scrape_job_status'),
     path('word_list/<int:word_list_id>/', views.view_word_list,
          name='view_word_list'),
     path('word_list/<int:word_list_id>/add_words_to_word_list',
@@ -14,6 +17,8 @@ urlpatterns = [
         views.change_word_list_name, name='change_word_list_name'),
     path('word_list/<int:word_list_id>/play_game', views.play_game,
          name='play_game'),
+    path('word_list/<int:word_list_id>/review', views.review_words,
+         name='review_words'),
     path('word_list/<int:word_list_id>/change_privacy', views.change_privacy,
          name='change_privacy'),
     path('word_list/view_user_word_lists', views.view_user_word_lists,
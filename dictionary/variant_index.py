@@ -0,0 +1,114 @@
+"""In-process index of the names of every VariantWord
+
+Checking whether a word is in the dictionary used to load the name of every
+VariantWord and test membership on the list, which gets slower as the
+dictionary grows. variant_index keeps the names in a set instead, so checking
+a name is a set lookup:
+
+    from dictionary.variant_index import variant_index
+    if word in variant_index:
+        ...
+
+The set is filled from the db the first time it's used. Names saved or
+deleted in this process are added or removed through signals, and names
+created with bulk_create (which doesn't send signals) are added by the
+scraper with variant_index.add(). A name that isn't in the set is looked up
+with a single query on the unique name column before saying it's missing,
+which picks up words added by other processes.
+
+Names deleted by other processes, e.g. by a dictionary restore with replace,
+stay in the set. Views that go on to read the word use base_word_id(),
+which drops a name that's no longer in the db and treats it as missing:
+
+    base_word_id = variant_index.base_word_id(word)
+    if base_word_id is None:
+        ...
+"""
+
+import threading
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from dictionary.models import VariantWord
+
+
+class VariantNameIndex:
+    """Set of VariantWord names that falls back to the db on a miss"""
+    def __init__(self):
+        self._names = None
+        self._lock = threading.Lock()
+
+    def warm(self):
+        """(Re)loads every name from the db"""
+        names = set(VariantWord.objects.values_list('name', flat=True))
+        with self._lock:
+            self._names = names
+
+    def __contains__(self, name):
+        names = self._names
+        if names is None:
+            self.warm()
+            names = self._names
+        if name in names:
+            return True
+        if VariantWord.objects.filter(name=name).exists():
+            self.add([name])
+            return True
+        return False
+
+    def base_word_id(self, name):
+        """Returns the id of the base word of name, None if there isn't one
+
+        A name that's in the index but no longer in the db was deleted by
+        another process, it's dropped from the index.
+        """
+        if name not in self:
+            return None
+        try:
+            return (VariantWord.objects.values_list('base_word_id', flat=True)
+                                       .get(name=name))
+        except VariantWord.DoesNotExist:
+            self.discard(name)
+            return None
+
+    def add(self, names):
+        """Adds names once the transaction that created them commits
+
+        Names are only added after the commit, so a rolled back word never
+        ends up in the index. Until then, lookups in the same transaction
+        still find them through the db.
+        """
+        names = list(names)
+
+        def add_names():
+            with self._lock:
+                if self._names is not None:
+                    self._names.update(names)
+
+        transaction.on_commit(add_names)
+
+    def discard(self, name):
+        with self._lock:
+            if self._names is not None:
+                self._names.discard(name)
+
+    def clear(self):
+        """Empties the index, it's loaded again the next time it's used"""
+        with self._lock:
+            self._names = None
+
+
+variant_index = VariantNameIndex()
+
+
+@receiver(post_save, sender=VariantWord)
+def add_variant_name(sender, instance, created, **kwargs):
+    """Adds newly saved variant words to the index"""
+    if created:
+        variant_index.add([instance.name])
+
+
+@receiver(post_delete, sender=VariantWord)
+def remove_variant_name(sender, instance, **kwargs):
+    """Removes deleted variant words from the index, also on cascades"""
+    variant_index.discard(instance.name)
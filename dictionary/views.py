@@ -1,22 +1,56 @@
 from django.shortcuts import render
-from django.http import HttpResponse, Http404, HttpResponseRedirect
+from django.http import (HttpResponse, Http404, HttpResponseRedirect,
+                         JsonResponse)
 from django.shortcuts import render, get_object_or_404
 from django.urls import reverse
 from django.views import generic
 from . import models
 from dictionary.forms import SearchWordForm, VocabTestAnswer
 from argot.forms import WordListForm
-import random
-from dictionary import merriam_webster_scraper as mws
-from django.db.models import F
+from dictionary import (counters, entry_cache, quiz_sessions, scrape_jobs,
+                        spaced_repetition)
+from dictionary.variant_index import variant_index
 
 
 def detail(request, base_word_id):
-    """Displays the definition page for a baseword"""
-    word = get_object_or_404(models.BaseWord, pk=base_word_id)
-    if not word.searched_synonym:
-        mws.scrape_word(word.name, True)
-    return render(request, 'dictionary/detail.html', {'word': word})
+    """Displays the definition page for a baseword
+
+    If the synonyms of the word haven't been looked up yet, they're queued to
+    be looked up in the background and will show up on a later visit. A
+    cached entry is served without touching the database, the view is
+    counted in memory and the lookup is only queued once in a while.
+    """
+    entry = entry_cache.get_entry(base_word_id)
+    if entry is None:
+        raise Http404('No BaseWord matches the given query.')
+    #Most viewed words are refreshed first, see dictionary/entry_refresh.py
+    counters.increment(models.BaseWord, base_word_id, view_count=1)
+    if not entry['searched_synonym']:
+        scrape_jobs.enqueue_synonyms(entry['name'])
+    return render(request, 'dictionary/detail.html', {'entry': entry})
+
+
+def scrape_job(request, job_id):
+    """Page shown while a word is looked up, sends user to entry once ready"""
+    job = get_object_or_404(models.ScrapeJob, pk=job_id)
+    if job.status == models.ScrapeJob.DONE:
+        return HttpResponseRedirect(reverse('dictionary:detail',
+                                            args=(job.base_word_id,)))
+    if job.is_active:
+        return render(request, 'dictionary/fetching_word.html', {'job': job})
+    if job.status == models.ScrapeJob.NOT_FOUND:
+        return render(request, 'argot/no_word_found.html', {'word': job.word})
+    return HttpResponse(f'Something went wrong looking up {job.word}, '
+                        f'please try again')
+
+
+def scrape_job_status(request, job_id):
+    """Returns the status of a lookup as json for the waiting page to poll"""
+    job = get_object_or_404(models.ScrapeJob, pk=job_id)
+    data = {'word': job.word, 'status': job.status}
+    if job.status == models.ScrapeJob.DONE:
+        data['url'] = reverse('dictionary:detail', args=(job.base_word_id,))
+    return JsonResponse(data)
 
 
 def view_word_list(request, word_list_id):
@@ -32,8 +66,7 @@ def view_word_list(request, word_list_id):
 def _display_word_list(request, word_list_id):
     """Displays word_list, increased view count, and turns to active if owner"""
     word_list = get_object_or_404(models.WordList, pk=word_list_id)
-    word_list.view_count += 1
-    word_list.save()
+    counters.increment(models.WordList, word_list.id, view_count=1)
     if word_list.user == request.user:
         profile = request.user.profile
         profile.active_word_list = word_list
@@ -71,10 +104,15 @@ def add_words_to_word_list(request, word_list_id):
         form = SearchWordForm(request.POST)
         if form.is_valid():
             word = form.cleaned_data['search_term']
-            base_word = models.VariantWord.objects.get(name=word).base_word
+            base_word_id = variant_index.base_word_id(word)
+            if base_word_id is None:
+                #The job adds the word to the list once it's been looked up
+                job = scrape_jobs.enqueue(word, word_list=word_list)
+                return HttpResponseRedirect(reverse('dictionary:scrape_job',
+                                                    args=(job.id,)))
             wl_entry, _ = models.WordListEntry.objects \
                                 .get_or_create(word_list=word_list,
-                                               word=base_word)
+                                               word_id=base_word_id)
             return HttpResponseRedirect(reverse('dictionary:view_word_list',
                                                 args=(word_list_id,)))
         else:
@@ -172,89 +210,72 @@ def remove_words(request, word_list_id):
                                             args=(word_list_id,)))
 
 
-def _return_synonym_dict(entry_list):
-    """Handles generating the synonym_dict for the game"""
-    synonym_dict = {}
-    for entry in entry_list:
-        if entry.searched_synonym == False:
-            mws.scrape_word(entry.name, True)
-        synonym_list = entry.synonym_set.all() \
-                            .annotate(s_base_word_id=F('synonym__base_word'))
-        if len(synonym_list) != 0:
-            synonym_dict[entry] = synonym_list
-    return synonym_dict
-
+def play_game(request, word_list_id):
+    """User will be asked to select the correct synonym out of 4 possible words
 
-def _return_all_synonyms():
-    """Queries for all the list of synonyms with the baseword ids as well"""
-    all_synonyms = models.Synonym.objects.all() \
-                         .annotate(s_base_word_id=F('synonym__base_word')) \
-                         .annotate(synonym_name=F('synonym__name')) \
-                         .values_list('synonym_name', flat=True)
-    return all_synonyms
+    Questions are generated a batch at a time and kept in the session, and
+    answers are graded against the question the user was shown, see
+    dictionary/quiz_sessions.py.
+    """
+    return _play(request, word_list_id, quiz_sessions.PRACTICE)
 
 
-def play_game(request, word_list_id):
-    """User will be asked to select the correct synonym out of 4 possible words
+def review_words(request, word_list_id):
+    """Same game, asking about the words that are due for the user
 
-    Takes all synonyms of a random word and choses one of the synonym as the
-    correct synonym. Three incorrect synonyms are selected by excluding all
-    synonyms for the selected word and then picking three synonyms from the db
-    as the invalid answers.
+    Every answer schedules the word's next review, see
+    dictionary/spaced_repetition.py.
     """
+    if not request.user.is_authenticated:
+        return HttpResponseRedirect('/')
+    return _play(request, word_list_id, quiz_sessions.REVIEW)
+
+
+def _play(request, word_list_id, mode):
+    """Grades the answer that was sent, if any, and shows the next question"""
     word_list = get_object_or_404(models.WordList, pk=word_list_id)
     if request.method == 'POST':
         form = VocabTestAnswer(request.POST)
         if form.is_valid():
-            choice = form.cleaned_data['choice']
-            correct_choice = form.cleaned_data['correct_choice']
-            test_word = form.cleaned_data['base_word']
-            base_word = models.BaseWord.objects.get(name=test_word)
-            accuracy, _  = models.UserAccuracy.objects \
-                                 .get_or_create(base_word=base_word,
-                                                user=request.user)
-            base_word.total_guesses += 1
-            accuracy.total_guesses += 1
-            if choice == correct_choice:
-                msg = 'Nice! Correct synonym'
-                base_word.correct_guesses += 1
-                accuracy.correct_guesses += 1
+            graded = quiz_sessions.answer(request.session, word_list.id,
+                                          form.cleaned_data['question'],
+                                          form.cleaned_data['choice'], mode)
+            if graded is None:
+                msg = 'That question was already answered'
             else:
-                msg = f'Wrong answer. The correct synonym is: {correct_choice}'
-            base_word.save()
-            accuracy.save()
+                (question, correct) = graded
+                base_word_id = question['base_word_id']
+                accuracy, _  = models.UserAccuracy.objects \
+                                     .get_or_create(base_word_id=base_word_id,
+                                                    user=request.user)
+                if correct:
+                    msg = 'Nice! Correct synonym'
+                else:
+                    msg = (f'Wrong answer. The correct synonym is: '
+                           f'{question["answer"]}')
+                #Added to the rows in batches, see dictionary/counters.py
+                guesses = {'total_guesses': 1, 'correct_guesses': int(correct)}
+                counters.increment(models.BaseWord, base_word_id, **guesses)
+                counters.increment(models.UserAccuracy, accuracy.id, **guesses)
+                if mode == quiz_sessions.REVIEW:
+                    spaced_repetition.review(accuracy, correct)
+                    accuracy.save(update_fields=['ease', 'interval',
+                                                 'repetitions', 'due'])
         else:
             msg = 'You have to select an answer!'
     else:
         msg = ''
-    entry_list = word_list.entries_list()
-    if len(entry_list) < 5:
-        return HttpResponse('You must have at least five entries to practice')
-    synonym_dict = _return_synonym_dict(entry_list)
-    if len(synonym_dict) == 0:
-        return HttpResponse('None of your words have synonyms to test')
-    #some entries don't have synonyms
-    entry_list = list(synonym_dict.keys())
-    all_synonyms = _return_all_synonyms()
-    test_word = random.choice(entry_list)
-    choice_synonyms = synonym_dict[test_word]
-    subq1 = (choice_synonyms.values('s_base_word_id'))
-    non_choice_synonyms = list(all_synonyms
-                                   .exclude(s_base_word_id__in=subq1)
-                                   .values_list('synonym_name', flat=True)
-                              )
-    choice_synonym = random.choice(choice_synonyms).synonym.name
     try:
-        non_choice_answers = random.sample(non_choice_synonyms, k=3)
-    except ValueError:
-        raise ValueError('You must add more entries to the database before'
-                         ' starting a game')
-    choices = [choice_synonym] + non_choice_answers
-    random.shuffle(choices)
+        (position, question) = quiz_sessions.current_question(
+            request.session, word_list.id, mode, request.user)
+    except quiz_sessions.QuizUnavailable as e:
+        return HttpResponse(f'{msg} {e}' if msg else str(e))
+    url_name = ('dictionary:review_words' if mode == quiz_sessions.REVIEW
+                else 'dictionary:play_game')
     return render(request, 'dictionary/play_game.html',
-                  {'word_list': word_list, 'test_word': test_word,
-                   'choices': choices,
-                   'choice_synonym' : choice_synonym,
-                   'non_choice_synonyms': non_choice_synonyms,
+                  {'word_list': word_list, 'test_word': question['word'],
+                   'choices': question['choices'],
+                   'question': position,
+                   'url_name': url_name,
                    'msg' : msg,
                    })
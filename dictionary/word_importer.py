@@ -0,0 +1,224 @@
+"""Streams very large word files into the dictionary, resuming after a crash
+
+load_list_of_words() reads the whole file into memory and starts over from
+the first word every time it's run, which is fine for a list of a few
+hundred words but not for a file of a few million. The importer reads the
+file a line at a time instead, plain text or gzipped, and looks the words up
+in batches with scrape_words().
+
+Each line is normalized (lowercased, with its whitespace collapsed) and
+blank lines and words too long to store are dropped as they're read. Words
+that are already in the dictionary are skipped using the variant index, so
+they never reach the scraper. That includes the words found by earlier
+batches, since a line is only read once the batches before it are in, so
+only the current batch has to be checked for repeats and memory use doesn't
+grow with the file. A word Merriam-Webster doesn't have that's repeated in a
+later batch is answered by the not found cache without a request.
+
+After every batch, the number of lines dealt with so far is saved in the
+ImportCheckpoint for the file. Running the import again skips those lines
+and carries on, until it's run with restart=True. A batch in which every
+word failed, e.g. because Merriam-Webster is down, stops the import without
+moving the checkpoint, so the batch is tried again the next time.
+
+Main Functions:
+    import_words(path, batch_size=None, search_synonym=False, restart=False,
+                 workers=None, stdout=None)
+        path: word file with one word per line, plain text or gzipped
+        batch_size: words looked up at once, defaults to the
+        SCRAPER_IMPORT_BATCH_SIZE setting
+        search_synonym: look up the synonyms of every word too
+        restart: forget the checkpoint and start from the first line
+        stdout: file the progress is written to, defaults to sys.stdout
+
+        Writes the throughput and estimated time left after every batch.
+        Returns the ImportCheckpoint of the file.
+
+        Example:
+            python3 manage.py import_words word_lists/all_words.txt.gz
+
+    read_words(lines, skip=0)
+        Generator of (line number, word) for the lines of a file after the
+        first skip, leaving out the ones without a word that's not in the
+        dictionary yet
+
+Settings:
+    SCRAPER_IMPORT_BATCH_SIZE -- words looked up by each call to scrape_words
+"""
+
+import gzip
+import io
+import os
+import sys
+import time
+from datetime import timedelta
+from django.conf import settings
+from dictionary import models
+from dictionary import merriam_webster_scraper as mws
+from dictionary.variant_index import variant_index
+
+#Longest word that fits in VariantWord.name
+MAX_WORD_LENGTH = models.VariantWord._meta.get_field('name').max_length
+
+
+class ImportStopped(Exception):
+    """Raised when a whole batch failed, the checkpoint is left before it"""
+
+
+def import_words(path, batch_size=None, search_synonym=False, restart=False,
+                 workers=None, stdout=None):
+    """Looks up every new word in the file at path, resuming if it can"""
+    if stdout is None:
+        stdout = sys.stdout
+    if batch_size is None:
+        batch_size = getattr(settings, 'SCRAPER_IMPORT_BATCH_SIZE', 200)
+    path = os.path.abspath(path)
+    checkpoint, _ = models.ImportCheckpoint.objects.get_or_create(path=path)
+    if restart:
+        checkpoint.delete()
+        checkpoint = models.ImportCheckpoint.objects.create(path=path)
+    if checkpoint.finished:
+        stdout.write(f'{path} was already imported, use restart to import '
+                     f'it again\n')
+        return checkpoint
+    size = os.path.getsize(path)
+    #Every batch goes through the same threads and parse processes
+    with open(path, 'rb') as raw, mws.pipeline_pools(workers) as pools:
+        progress = _Progress(raw, size, stdout)
+        lines = _open_lines(raw)
+        batch = {}
+        for (line_number, word) in read_words(lines, checkpoint.lines):
+            if progress.start is None:
+                progress.begin(checkpoint)
+            if word in batch:
+                continue
+            batch[word] = line_number
+            if len(batch) >= batch_size:
+                _import_batch(checkpoint, list(batch), line_number,
+                              search_synonym, pools)
+                progress.report(checkpoint)
+                batch = {}
+        #Every line has been read, so the last batch finishes the file
+        if batch:
+            _import_batch(checkpoint, list(batch), lines.line_number,
+                          search_synonym, pools)
+        checkpoint.lines = max(checkpoint.lines, lines.line_number)
+        checkpoint.finished = True
+        checkpoint.save()
+        progress.report(checkpoint)
+    return checkpoint
+
+
+def read_words(lines, skip=0):
+    """Yields (line number, word) for every line with a new word on it
+
+    Keyword arguments:
+    lines -- iterable of the lines of a word file
+    skip -- number of lines at the start that were already imported
+
+    Words in the dictionary are skipped, but a word that isn't is yielded
+    every time it's repeated, import_words() drops the repeats in a batch.
+    """
+    for (line_number, line) in enumerate(lines, 1):
+        if line_number <= skip:
+            continue
+        word = normalize(line)
+        if not word or len(word) > MAX_WORD_LENGTH:
+            continue
+        if word in variant_index:
+            continue
+        yield (line_number, word)
+
+
+def normalize(word):
+    """Returns word lowercased with its whitespace collapsed"""
+    return ' '.join(word.split()).lower()
+
+
+def _open_lines(raw):
+    """Returns a _CountedLines of the text in raw, gunzipped if needed"""
+    gzipped = raw.peek(2)[:2] == b'\x1f\x8b'
+    stream = gzip.GzipFile(fileobj=raw) if gzipped else raw
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace')
+    return _CountedLines(text)
+
+
+class _CountedLines:
+    """Iterates over the lines of a file, counting them as it goes
+
+    read_words() skips lines that don't hold a new word, so the number of
+    the last line read is kept here for the checkpoint at the end.
+    """
+    def __init__(self, text):
+        self._text = text
+        self.line_number = 0
+
+    def __iter__(self):
+        for line in self._text:
+            self.line_number += 1
+            yield line
+
+
+def _import_batch(checkpoint, batch, line_number, search_synonym, pools):
+    """Looks up a batch of words, then moves the checkpoint to line_number
+
+    Keyword arguments:
+    line_number -- last line of the file that's done once the batch is
+    pools -- pools from mws.pipeline_pools() the batch is looked up with
+    """
+    results = mws.scrape_words(batch, search_synonym=search_synonym,
+                               pools=pools)
+    statuses = list(results.values())
+    if statuses and all(status is None for status in statuses):
+        raise ImportStopped(f'Every word in the batch ending on line '
+                            f'{line_number} failed, stopped at line '
+                            f'{checkpoint.lines}')
+    checkpoint.found += statuses.count(True)
+    checkpoint.not_found += statuses.count(False)
+    checkpoint.failed += statuses.count(None)
+    checkpoint.lines = line_number
+    checkpoint.save()
+
+
+class _Progress:
+    """Prints the throughput of the import and how long it has left
+
+    The share of the file that's done is the position in the file on disk,
+    which for a gzipped file is the position in the compressed data, so the
+    estimate doesn't need the number of lines up front.
+    """
+    def __init__(self, raw, size, stdout):
+        self._raw = raw
+        self._size = size
+        self._stdout = stdout
+        self.start = None
+        self._start_position = 0
+        self._start_words = 0
+
+    def begin(self, checkpoint):
+        """Starts the clock once the lines done by earlier runs are skipped"""
+        self.start = time.monotonic()
+        self._start_position = self._raw.tell()
+        self._start_words = _words_done(checkpoint)
+
+    def report(self, checkpoint):
+        if self.start is None:
+            self.begin(checkpoint)
+        words = _words_done(checkpoint)
+        elapsed = time.monotonic() - self.start
+        position = self._raw.tell()
+        done = position / self._size if self._size else 1.0
+        rate = (words - self._start_words) / elapsed if elapsed else 0.0
+        eta = 'unknown'
+        if position > self._start_position:
+            seconds_left = (elapsed * (self._size - position)
+                            / (position - self._start_position))
+            eta = str(timedelta(seconds=round(seconds_left)))
+        self._stdout.write(f'line {checkpoint.lines}: {checkpoint.found} '
+                           f'found, {checkpoint.not_found} not found, '
+                           f'{checkpoint.failed} failed, {rate:.1f} words/s, '
+                           f'{done:.1%} of the file, {eta} left\n')
+
+
+def _words_done(checkpoint):
+    return checkpoint.found + checkpoint.not_found + checkpoint.failed